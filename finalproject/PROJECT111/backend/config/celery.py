@@ -1,5 +1,6 @@
 import os
 from celery import Celery
+from celery.signals import worker_process_init, worker_process_shutdown
 
 # Set the default Django settings module for the 'celery' program.
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
@@ -15,6 +16,18 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 # Load task modules from all registered Django app configs.
 app.autodiscover_tasks()
 
+@worker_process_init.connect
+def preload_sbert_model(**kwargs):
+    # SBERT_PRELOAD=True인 경우 각 워커 프로세스가 첫 태스크 전에 모델을 로드
+    from teamspace.ai_services import preload_sbert_model
+    preload_sbert_model()
+
+@worker_process_shutdown.connect
+def mark_metrics_process_dead(pid=None, **kwargs):
+    # PROMETHEUS_MULTIPROC_DIR을 쓰는 경우 종료된 자식 프로세스의 지표 파일 정리
+    from teamspace.metrics import mark_process_dead
+    mark_process_dead(pid or os.getpid())
+
 @app.task(bind=True)
 def debug_task(self):
     print(f'Request: {self.request!r}')
@@ -39,6 +39,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'teamspace.request_metrics.RequestMetricsMiddleware', # 가장 바깥에서 요청 전체 시간과 DB/SBERT/LLM 측정
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -180,6 +181,30 @@ SIMPLE_JWT = {
 # OpenAI API Key
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 
+# 공용 LLM 클라이언트 (teamspace.llm_client)
+LLM_CLIENT = {
+    'BASE_URL': os.getenv('OPENAI_BASE_URL') or None,  # OpenAI 호환 서버 (로컬 테스트용 가짜 서버 등). None이면 api.openai.com
+    'MAX_CONCURRENCY': int(os.getenv('LLM_MAX_CONCURRENCY', 8)),  # 프로세스당 동시 요청 수
+    'POOL_SIZE': int(os.getenv('LLM_POOL_SIZE', 20)),  # keep-alive 연결 수
+    'TIMEOUT': float(os.getenv('LLM_TIMEOUT', 30)),  # 요청 타임아웃 (초)
+    'CONNECT_TIMEOUT': float(os.getenv('LLM_CONNECT_TIMEOUT', 5)),
+    'MAX_RETRIES': int(os.getenv('LLM_MAX_RETRIES', 4)),  # 429/5xx/연결 오류 재시도 횟수
+    'BACKOFF_BASE': 0.5,  # 재시도 대기: uniform(0, min(BACKOFF_BASE * 2^n, BACKOFF_MAX))
+    'BACKOFF_MAX': 20.0,
+}
+
+# LLM Rate Limit (teamspace.rate_limiter) - 모든 웹/워커 프로세스가 공유하는 OpenAI RPM/TPM 토큰 버킷 (Redis)
+# 한도를 넘는 호출은 실패하지 않고 예산이 생길 때까지 기다립니다 (최대 MAX_WAIT초).
+LLM_RATE_LIMIT = {
+    'ENABLED': os.getenv('LLM_RATE_LIMIT_ENABLED', 'True') == 'True',
+    'RPM': int(os.getenv('LLM_RATE_LIMIT_RPM', 500)),  # 분당 요청 수 (계정 한도보다 약간 낮게)
+    'TPM': int(os.getenv('LLM_RATE_LIMIT_TPM', 200000)),  # 분당 토큰 수
+    'CHARS_PER_TOKEN': float(os.getenv('LLM_RATE_LIMIT_CHARS_PER_TOKEN', 2)),  # 프롬프트 토큰 추정 (한국어 기준, 응답 후 실제 사용량으로 보정)
+    'COMPLETION_TOKENS': int(os.getenv('LLM_RATE_LIMIT_COMPLETION_TOKENS', 700)),  # max_tokens가 없을 때 예상 응답 토큰
+    'MAX_WAIT': int(os.getenv('LLM_RATE_LIMIT_MAX_WAIT', 300)),  # 대기 상한 (초)
+    'KEY': 'llm:ratelimit',
+}
+
 # Logging Settings
 LOGGING = {
     'version': 1,
@@ -197,6 +222,10 @@ LOGGING = {
 
 # SBERT Model Path
 SBERT_MODEL_PATH = os.path.join(BASE_DIR, 'output', 'my_sbert_model')
+# 임베딩 캐시 키 / 저장된 임베딩을 구분하는 모델 식별자 (모델 교체 시 변경)
+SBERT_MODEL_VERSION = os.getenv('SBERT_MODEL_VERSION', os.path.basename(SBERT_MODEL_PATH))
+# True면 gunicorn/celery 워커가 시작할 때 모델을 미리 로드 (기본값: 첫 인코딩 요청 시 로드)
+SBERT_PRELOAD = os.getenv('SBERT_PRELOAD', 'False') == 'True'
 
 # Celery Configuration Options
 REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
@@ -206,3 +235,134 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
+
+# 큐 분리: 사용자가 기다리는 작업(interactive)이 대량 사전 계산(precompute) 뒤에 밀리지 않도록 함
+# 큐마다 별도 워커 프로세스가 소비합니다 (저장소 루트 Procfile). 동시성/prefetch는 환경 변수로 조정:
+#   worker_interactive: interactive                 CELERY_INTERACTIVE_CONCURRENCY (2), CELERY_INTERACTIVE_PREFETCH (1)
+#   worker_bulk:        precompute, embeddings (-O fair) CELERY_BULK_CONCURRENCY (1), CELERY_BULK_PREFETCH (1)
+#   worker_llm:         llm (스레드 풀)               CELERY_LLM_CONCURRENCY (8), CELERY_LLM_PREFETCH (1)
+# 큐를 새로 추가하면 Procfile의 -Q에도 넣어야 합니다. 라우팅되지 않은 태스크는 interactive로 갑니다.
+CELERY_TASK_DEFAULT_QUEUE = 'interactive'
+CELERY_TASK_ROUTES = {
+    'teamspace.tasks.calculate_single_match_score_task': {'queue': 'interactive'},
+    'teamspace.tasks.rebuild_top_recommendations_task': {'queue': 'interactive'},
+    'teamspace.tasks.precompute_matches_for_user_task': {'queue': 'precompute'},
+    'teamspace.tasks.precompute_matches_for_project_task': {'queue': 'precompute'},
+    'teamspace.tasks.precompute_user_chunk_task': {'queue': 'precompute'},
+    'teamspace.tasks.precompute_project_chunk_task': {'queue': 'precompute'},
+    'teamspace.tasks.finish_precompute_task': {'queue': 'precompute'},
+    'teamspace.tasks.precompute_failed_task': {'queue': 'precompute'},
+    'teamspace.tasks.rebuild_stale_top_recommendations_task': {'queue': 'precompute'},
+    'teamspace.tasks.refresh_user_embedding_task': {'queue': 'embeddings'},
+    'teamspace.tasks.refresh_project_embedding_task': {'queue': 'embeddings'},
+    'teamspace.tasks.build_ann_index_task': {'queue': 'embeddings'},
+    'teamspace.tasks.generate_match_explanation_task': {'queue': 'llm'},
+    'teamspace.tasks.generate_match_explanations_task': {'queue': 'llm'},
+}
+# -O fair / --prefetch-multiplier를 지정하지 않은 워커(로컬 실행 등)의 기본값. 긴 청크 태스크 뒤에 다른 태스크가 묶여 기다리지 않음
+CELERY_WORKER_PREFETCH_MULTIPLIER = int(os.getenv('CELERY_WORKER_PREFETCH_MULTIPLIER', 1))
+
+# Embedding Refresh (teamspace.tasks.enqueue_embedding_refresh)
+EMBEDDING_REFRESH = {
+    'DEBOUNCE_SECONDS': int(os.getenv('EMBEDDING_REFRESH_DEBOUNCE_SECONDS', 3)),  # 이 시간 안의 반복 저장은 한 번의 인코딩으로 합침
+}
+
+# Request Metrics (teamspace.request_metrics) - 요청별 DB/SBERT/LLM 측정, Server-Timing 헤더, 경로별 백분위 (stats/requests/)
+REQUEST_METRICS = {
+    'ENABLED': os.getenv('REQUEST_METRICS_ENABLED', 'True') == 'True',
+    'SAMPLE_SIZE': int(os.getenv('REQUEST_METRICS_SAMPLE_SIZE', 1000)),  # 경로별로 보관할 최근 요청 수 (백분위 계산용)
+    'TTL': int(os.getenv('REQUEST_METRICS_TTL', 60 * 60 * 24 * 7)),  # 요청이 없는 경로의 기록 만료 (초)
+    'KEY_PREFIX': 'reqmetrics:',
+    'FLUSH_EVERY': int(os.getenv('REQUEST_METRICS_FLUSH_EVERY', 50)),  # 프로세스별로 이만큼 모이면 Redis에 한 번에 기록
+    'FLUSH_INTERVAL': int(os.getenv('REQUEST_METRICS_FLUSH_INTERVAL', 10)),  # 또는 마지막 기록 후 이 시간(초)이 지난 뒤의 첫 요청에서 기록
+    'SERVER_TIMING': os.getenv('REQUEST_METRICS_SERVER_TIMING', 'False') == 'True',  # 모든 응답에 Server-Timing 헤더 (False면 DEBUG/staff만)
+}
+
+# Prometheus Metrics (teamspace.metrics) - GET /metrics (prometheus_client 필요)
+# 여러 프로세스(gunicorn 워커, Celery prefork)의 값을 합치려면 PROMETHEUS_MULTIPROC_DIR 환경 변수를 설정합니다 (gunicorn.conf.py 참고).
+PROMETHEUS = {
+    'BEARER_TOKEN': os.getenv('PROMETHEUS_BEARER_TOKEN', ''),  # 스크레이퍼용 'Authorization: Bearer <token>'. 비어 있으면 staff 세션만 허용
+}
+
+# Task Deduplication (teamspace.task_dedup) - (태스크, 엔티티 id)별 중복 예약 방지 / 디바운스
+TASK_DEDUP = {
+    'PRECOMPUTE_COOLDOWN': int(os.getenv('TASK_DEDUP_PRECOMPUTE_COOLDOWN', 10 * 60)),  # 사전 계산 성공 후 같은 요청을 무시할 시간 (초)
+    'KEY_PREFIX': 'dedup:',
+}
+
+# Match Precompute (teamspace.tasks.precompute_matches_for_user_task / precompute_matches_for_project_task)
+PRECOMPUTE = {
+    'CHUNK_SIZE': int(os.getenv('PRECOMPUTE_CHUNK_SIZE', 500)),  # 청크 태스크 하나가 처리하는 프로젝트/사용자 수
+    'PROGRESS_TTL': int(os.getenv('PRECOMPUTE_PROGRESS_TTL', 60 * 60 * 24)),  # Redis 진행 상태 보관 시간 (초)
+}
+
+# Incremental Rescoring (teamspace.ai_services.rescore_user_matches / rescore_project_matches)
+# 프로필/프로젝트가 바뀌면 기존 MatchScores의 점수만 저장된 임베딩으로 다시 계산하고, 설명은 아래 기준을 넘을 때만 stale로 표시
+RESCORING = {
+    'FACET_DRIFT_THRESHOLD': float(os.getenv('RESCORING_FACET_DRIFT_THRESHOLD', 0.05)),  # 기술/프로필 임베딩의 코사인 거리(1 - 유사도)
+    'SCORE_THRESHOLD': float(os.getenv('RESCORING_SCORE_THRESHOLD', 5.0)),  # 매칭률이 이만큼(점) 이상 바뀐 쌍의 설명도 stale
+}
+
+# Top-K Recommendations (teamspace.models.UserTopRecommendations)
+TOP_RECOMMENDATIONS = {
+    'K': int(os.getenv('TOP_RECOMMENDATIONS_K', 100)),  # 사용자별로 저장할 추천 프로젝트 수
+    'REFRESH_AFTER_SECONDS': int(os.getenv('TOP_RECOMMENDATIONS_REFRESH_AFTER', 15 * 60)),  # 지나면 기존 목록을 주고 백그라운드 재계산
+    'MAX_STALENESS_SECONDS': int(os.getenv('TOP_RECOMMENDATIONS_MAX_STALENESS', 60 * 60)),  # 지나도 기존 목록을 주지만 경고 로그 (재계산 지연 감지용)
+}
+
+# Explanation Cache (teamspace.explanation_cache) - LLM 매칭 설명 캐시
+EXPLANATION_CACHE = {
+    'ENABLED': os.getenv('EXPLANATION_CACHE_ENABLED', 'True') == 'True',
+    'LOCAL_MAXSIZE': int(os.getenv('EXPLANATION_CACHE_LOCAL_MAXSIZE', 1000)),  # 프로세스 내 LRU 항목 수
+    'MAX_ENTRIES': int(os.getenv('EXPLANATION_CACHE_MAX_ENTRIES', 50000)),  # Redis 항목 수 상한 (초과 시 LRU 삭제)
+    'EVICT_EVERY': int(os.getenv('EXPLANATION_CACHE_EVICT_EVERY', 100)),  # 프로세스별로 이만큼 저장할 때마다 상한 확인/삭제
+    'TTL': int(os.getenv('EXPLANATION_CACHE_TTL', 60 * 60 * 24 * 7)),  # Redis 키 만료 (초)
+    'NEAR_DUPLICATE': os.getenv('EXPLANATION_CACHE_NEAR_DUPLICATE', 'False') == 'True',  # 비슷한 사용자 설명 재사용 (선택)
+    'THRESHOLD': float(os.getenv('EXPLANATION_CACHE_THRESHOLD', 0.97)),  # NEAR_DUPLICATE 코사인 유사도 기준
+    'INPUT_PRICE_PER_1M': 0.15,  # gpt-4o-mini 입력 토큰 단가 (USD, 절약 비용 집계용)
+    'OUTPUT_PRICE_PER_1M': 0.60,  # gpt-4o-mini 출력 토큰 단가 (USD)
+    'KEY_PREFIX': 'expl:',
+}
+
+# Batched Match Explanations (teamspace.ai_services.generate_match_explanations)
+EXPLANATION_BATCH = {
+    'ENABLED': os.getenv('EXPLANATION_BATCH_ENABLED', 'True') == 'True',
+    'MAX_PROJECTS': int(os.getenv('EXPLANATION_BATCH_MAX_PROJECTS', 10)),  # 한 프롬프트에 넣는 최대 프로젝트 수
+    # 오프라인 배치 작업 (teamspace.explanation_batch, python manage.py run_explanation_batch)
+    'BACKEND': os.getenv('EXPLANATION_BATCH_BACKEND', 'openai'),  # 'openai' (Batch API) 또는 'local' (파일 기반 대체)
+    'JOB_DIR': os.getenv('EXPLANATION_BATCH_JOB_DIR', os.path.join(BASE_DIR, 'explanation_batches')),
+    'COMPLETION_WINDOW': os.getenv('EXPLANATION_BATCH_COMPLETION_WINDOW', '24h'),
+    'POLL_INTERVAL': int(os.getenv('EXPLANATION_BATCH_POLL_INTERVAL', 60)),  # 작업 상태 확인 주기 (초)
+}
+
+# Embedding Cache (teamspace.embedding_cache)
+EMBEDDING_CACHE = {
+    'LOCAL_MAXSIZE': int(os.getenv('EMBEDDING_CACHE_LOCAL_MAXSIZE', 10000)),  # 프로세스 내 LRU 항목 수
+    'REDIS_URL': os.getenv('EMBEDDING_CACHE_REDIS_URL', REDIS_URL),
+    'TTL': int(os.getenv('EMBEDDING_CACHE_TTL', 60 * 60 * 24 * 30)),  # Redis 키 만료 (초)
+    'KEY_PREFIX': 'emb:',
+}
+
+# ANN Index (teamspace.ann_index) - 팀원/프로젝트 유사도 검색 인덱스
+ANN_INDEX = {
+    'BACKEND': os.getenv('ANN_INDEX_BACKEND', 'ivf'),  # 'exact' (brute-force) 또는 'ivf' (근사)
+    'DIR': os.getenv('ANN_INDEX_DIR', os.path.join(BASE_DIR, 'ann_index')),
+    'NLIST': int(os.getenv('ANN_INDEX_NLIST', 0)),  # IVF 클러스터 수 (0 = sqrt(N) 자동)
+    'NPROBE': int(os.getenv('ANN_INDEX_NPROBE', 8)),  # 검색 시 확인할 클러스터 수
+    'DELTA_MAX_BYTES': int(os.getenv('ANN_INDEX_DELTA_MAX_BYTES', 1024 * 1024)),  # 증분 변경 로그가 이 크기를 넘으면 인덱스 파일에 합침
+}
+
+# Embedding Snapshot (teamspace.embedding_snapshot) - gunicorn 워커들이 memmap으로 공유하는 임베딩 행렬
+EMBEDDING_SNAPSHOT = {
+    'DIR': os.getenv('EMBEDDING_SNAPSHOT_DIR', os.path.join(BASE_DIR, 'embedding_snapshot')),
+    'RELOAD_INTERVAL': int(os.getenv('EMBEDDING_SNAPSHOT_RELOAD_INTERVAL', 5)),  # manifest 교체 확인 주기 (초)
+}
+
+# Embedding Worker (teamspace.embedding_worker) - 모델을 소유하고 요청을 마이크로 배치로 묶어 인코딩하는 로컬 프로세스
+# SOCKET이 비어 있으면 각 프로세스가 직접 인코딩합니다. 실행: python manage.py run_embedding_worker
+EMBEDDING_WORKER = {
+    'SOCKET': os.getenv('EMBEDDING_WORKER_SOCKET', ''),  # 예: /tmp/teamspace-embedding.sock
+    'MAX_BATCH': int(os.getenv('EMBEDDING_WORKER_MAX_BATCH', 64)),  # 한 배치의 최대 텍스트 수
+    'MAX_WAIT_MS': int(os.getenv('EMBEDDING_WORKER_MAX_WAIT_MS', 10)),  # 첫 요청 이후 배치를 모으는 최대 대기 시간
+    'TIMEOUT': float(os.getenv('EMBEDDING_WORKER_TIMEOUT', 5)),  # 클라이언트 소켓 타임아웃 (초)
+}
@@ -24,11 +24,13 @@
 from django.contrib import admin
 from django.urls import path, include
 from django.http import HttpResponse
+from teamspace.views import metrics_view
 
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('teamspace.urls')),  # ✅ /api/login/ 연결됨
+    path('metrics', metrics_view, name='metrics'),  # Prometheus 스크레이프 (teamspace.metrics)
     path('', lambda request: HttpResponse("Django 서버가 실행 중입니다."))
 ]
 
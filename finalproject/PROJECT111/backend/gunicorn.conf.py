@@ -0,0 +1,34 @@
+# gunicorn 설정. 저장소 루트 Procfile의 web은 루트에서 실행되므로 -c로 이 파일을 지정합니다
+# (backend 디렉터리에서 실행하면 gunicorn이 현재 디렉터리의 gunicorn.conf.py를 자동으로 읽음)
+# 예: SBERT_PRELOAD=True gunicorn config.wsgi
+# /metrics가 모든 워커의 합계를 반환하려면 PROMETHEUS_MULTIPROC_DIR에 워커들이 공유하는 디렉터리를 지정합니다.
+# 예: PROMETHEUS_MULTIPROC_DIR=/tmp/prometheus gunicorn config.wsgi
+import glob
+import os
+
+
+def on_starting(server):
+    # 이전 실행에서 남은 지표 파일 삭제 (재시작 시 카운터가 이어서 합산되지 않도록)
+    directory = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        for path in glob.glob(os.path.join(directory, "*.db")):
+            os.remove(path)
+
+
+def post_fork(server, worker):
+    # SBERT_PRELOAD=True인 경우에만 각 워커가 요청을 받기 전에 SBERT 모델을 로드
+    # (settings.SBERT_PRELOAD와 같은 조건. 꺼져 있으면 Django를 미리 초기화하지 않고 wsgi 로드에 맡김)
+    if os.getenv("SBERT_PRELOAD", "False") != "True":
+        return
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    import django
+    django.setup()
+    from teamspace.ai_services import preload_sbert_model
+    preload_sbert_model()
+
+
+def child_exit(server, worker):
+    # 종료된 워커의 multiprocess 지표 파일 정리
+    from teamspace.metrics import mark_process_dead
+    mark_process_dead(worker.pid)
@@ -9,6 +9,7 @@ django.setup()
 
 from teamspace.models import User, Projects, ProjectEmbedding
 from teamspace.ai_services import generate_embedding # ai_services에서 임베딩 생성 함수 가져오기
+from teamspace.vectors import pack_vec
 
 def seed_database():
     # 기존 사용자를 가져오거나 없으면 새로 생성
@@ -72,7 +73,7 @@ def seed_database():
             if project_embedding_vector:
                 ProjectEmbedding.objects.create(
                     project=project,
-                    embedding=project_embedding_vector
+                    vector=pack_vec(project_embedding_vector)
                 )
                 print(f"  - 임베딩 생성 완료: '{project.title}'")
         else:
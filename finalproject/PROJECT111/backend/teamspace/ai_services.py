@@ -1,43 +1,140 @@
 import os
+import threading
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from openai import OpenAI
 from django.conf import settings
 import json
-import httpx
 import logging # Import logging
+from .embedding_cache import embedding_cache
+from .embedding_worker import embedding_client, EmbeddingWorkerUnavailable
+from .llm_client import get_llm_client
+from .explanation_cache import explanation_cache, canonical_json
+from .request_metrics import timed
+from .metrics import (
+    MATCH_SCORES_COMPUTED, MATCH_SCORING_SECONDS, CACHE_LOOKUPS, SBERT_BATCH_SIZE, SBERT_ENCODE_SECONDS,
+)
 
 logger = logging.getLogger(__name__) # Get logger instance
 
-# SBERT 모델 로드 (한 번만 로드하여 재사용)
-# settings.py에서 모델 경로를 설정합니다.
-try:
-    sbert_model = SentenceTransformer(getattr(settings, 'SBERT_MODEL_PATH'))
-except Exception as e:
-    logger.error(f"Error loading SBERT model from {getattr(settings, 'SBERT_MODEL_PATH')}: {e}")
-    sbert_model = None # 모델 로드 실패 시 None으로 설정
+# SBERT 모델은 처음 인코딩이 필요할 때 로드합니다.
+# 이 모듈은 views/serializers/signals/tasks에서 import되므로, import 시점에 로드하면
+# migrate 같은 관리 명령이나 인코딩을 하지 않는 워커까지 torch를 import하고 모델을 메모리에 올리게 됩니다.
+_sbert_model = None
+_sbert_load_failed = False
+_sbert_lock = threading.Lock()
+
+def get_sbert_model():
+    """
+    프로세스 공용 SBERT 모델을 반환합니다. 첫 호출에서 sentence_transformers(torch)를 import하고 모델을 로드합니다.
+    로드에 실패하면 None을 반환하며, 같은 프로세스에서 다시 시도하지 않습니다.
+    """
+    global _sbert_model, _sbert_load_failed
+    if _sbert_model is not None or _sbert_load_failed:
+        return _sbert_model
+    with _sbert_lock:
+        if _sbert_model is None and not _sbert_load_failed:
+            model_path = getattr(settings, 'SBERT_MODEL_PATH')
+            try:
+                from sentence_transformers import SentenceTransformer
+                _sbert_model = SentenceTransformer(model_path)
+                logger.info(f"SBERT model loaded from {model_path}")
+            except Exception as e:
+                logger.error(f"Error loading SBERT model from {model_path}: {e}")
+                _sbert_load_failed = True
+    return _sbert_model
+
+def preload_sbert_model():
+    """
+    워커 시작 시 모델을 미리 로드합니다 (settings.SBERT_PRELOAD가 True일 때 gunicorn post_fork / celery worker_process_init에서 호출).
+    """
+    if getattr(settings, 'SBERT_PRELOAD', False):
+        get_sbert_model()
+
+def encode_texts(texts: list):
+    """
+    텍스트 목록을 (len(texts), dim) float32 행렬로 인코딩합니다 (캐시 확인 없음).
+    settings.EMBEDDING_WORKER['SOCKET']이 설정되어 있으면 임베딩 워커(run_embedding_worker)에 보내
+    다른 요청들과 함께 마이크로 배치로 처리하고, 워커를 쓸 수 없으면 이 프로세스에서 직접 인코딩합니다.
+    요청 처리 중이면 인코딩 시간이 요청 측정값(RequestMetricsMiddleware)에 기록됩니다.
+    """
+    SBERT_BATCH_SIZE.observe(len(texts))
+    with timed('sbert'):
+        if embedding_client is not None:
+            try:
+                with SBERT_ENCODE_SECONDS.labels(backend='worker').time():
+                    return embedding_client.encode(texts)
+            except EmbeddingWorkerUnavailable:
+                pass
+        sbert_model = get_sbert_model()
+        if sbert_model is None:
+            return None
+        with SBERT_ENCODE_SECONDS.labels(backend='local').time():
+            return np.asarray(sbert_model.encode(texts, convert_to_tensor=False, show_progress_bar=False), dtype=np.float32) # 텐서 대신 numpy 배열로 반환
 
 def generate_embedding(text: str):
     """
     텍스트를 입력받아 SBERT 임베딩 벡터를 반환합니다.
+    같은 (모델, 정규화된 텍스트)는 embedding_cache에서 꺼내므로 모델을 다시 호출하지 않습니다.
     """
-    if sbert_model is None:
-        logger.warning("SBERT model not loaded. Cannot generate embedding.")
-        return None
     if not text:
         return None
-    embeddings = sbert_model.encode(text, convert_to_tensor=False) # 텐서 대신 numpy 배열로 반환
+    cached = embedding_cache.get(text)
+    CACHE_LOOKUPS.labels(cache='embedding', result='hit' if cached is not None else 'miss').inc()
+    if cached is not None:
+        return cached.tolist()
+    encoded = encode_texts([text])
+    if encoded is None:
+        logger.warning("SBERT model not loaded. Cannot generate embedding.")
+        return None
+    embeddings = encoded[0]
+    embedding_cache.set(text, embeddings)
     return embeddings.tolist() # JSONField에 저장하기 위해 리스트로 변환
 
-def calculate_similarity(embedding1: list, embedding2: list):
+def generate_embeddings(texts: list):
+    """
+    여러 텍스트를 한 번의 배치 호출로 인코딩하여 (len(texts), dim) float32 행렬을 반환합니다.
+    빈 텍스트는 generate_embedding과 마찬가지로 임베딩이 없는 것으로 보고 0 벡터 행으로 채웁니다.
+    """
+    non_empty = [i for i, text in enumerate(texts) if text]
+    if not non_empty:
+        return None
+
+    # 캐시에 없는 텍스트만 (중복 제거 후) 모델에 보냄
+    vectors = embedding_cache.get_many([texts[i] for i in non_empty])
+    missing = list(dict.fromkeys(texts[i] for i in non_empty if texts[i] not in vectors))
+    CACHE_LOOKUPS.labels(cache='embedding', result='hit').inc(len(vectors))
+    CACHE_LOOKUPS.labels(cache='embedding', result='miss').inc(len(missing))
+    if missing:
+        encoded = encode_texts(missing)
+        if encoded is None:
+            logger.warning("SBERT model not loaded. Cannot generate embeddings.")
+            return None
+        new_vectors = dict(zip(missing, encoded))
+        embedding_cache.set_many(new_vectors)
+        vectors.update(new_vectors)
+
+    dim = len(next(iter(vectors.values())))
+    matrix = np.zeros((len(texts), dim), dtype=np.float32)
+    for i in non_empty:
+        matrix[i] = vectors[texts[i]]
+    return matrix
+
+def normalize_rows(matrix: np.ndarray):
+    """
+    행 단위로 L2 정규화합니다. 내적이 곧 코사인 유사도가 되도록 하며, 0 벡터 행은 그대로 0으로 둡니다.
+    """
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+def calculate_similarity(embedding1, embedding2):
     """
     두 임베딩 벡터 간의 코사인 유사도를 계산합니다.
+    리스트(JSON)와 numpy 배열(바이너리 vector를 unpack_vec으로 읽은 값)을 모두 받습니다.
     """
-    if not embedding1 or not embedding2:
+    if embedding1 is None or embedding2 is None or len(embedding1) == 0 or len(embedding2) == 0:
         return 0.0 # 임베딩이 없으면 유사도 0 반환
     try:
-        vec1 = np.array(embedding1)
-        vec2 = np.array(embedding2)
+        vec1 = np.asarray(embedding1, dtype=np.float32)
+        vec2 = np.asarray(embedding2, dtype=np.float32)
         # 코사인 유사도 계산
         similarity = np.dot(vec1, vec2) / (np.linalg.norm(vec1) * np.linalg.norm(vec2))
         return float(similarity)
@@ -45,27 +142,8 @@ def calculate_similarity(embedding1: list, embedding2: list):
         logger.error(f"Error calculating similarity: {e}")
         return 0.0
 
-def generate_match_explanation(user_data: dict, project_data: dict, similarity_score: float):
-    """
-    OpenAI API를 사용하여 사용자 프로필과 프로젝트 정보 기반으로 매칭 설명을 생성하고(~습니다 말투로 해줘),
-    세부 점수를 포함한 JSON을 반환합니다.
-    """
-    api_key = os.getenv("OPENAI_API_KEY") or getattr(settings, 'OPENAI_API_KEY', None)
-    if not api_key:
-        logger.warning("OPENAI_API_KEY is not set.")
-        return None
-
-    client = OpenAI(
-        api_key=api_key,
-        http_client=httpx.Client(trust_env=False)
-    )
-
-    user_info_str = json.dumps(user_data, ensure_ascii=False, indent=2)
-    project_info_str = json.dumps(project_data, ensure_ascii=False, indent=2)
-
-    prompt = f"""사용자 프로필과 프로젝트 정보를 바탕으로, {similarity_score:.0f}% 라는 매칭률이 나온 이유를 상세히 분석해주세요. 모든 설명은 반드시 ‘~습니다’ 체로 정중하게 작성해주세요.
-
-[분석 기준]
+# 단건/배치 프롬프트가 함께 쓰는 분석 기준과 프로젝트 하나에 대한 출력 형식
+EXPLANATION_CRITERIA = """[분석 기준]
 1.  **기술 매칭 (100점 만점):** 사용자의 기술 스택과 프로젝트의 기술 스택을 비교하여 점수를 매겨주세요.
 2.  **성향 적합도 (100점 만점):** 사용자의 협업 스타일, 선호 주제 등과 프로젝트의 특성을 비교하여 점수를 매겨주세요.
 3.  **경험 수준 (100점 만점):** 사용자의 전공, 프로젝트 경험 등과 프로젝트의 연관성을 평가하여 점수를 매겨주세요.
@@ -75,29 +153,21 @@ def generate_match_explanation(user_data: dict, project_data: dict, similarity_s
         *   `additional_reasons`: 그 외에 일치하는 점 1~2가지를 추가로 요약해주세요. (예: AI/ML 분야에 대한 관심사가 일치합니다.)
     *   **상세 페이지용 (`for_detail_page`):**
         *   `positive_points`: 매칭 점수에 긍정적인 영향을 준 요인을 **기술적 측면**과 **기술 외적(성향, 경험 등) 측면**에서 각각 가장 중요한 것 1가지씩, 구체적인 데이터를 근거로 상세히 설명해주세요.
-        *   `negative_points`: 매칭 점수에 부정적인 영향을 준 요인들을 구체적인 데이터를 근거로 1~2가지 상세히 설명하고, 점수를 높이기 위한 조언을 포함해주세요.
+        *   `negative_points`: 매칭 점수에 부정적인 영향을 준 요인들을 구체적인 데이터를 근거로 1~2가지 상세히 설명하고, 점수를 높이기 위한 조언을 포함해주세요."""
 
-[사용자 정보]
-{user_info_str}
-
-[프로젝트 정보]
-{project_info_str}
-
-[출력 형식]
-반드시 아래와 같은 JSON 형식으로만 응답해주세요.
-{{
+EXPLANATION_OUTPUT_FORMAT = """{
   "tech_score": <기술 매칭 점수 (0-100 사이 정수)>,
   "personality_score": <성향 적합도 점수 (0-100 사이 정수)>,
   "experience_score": <경험 수준 점수 (0-100 사이 정수)>,
-  "explanation": {{
-      "for_recommendation_page": {{
+  "explanation": {
+      "for_recommendation_page": {
           "primary_reason": "<가장 중요한 매칭 이유 한 문장>",
           "additional_reasons": [
               "<추가적인 매칭 이유 1>",
               "<추가적인 매칭 이유 2>"
           ]
-      }},
-      "for_detail_page": {{
+      },
+      "for_detail_page": {
           "positive_points": [
               "<기술적 측면의 긍정적 요인 상세 설명>",
               "<기술 외적 측면의 긍정적 요인 상세 설명>"
@@ -106,134 +176,836 @@ def generate_match_explanation(user_data: dict, project_data: dict, similarity_s
               "<매칭률에 부정적 영향을 미친 요인 및 조언 상세 설명 1>",
               "<매칭률에 부정적 영향을 미친 요인 및 조언 상세 설명 2>"
           ]
-      }}
-  }}
-}}
+      }
+  }
+}"""
+
+# 아래 프롬프트를 바꾸면 버전을 올려 이전 프롬프트로 만든 캐시 항목을 쓰지 않도록 합니다.
+EXPLANATION_PROMPT_VERSION = "match-explanation-v1"
+
+def generate_match_explanation(user_data: dict, project_data: dict, similarity_score: float):
+    """
+    OpenAI API를 사용하여 사용자 프로필과 프로젝트 정보 기반으로 매칭 설명을 생성하고(~습니다 말투로 해줘),
+    세부 점수를 포함한 JSON을 반환합니다.
+    정규화된 입력과 반올림한 점수가 같은 요청은 explanation_cache에서 꺼내므로 LLM을 다시 호출하지 않습니다.
+    """
+    user_vector = None
+    if explanation_cache.conf.get('NEAR_DUPLICATE'):
+        user_vector = generate_embedding(canonical_json(user_data))
+    cached = explanation_cache.get(user_data, project_data, similarity_score, EXPLANATION_PROMPT_VERSION, user_vector)
+    CACHE_LOOKUPS.labels(cache='explanation', result='hit' if cached is not None else 'miss').inc()
+    if cached is not None:
+        logger.info("Match explanation served from explanation cache.")
+        return cached
+
+    client = get_llm_client() # 프로세스 공용 연결 풀 / 동시성 제한 / 재시도 (llm_client.py)
+    if client is None:
+        logger.warning("OPENAI_API_KEY is not set.")
+        return None
+    return _explain_single(client, user_data, project_data, similarity_score, user_vector)
+
+def explanation_request_body(prompt: str) -> dict:
+    """chat.completions 요청 본문. 온라인 호출과 오프라인 배치 작업(explanation_batch.py)이 함께 사용합니다."""
+    return {
+        "model": "gpt-4o-mini",
+        "messages": [
+            {"role": "system", "content": "You are a helpful assistant that analyzes the match between a user and a project and returns the result in JSON format."},
+            {"role": "user", "content": prompt}
+        ],
+        "response_format": {"type": "json_object"},
+        "temperature": 0.5,
+    }
+
+def _chat_json(client, prompt: str):
+    """JSON 모드로 LLM을 호출해 (파싱된 JSON, 토큰 사용량)을 반환합니다."""
+    response = client.chat(**explanation_request_body(prompt))
+    usage = {
+        "prompt_tokens": response.usage.prompt_tokens, "completion_tokens": response.usage.completion_tokens,
+    } if response.usage else None
+    return json.loads(response.choices[0].message.content), usage
+
+def _explain_single(client, user_data: dict, project_data: dict, similarity_score: float, user_vector=None):
+    """(사용자, 프로젝트) 한 쌍에 대한 LLM 호출. 캐시 조회는 호출하는 쪽에서 합니다."""
+    user_info_str = json.dumps(user_data, ensure_ascii=False, indent=2)
+    project_info_str = json.dumps(project_data, ensure_ascii=False, indent=2)
+
+    prompt = f"""사용자 프로필과 프로젝트 정보를 바탕으로, {similarity_score:.0f}% 라는 매칭률이 나온 이유를 상세히 분석해주세요. 모든 설명은 반드시 ‘~습니다’ 체로 정중하게 작성해주세요.
+
+{EXPLANATION_CRITERIA}
+
+[사용자 정보]
+{user_info_str}
+
+[프로젝트 정보]
+{project_info_str}
+
+[출력 형식]
+반드시 아래와 같은 JSON 형식으로만 응답해주세요.
+{EXPLANATION_OUTPUT_FORMAT}
 """
 
     try:
         logger.info("Attempting to call OpenAI API for match explanation.") # ADDED LOG
         logger.debug(f"OpenAI Prompt: {prompt[:500]}...") # ADDED LOG (프롬프트가 길 수 있으므로 일부만 로깅)
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that analyzes the match between a user and a project and returns the result in JSON format."},
-                {"role": "user", "content": prompt}
-            ],
-            response_format={"type": "json_object"},
-            temperature=0.5
-        )
+        result_json, usage = _chat_json(client, prompt)
         logger.info("Successfully received response from OpenAI API.") # ADDED LOG
-        result_json = json.loads(response.choices[0].message.content)
+        explanation_cache.set(
+            user_data, project_data, similarity_score, EXPLANATION_PROMPT_VERSION, result_json,
+            usage=usage, user_vector=user_vector,
+        )
         return result_json
     except Exception as e:
         logger.error(f"Error generating match explanation with OpenAI API: {e}", exc_info=True) # exc_info=True 추가
-        return None 
+        return None
+
+def validate_explanation(data):
+    """
+    LLM이 돌려준 설명 하나가 EXPLANATION_OUTPUT_FORMAT을 따르는지 검사합니다.
+    맞으면 점수를 0-100 정수로 맞춘 dict를, 아니면 None을 반환합니다.
+    """
+    if not isinstance(data, dict):
+        return None
+    scores = {}
+    for field in ("tech_score", "personality_score", "experience_score"):
+        value = data.get(field)
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 <= value <= 100:
+            return None
+        scores[field] = int(round(value))
+
+    explanation = data.get("explanation")
+    if not isinstance(explanation, dict):
+        return None
+    recommendation = explanation.get("for_recommendation_page")
+    detail = explanation.get("for_detail_page")
+    if not isinstance(recommendation, dict) or not isinstance(detail, dict):
+        return None
+    primary_reason = recommendation.get("primary_reason")
+    if not isinstance(primary_reason, str) or not primary_reason.strip():
+        return None
+    string_lists = (
+        recommendation.get("additional_reasons"), detail.get("positive_points"), detail.get("negative_points"),
+    )
+    if not all(isinstance(items, list) and all(isinstance(item, str) for item in items) for items in string_lists):
+        return None
+
+    return {
+        **scores,
+        "explanation": {
+            "for_recommendation_page": {"primary_reason": primary_reason, "additional_reasons": string_lists[0]},
+            "for_detail_page": {"positive_points": string_lists[1], "negative_points": string_lists[2]},
+        },
+    }
+
+def build_batch_explanation_prompt(user_data: dict, candidates: list) -> str:
+    """사용자 프로필 한 번 + 후보 프로젝트 여러 개를 담은 프롬프트. candidates: [(key, project_data, similarity_score), ...]"""
+    projects = [
+        {"project_key": position, "matching_rate": f"{score:.0f}%", **project_data}
+        for position, (_, project_data, score) in enumerate(candidates, start=1)
+    ]
+    user_info_str = json.dumps(user_data, ensure_ascii=False, indent=2)
+    projects_info_str = json.dumps(projects, ensure_ascii=False, indent=2)
+
+    return f"""한 사용자의 프로필과 여러 후보 프로젝트 정보를 바탕으로, 각 프로젝트마다 "matching_rate" 값의 매칭률이 나온 이유를 프로젝트별로 따로 상세히 분석해주세요. 모든 설명은 반드시 ‘~습니다’ 체로 정중하게 작성해주세요.
+
+{EXPLANATION_CRITERIA}
+
+[사용자 정보]
+{user_info_str}
+
+[프로젝트 목록]
+{projects_info_str}
+
+[출력 형식]
+반드시 아래와 같은 JSON 형식으로만 응답해주세요. "results"에는 [프로젝트 목록]의 모든 프로젝트가 한 번씩 들어가야 하며,
+각 항목은 해당 프로젝트의 "project_key"와 [프로젝트별 형식]의 모든 필드를 포함해야 합니다.
+{{
+  "results": [
+    {{"project_key": <프로젝트 목록의 project_key>, "tech_score": ..., "personality_score": ..., "experience_score": ..., "explanation": {{...}}}}
+  ]
+}}
+
+[프로젝트별 형식]
+{EXPLANATION_OUTPUT_FORMAT}
+"""
+
+def parse_batch_explanation_results(response_json, candidates: list) -> dict:
+    """배치 응답의 "results" 배열에서 검증을 통과한 항목만 {key: 결과}로 반환합니다."""
+    items = response_json.get("results") if isinstance(response_json, dict) else None
+    if not isinstance(items, list):
+        logger.warning("Batched match explanation response has no results array.")
+        return {}
+
+    results = {}
+    for item in items:
+        try:
+            position = int(item.get("project_key"))
+        except (AttributeError, TypeError, ValueError):
+            continue
+        if not 1 <= position <= len(candidates):
+            continue
+        key = candidates[position - 1][0]
+        result = validate_explanation(item)
+        if result is None or key in results:
+            continue
+        results[key] = result
+    return results
+
+def _explain_batch(client, user_data: dict, candidates: list, user_vector=None):
+    """
+    build_batch_explanation_prompt로 한 번에 요청합니다.
+    검증을 통과한 항목만 {key: 결과}로 반환합니다 (빠진 항목은 호출하는 쪽에서 단건으로 다시 요청).
+    """
+    prompt = build_batch_explanation_prompt(user_data, candidates)
+
+    try:
+        logger.info(f"Attempting to call OpenAI API for {len(candidates)} match explanations in one batch.")
+        response_json, usage = _chat_json(client, prompt)
+    except Exception as e:
+        logger.error(f"Error generating batched match explanations with OpenAI API: {e}", exc_info=True)
+        return {}
+
+    results = parse_batch_explanation_results(response_json, candidates)
+    # 캐시 항목마다 배치 호출 비용을 나눠서 기록 (절약 비용 집계용)
+    item_usage = {name: count // len(candidates) for name, count in usage.items()} if usage else None
+    for key, project_data, score in candidates:
+        if key in results:
+            explanation_cache.set(
+                user_data, project_data, score, EXPLANATION_PROMPT_VERSION, results[key], usage=item_usage, user_vector=user_vector,
+            )
+    return results
+
+def generate_match_explanations(user_data: dict, candidates: list):
+    """
+    한 사용자에 대한 여러 프로젝트의 매칭 설명을 배치 프롬프트로 생성합니다.
+    candidates: [(key, project_data, similarity_score), ...] -> {key: 설명 JSON 또는 None}
+
+    캐시에 없는 후보만 EXPLANATION_BATCH['MAX_PROJECTS']개씩 묶어 한 번에 요청하므로,
+    시스템 프롬프트와 사용자 프로필을 프로젝트마다 반복해서 보내지 않습니다.
+    응답에서 빠졌거나 형식 검증에 실패한 항목은 generate_match_explanation과 같은 단건 호출로 다시 요청합니다.
+    """
+    user_vector = None
+    if explanation_cache.conf.get('NEAR_DUPLICATE'):
+        user_vector = generate_embedding(canonical_json(user_data))
 
+    results, uncached = {}, []
+    for key, project_data, score in candidates:
+        cached = explanation_cache.get(user_data, project_data, score, EXPLANATION_PROMPT_VERSION, user_vector)
+        CACHE_LOOKUPS.labels(cache='explanation', result='hit' if cached is not None else 'miss').inc()
+        if cached is not None:
+            results[key] = cached
+        else:
+            uncached.append((key, project_data, score))
+    if not uncached:
+        return results
+
+    client = get_llm_client()
+    if client is None:
+        logger.warning("OPENAI_API_KEY is not set.")
+        return {**results, **{key: None for key, _, _ in uncached}}
+
+    conf = getattr(settings, 'EXPLANATION_BATCH', {})
+    batch_size = max(1, conf.get('MAX_PROJECTS', 10)) if conf.get('ENABLED', True) else 1
+    for start in range(0, len(uncached), batch_size):
+        chunk = uncached[start:start + batch_size]
+        batch_results = _explain_batch(client, user_data, chunk, user_vector) if len(chunk) > 1 else {}
+        results.update(batch_results)
+        for key, project_data, score in chunk:
+            if key not in batch_results:
+                results[key] = _explain_single(client, user_data, project_data, score, user_vector)
+        logger.info(f"Batched match explanations: {len(batch_results)}/{len(chunk)} from one request, {len(chunk) - len(batch_results)} by single calls.")
+    return results
+
+
+from datetime import timedelta
+from django.utils import timezone
+from django.db.models import Count
+from teamspace.models import (
+    User, Projects, MatchScores, UserEmbedding, ProjectEmbedding, UserFacetEmbedding, ProjectFacetEmbedding,
+    UserTopRecommendations,
+)
+from .embedding_cache import content_hash
+from .vectors import pack_vec, unpack_vec
+from .embedding_snapshot import get_snapshot
+
+# 최종 점수 = 기본 점수 + (기술 유사도 * 0.6 + 프로필 유사도 * 0.4) * 100 (최대 100점)
+BASE_SCORE = 20.0
+TECH_WEIGHT = 0.6
+PROFILE_WEIGHT = 0.4
+
+def build_user_facet_texts(user: User) -> dict:
+    """
+    사용자 정보를 facet별 임베딩 텍스트로 분리합니다.
+    tech / profile은 매칭 점수 계산용, combined는 팀원 추천 등 전체 유사도 검색용입니다.
+    """
+    combined_parts = []
+    if user.introduction:
+        combined_parts.append(user.introduction)
+    if user.major:
+        combined_parts.append(f"주 전공: {user.major}")
+    if user.specialty:
+        combined_parts.append(f"특기: {user.specialty}")
+    if user.tech_stack:
+        combined_parts.append(f"기술 스택: {user.tech_stack}")
+    if user.experience_level:
+        combined_parts.append(f"경험 수준: {user.experience_level}")
+    if user.collaboration_style:
+        combined_parts.append(f"협업 스타일: {user.collaboration_style}")
+    if user.preferred_project_topics:
+        combined_parts.append(f"선호 프로젝트 주제: {user.preferred_project_topics}")
+    if user.belbin_role:
+        combined_parts.append(f"Belbin 역할: {user.belbin_role}")
+    if user.available_region:
+        # 콤마로 구분된 문자열을 리스트로 분리하여 임베딩 텍스트에 추가
+        regions = [region.strip() for region in user.available_region.split(',') if region.strip()]
+        if regions:
+            combined_parts.append(f"활동 가능 지역: {', '.join(regions)}")
+    combined_text = " ".join(combined_parts) or (user.name or "") # 모든 항목이 비어 있으면 이름으로 대체
+
+    return {
+        'tech': user.tech_stack or "",
+        'profile': f"{user.major or ''} {user.specialty or ''} {user.experience_level or ''} {user.preferred_project_topics or ''} {user.introduction or ''}",
+        'combined': combined_text,
+    }
+
+def build_project_facet_texts(project: Projects) -> dict:
+    """프로젝트 정보를 facet별 임베딩 텍스트로 분리합니다."""
+    return {
+        'tech': project.tech_stack or "",
+        'profile': f"{project.title or ''} {project.description or ''} {project.goal or ''}",
+        'combined': f"{project.title or ''} {project.description or ''} {project.goal or ''} {project.tech_stack or ''}",
+    }
+
+# 임베딩 텍스트(build_*_facet_texts)에 쓰이는 필드. save(update_fields=...)가 이 필드를 포함하지 않으면 임베딩 갱신을 건너뜁니다.
+USER_EMBEDDED_FIELDS = frozenset([
+    'name', 'introduction', 'major', 'specialty', 'tech_stack', 'experience_level',
+    'collaboration_style', 'preferred_project_topics', 'belbin_role', 'available_region',
+])
+PROJECT_EMBEDDED_FIELDS = frozenset(['title', 'description', 'goal', 'tech_stack'])
+
+def diff_facet_texts(model, owner_field: str, texts_by_owner: dict):
+    """
+    {owner_id: {facet: text}}를 저장된 source_hash와 비교합니다 (SBERT 호출 없이 쿼리 1번).
+    (다시 인코딩할 [(owner_id, facet, text, source_hash)], 삭제할 {facet: [owner_id]})를 반환합니다.
+    """
+    version = settings.SBERT_MODEL_VERSION
+    owner_id_field = f"{owner_field}_id"
+    existing = {
+        (owner_id, facet): source_hash
+        for owner_id, facet, source_hash in model.objects.filter(
+            **{f"{owner_id_field}__in": list(texts_by_owner)}, model_version=version,
+        ).values_list(owner_id_field, 'facet', 'source_hash')
+    }
+
+    to_encode = [] # (owner_id, facet, text, source_hash)
+    to_delete = {} # facet -> [owner_id]
+    for owner_id, texts in texts_by_owner.items():
+        for facet, text in texts.items():
+            if not text.strip():
+                if (owner_id, facet) in existing:
+                    to_delete.setdefault(facet, []).append(owner_id)
+                continue
+            source_hash = content_hash(text)
+            if existing.get((owner_id, facet)) != source_hash:
+                to_encode.append((owner_id, facet, text, source_hash))
+    return to_encode, to_delete
+
+def user_embedding_needs_refresh(user: User) -> bool:
+    to_encode, to_delete = diff_facet_texts(UserFacetEmbedding, 'user', {user.pk: build_user_facet_texts(user)})
+    return bool(to_encode or to_delete)
+
+def project_embedding_needs_refresh(project: Projects) -> bool:
+    to_encode, to_delete = diff_facet_texts(ProjectFacetEmbedding, 'project', {project.pk: build_project_facet_texts(project)})
+    return bool(to_encode or to_delete)
+
+def store_facet_embeddings(model, owner_field: str, texts_by_owner: dict) -> int:
+    """
+    {owner_id: {facet: text}}를 받아 텍스트가 바뀐 facet만 인코딩하여 현재 모델 버전으로 저장합니다.
+    source_hash가 같은 facet은 건너뛰고, 텍스트가 비어 있는 facet은 삭제합니다.
+    새로 인코딩한 벡터 수를 반환합니다.
+    """
+    return len(_store_changed_facets(model, owner_field, texts_by_owner))
+
+def _store_changed_facets(model, owner_field: str, texts_by_owner: dict) -> dict:
+    """store_facet_embeddings와 같지만 새로 인코딩한 {(owner_id, facet): 벡터}를 반환합니다."""
+    version = settings.SBERT_MODEL_VERSION
+    owner_id_field = f"{owner_field}_id"
+    to_encode, to_delete = diff_facet_texts(model, owner_field, texts_by_owner)
+
+    for facet, owner_ids in to_delete.items():
+        model.objects.filter(**{f"{owner_id_field}__in": owner_ids}, facet=facet, model_version=version).delete()
+
+    if not to_encode:
+        return {}
+    matrix = generate_embeddings([text for _, _, text, _ in to_encode])
+    if matrix is None:
+        return {}
+    model.objects.bulk_create(
+        [
+            model(**{owner_id_field: owner_id}, facet=facet, model_version=version,
+                  vector=pack_vec(matrix[i]), source_hash=source_hash)
+            for i, (owner_id, facet, _, source_hash) in enumerate(to_encode)
+        ],
+        update_conflicts=True,
+        unique_fields=[owner_field, 'facet', 'model_version'],
+        update_fields=['vector', 'source_hash', 'updated_at'],
+    )
+    return {(owner_id, facet): matrix[i] for i, (owner_id, facet, _, _) in enumerate(to_encode)}
+
+def _sync_combined_embedding(embedding_model, facet_model, owner_field: str, owner, encoded: dict):
+    """
+    facet 갱신 결과(encoded)를 UserEmbedding/ProjectEmbedding에 반영하고 combined 벡터를 반환합니다.
+    combined 텍스트가 그대로면 다시 인코딩하거나 쓰지 않고 저장된 벡터를 그대로 돌려줍니다.
+    """
+    vector = encoded.get((owner.pk, 'combined'))
+    if vector is None:
+        stored = embedding_model.objects.filter(**{owner_field: owner}).first()
+        if stored is not None and stored.as_array() is not None:
+            return stored.as_array().tolist()
+        # combined 행만 빠진 경우(예: 수동 삭제): 저장된 combined facet 벡터로 채움
+        packed = facet_model.objects.filter(
+            **{owner_field: owner}, facet='combined', model_version=settings.SBERT_MODEL_VERSION,
+        ).values_list('vector', flat=True).first()
+        if packed is None:
+            return None
+        vector = unpack_vec(packed)
+    embedding, _ = embedding_model.objects.get_or_create(**{owner_field: owner})
+    embedding.set_vector(vector)
+    embedding.save()
+    return vector.tolist()
+
+def refresh_user_facet_embeddings(user: User):
+    """
+    사용자의 tech/profile/combined 임베딩을 갱신하고, combined 벡터를 UserEmbedding에도 반영합니다.
+    다시 인코딩한 facet이 있으면 combined 벡터를, 모두 그대로면 (아무것도 쓰지 않고) None을 반환합니다.
+    """
+    encoded = _store_changed_facets(UserFacetEmbedding, 'user', {user.pk: build_user_facet_texts(user)})
+    if not encoded:
+        return None
+    return _sync_combined_embedding(UserEmbedding, UserFacetEmbedding, 'user', user, encoded)
+
+def refresh_project_facet_embeddings(project: Projects):
+    """
+    프로젝트의 tech/profile/combined 임베딩을 갱신하고, combined 벡터를 ProjectEmbedding에도 반영합니다.
+    다시 인코딩한 facet이 있으면 combined 벡터를, 모두 그대로면 (아무것도 쓰지 않고) None을 반환합니다.
+    """
+    encoded = _store_changed_facets(ProjectFacetEmbedding, 'project', {project.pk: build_project_facet_texts(project)})
+    if not encoded:
+        return None
+    return _sync_combined_embedding(ProjectEmbedding, ProjectFacetEmbedding, 'project', project, encoded)
+
+def load_facet_matrix(model, owner_field: str, owner_ids: list, facet: str):
+    """
+    저장된 facet 임베딩을 owner_ids 순서의 (N, dim) 행렬로 불러옵니다 (SBERT 호출 없음).
+    행은 L2 정규화되며, 임베딩이 없는 행은 0 벡터(유사도 0)입니다. 하나도 없으면 None을 반환합니다.
+    """
+    owner_id_field = f"{owner_field}_id"
+    rows = model.objects.filter(
+        **{f"{owner_id_field}__in": owner_ids}, facet=facet, model_version=settings.SBERT_MODEL_VERSION,
+    ).values_list(owner_id_field, 'vector')
+    vectors = {owner_id: unpack_vec(vector) for owner_id, vector in rows}
+    if not vectors:
+        return None
+    position = {owner_id: i for i, owner_id in enumerate(owner_ids)}
+    matrix = np.zeros((len(owner_ids), len(next(iter(vectors.values())))), dtype=np.float32)
+    for owner_id, vec in vectors.items():
+        matrix[position[owner_id]] = vec
+    return normalize_rows(matrix)
+
+def load_user_facet_vectors(user: User):
+    """사용자의 기술/프로필 임베딩을 정규화된 (dim,) 벡터 두 개로 불러옵니다."""
+    tech_matrix = load_facet_matrix(UserFacetEmbedding, 'user', [user.pk], 'tech')
+    profile_matrix = load_facet_matrix(UserFacetEmbedding, 'user', [user.pk], 'profile')
+    if tech_matrix is None and profile_matrix is None:
+        logger.warning(f"No stored facet embeddings for user {user.pk}; run build_facet_embeddings.")
+    return (
+        tech_matrix[0] if tech_matrix is not None else None,
+        profile_matrix[0] if profile_matrix is not None else None,
+    )
+
+def facet_similarities(model, owner_field: str, owner_ids: list, facet: str, query):
+    """
+    owner_ids 순서로 저장된 facet 임베딩과 정규화된 query 벡터의 코사인 유사도 (N,)를 계산합니다.
+    공유 memmap 스냅샷(build_embedding_snapshot)이 있으면 스냅샷 블록 전체에 대한 행렬-벡터 곱을 쓰고,
+    스냅샷 이후에 갱신된 행만 DB에서 읽어 덮어씁니다. 스냅샷이 없으면 DB에서 모두 읽습니다.
+    임베딩이 없는 행은 calculate_similarity와 동일하게 유사도 0입니다.
+    """
+    if query is None or not owner_ids:
+        return np.zeros(len(owner_ids), dtype=np.float32)
+
+    snapshot = get_snapshot()
+    fresh_filter = {}
+    if snapshot is not None:
+        sims, _ = snapshot.similarities(owner_field, facet, owner_ids, query)
+        fresh_filter['updated_at__gt'] = snapshot.created_at
+    else:
+        sims = np.zeros(len(owner_ids), dtype=np.float32)
+
+    owner_id_field = f"{owner_field}_id"
+    rows = list(model.objects.filter(
+        **{f"{owner_id_field}__in": owner_ids}, facet=facet, model_version=settings.SBERT_MODEL_VERSION, **fresh_filter,
+    ).values_list(owner_id_field, 'vector'))
+    if rows:
+        position = {owner_id: i for i, owner_id in enumerate(owner_ids)}
+        matrix = normalize_rows(np.vstack([unpack_vec(vector) for _, vector in rows]))
+        sims[[position[owner_id] for owner_id, _ in rows]] = matrix @ query
+    return sims
+
+def score_projects_for_user(user: User, projects: list):
+    """
+    한 사용자에 대한 모든 프로젝트의 매칭 점수를 행렬-벡터 곱으로 한 번에 계산합니다.
+    저장된 facet 임베딩만 읽으므로 요청 처리 중에 SBERT를 호출하지 않습니다.
+    projects와 같은 순서의 (P,) float 배열(소수점 둘째 자리 반올림)을 반환합니다.
+    """
+    return score_project_ids_for_user(user, [project.pk for project in projects])
+
+def score_project_ids_for_user(user: User, project_ids: list):
+    """score_projects_for_user와 같으며, 프로젝트 객체 대신 project_id 목록을 받습니다."""
+    if not project_ids:
+        return np.zeros(0, dtype=np.float32)
+    with MATCH_SCORING_SECONDS.labels(direction='user').time():
+        user_tech, user_profile = load_user_facet_vectors(user)
+
+        tech_similarity = facet_similarities(ProjectFacetEmbedding, 'project', project_ids, 'tech', user_tech)
+        profile_similarity = facet_similarities(ProjectFacetEmbedding, 'project', project_ids, 'profile', user_profile)
+
+        weighted_score = (tech_similarity * TECH_WEIGHT + profile_similarity * PROFILE_WEIGHT) * 100
+    MATCH_SCORES_COMPUTED.labels(direction='user').inc(len(project_ids))
+    return np.round(np.minimum(BASE_SCORE + weighted_score, 100.0), 2)
+
+def load_project_facet_vectors(project: Projects):
+    """프로젝트의 기술/프로필 임베딩을 정규화된 (dim,) 벡터 두 개로 불러옵니다."""
+    tech_matrix = load_facet_matrix(ProjectFacetEmbedding, 'project', [project.pk], 'tech')
+    profile_matrix = load_facet_matrix(ProjectFacetEmbedding, 'project', [project.pk], 'profile')
+    if tech_matrix is None and profile_matrix is None:
+        logger.warning(f"No stored facet embeddings for project {project.pk}; run build_facet_embeddings.")
+    return (
+        tech_matrix[0] if tech_matrix is not None else None,
+        profile_matrix[0] if profile_matrix is not None else None,
+    )
+
+def score_user_ids_for_project(project: Projects, user_ids: list):
+    """score_project_ids_for_user의 반대 방향: 한 프로젝트에 대한 여러 사용자의 점수 (user_ids 순서)."""
+    if not user_ids:
+        return np.zeros(0, dtype=np.float32)
+    with MATCH_SCORING_SECONDS.labels(direction='project').time():
+        project_tech, project_profile = load_project_facet_vectors(project)
+
+        tech_similarity = facet_similarities(UserFacetEmbedding, 'user', user_ids, 'tech', project_tech)
+        profile_similarity = facet_similarities(UserFacetEmbedding, 'user', user_ids, 'profile', project_profile)
 
-from teamspace.models import User, Projects, MatchScores
+        weighted_score = (tech_similarity * TECH_WEIGHT + profile_similarity * PROFILE_WEIGHT) * 100
+    MATCH_SCORES_COMPUTED.labels(direction='project').inc(len(user_ids))
+    return np.round(np.minimum(BASE_SCORE + weighted_score, 100.0), 2)
+
+def store_match_scores(scored_pairs: list):
+    """
+    [(user_id, project_id, score), ...]를 MatchScores에 저장합니다 (get_or_create_match_score의 일괄 버전).
+    없는 행은 bulk_create로 만들고, 점수가 0인 행만 새 점수로 bulk_update 합니다. (생성 수, 갱신 수)를 반환합니다.
+    """
+    if not scored_pairs:
+        return 0, 0
+    existing = {
+        (entry.user_id, entry.project_id): entry
+        for entry in MatchScores.objects.filter(
+            user_id__in={user_id for user_id, _, _ in scored_pairs},
+            project_id__in={project_id for _, project_id, _ in scored_pairs},
+        ).only('user_id', 'project_id', 'score')
+    }
+    to_create, to_update = [], []
+    for user_id, project_id, score in scored_pairs:
+        entry = existing.get((user_id, project_id))
+        if entry is None:
+            to_create.append(MatchScores(user_id=user_id, project_id=project_id, score=float(score), explanation={}))
+        elif entry.score == 0.0:
+            entry.score = float(score)
+            to_update.append(entry)
+    # 동시에 만들어진 행(요청 경로)은 건너뜀 (unique_together)
+    MatchScores.objects.bulk_create(to_create, ignore_conflicts=True, batch_size=500)
+    MatchScores.objects.bulk_update(to_update, ['score'], batch_size=500)
+    return len(to_create), len(to_update)
+
+def facet_drift(before: tuple, after: tuple) -> float:
+    """
+    load_user_facet_vectors / load_project_facet_vectors 결과 두 개 사이의 변화량 (facet별 1 - 코사인 유사도 중 최댓값).
+    facet이 새로 생기거나 없어지면 1.0입니다.
+    """
+    drift = 0.0
+    for old, new in zip(before, after):
+        if old is None and new is None:
+            continue
+        if old is None or new is None:
+            return 1.0
+        drift = max(drift, 1.0 - float(np.dot(old, new)))
+    return drift
+
+def _rescore_entries(match_score_entries: list, new_scores: dict, facets_drifted: bool) -> int:
+    """
+    기존 MatchScores 행의 점수를 새 점수로 바꾸고 (행 삭제 없음), 설명이 있는 행은 필요할 때만 stale로 표시합니다.
+    facet이 크게 바뀌었거나(facets_drifted) 점수가 SCORE_THRESHOLD 이상 바뀐 경우에만 stale이 되며,
+    stale 설명은 화면에 보일 때 다시 생성됩니다. 바뀐 행 수를 반환합니다.
+    """
+    score_threshold = settings.RESCORING['SCORE_THRESHOLD']
+    changed = []
+    for entry in match_score_entries:
+        score = new_scores.get(entry.pk)
+        if score is None:
+            continue
+        score = float(score)
+        stale = entry.explanation_status == 'ready' and (facets_drifted or abs(score - entry.score) >= score_threshold)
+        if score == entry.score and not stale:
+            continue
+        entry.score = score
+        if stale:
+            entry.explanation_status = 'stale'
+        changed.append(entry)
+    MatchScores.objects.bulk_update(changed, ['score', 'explanation_status'], batch_size=500)
+    return len(changed)
+
+def rescore_user_matches(user: User, drift: float) -> int:
+    """
+    사용자 임베딩이 바뀐 뒤 이 사용자의 기존 매칭 점수를 저장된 임베딩으로 한 번에 다시 계산합니다.
+    drift는 facet_drift(이전 벡터, 새 벡터)입니다.
+    """
+    entries = list(MatchScores.objects.filter(user=user).only('user_id', 'project_id', 'score', 'explanation_status'))
+    if not entries:
+        return 0
+    scores = score_project_ids_for_user(user, [entry.project_id for entry in entries])
+    new_scores = {entry.pk: score for entry, score in zip(entries, scores)}
+    return _rescore_entries(entries, new_scores, drift >= settings.RESCORING['FACET_DRIFT_THRESHOLD'])
+
+def rescore_project_matches(project: Projects, drift: float) -> int:
+    """rescore_user_matches의 반대 방향: 프로젝트 임베딩이 바뀐 뒤 이 프로젝트의 모든 매칭 점수를 다시 계산합니다."""
+    entries = list(MatchScores.objects.filter(project=project).only('user_id', 'project_id', 'score', 'explanation_status'))
+    if not entries:
+        return 0
+    scores = score_user_ids_for_project(project, [entry.user_id for entry in entries])
+    new_scores = {entry.pk: score for entry, score in zip(entries, scores)}
+    return _rescore_entries(entries, new_scores, drift >= settings.RESCORING['FACET_DRIFT_THRESHOLD'])
+
+def compute_top_recommendations(user: User, k: int):
+    """모든 공개 프로젝트를 배치로 점수 계산하여 상위 k개의 (project_ids, scores)를 점수 내림차순으로 반환합니다."""
+    project_ids = list(Projects.objects.filter(is_open=True).values_list('project_id', flat=True))
+    scores = score_project_ids_for_user(user, project_ids)
+    order = np.argsort(-scores, kind='stable')[:k]
+    return [project_ids[i] for i in order], [round(float(scores[i]), 2) for i in order]
+
+def rebuild_top_recommendations(user: User) -> UserTopRecommendations:
+    project_ids, scores = compute_top_recommendations(user, settings.TOP_RECOMMENDATIONS['K'])
+    top, _ = UserTopRecommendations.objects.update_or_create(
+        user=user,
+        defaults={
+            'project_ids': project_ids, 'scores': scores, 'model_version': settings.SBERT_MODEL_VERSION,
+            'computed_at': timezone.now(), 'is_stale': False,
+        },
+    )
+    return top
+
+def mark_top_recommendations_stale_for_project(project: Projects, chunk_size: int = 2000) -> int:
+    """
+    프로젝트 임베딩이 바뀐 뒤, 이 프로젝트 때문에 순위가 바뀔 수 있는 사용자의 상위 K 목록만 stale로 표시합니다.
+    - 목록에 이미 이 프로젝트가 있는 사용자 (점수/순서가 바뀌거나 비공개가 되어 빠져야 함)
+    - 공개 프로젝트이고, 목록이 K개 미만이거나 새 점수가 목록의 최저(K번째) 점수보다 높은 사용자
+    표시한 행 수를 반환합니다.
+    """
+    k = settings.TOP_RECOMMENDATIONS['K']
+    rows = UserTopRecommendations.objects.filter(is_stale=False).values_list('user_id', 'project_ids', 'scores')
+    affected, candidates = [], []
+
+    def check_candidates():
+        if not candidates:
+            return
+        new_scores = score_user_ids_for_project(project, [user_id for user_id, _ in candidates])
+        affected.extend(user_id for (user_id, min_score), score in zip(candidates, new_scores) if score > min_score)
+        candidates.clear()
+
+    for user_id, project_ids, scores in rows.iterator(chunk_size=chunk_size):
+        if project.pk in project_ids:
+            affected.append(user_id)
+        elif project.is_open:
+            if len(scores) < k:
+                affected.append(user_id)
+            else:
+                candidates.append((user_id, scores[-1]))
+                if len(candidates) >= chunk_size:
+                    check_candidates()
+    check_candidates()
+
+    marked = 0
+    for start in range(0, len(affected), chunk_size):
+        marked += UserTopRecommendations.objects.filter(
+            user_id__in=affected[start:start + chunk_size], is_stale=False,
+        ).update(is_stale=True)
+    return marked
+
+def top_recommendations_age(top: UserTopRecommendations) -> float:
+    return (timezone.now() - top.computed_at).total_seconds()
+
+def get_top_recommendations(user: User) -> UserTopRecommendations:
+    """
+    사용자의 상위 K 추천 목록을 한 번의 조회로 반환합니다.
+    - 행이 없을 때만 요청 안에서 바로 계산합니다 (반환할 목록이 없으므로).
+    - 모델 버전이 다르거나, is_stale이거나, REFRESH_AFTER_SECONDS가 지났으면 기존 목록을 그대로 반환하고 재계산 태스크를 예약합니다.
+    - MAX_STALENESS_SECONDS보다 오래된 목록은 워커가 밀려 있다는 뜻이므로 경고를 남깁니다 (요청을 막지는 않음).
+    """
+    conf = settings.TOP_RECOMMENDATIONS
+    top = UserTopRecommendations.objects.filter(user=user).first()
+    if top is None:
+        return rebuild_top_recommendations(user)
+    age = top_recommendations_age(top)
+    outdated_model = top.model_version != settings.SBERT_MODEL_VERSION
+    if outdated_model or top.is_stale or age > conf['REFRESH_AFTER_SECONDS']:
+        if age > conf['MAX_STALENESS_SECONDS']:
+            logger.warning(f"Top recommendations for user {user.pk} are {age:.0f}s old; serving them until the rebuild task runs.")
+        from .tasks import enqueue_top_recommendations_rebuild # 순환 참조 피하기 위해 여기로 가져옴
+        enqueue_top_recommendations_rebuild(user.pk)
+    return top
+
+def explanation_user_data(user: User) -> dict:
+    return {
+        "major": user.major, "specialty": user.specialty, "tech_stack": user.tech_stack,
+        "experience_level": user.experience_level, "preferred_project_topics": user.preferred_project_topics,
+        "collaboration_style": user.collaboration_style, "belbin_role": user.belbin_role,
+    }
+
+def explanation_project_data(project: Projects) -> dict:
+    return {
+        "title": project.title, "description": project.description,
+        "goal": project.goal, "tech_stack": project.tech_stack,
+    }
+
+EXPLANATION_FIELDS = ['tech_score', 'personality_score', 'experience_score', 'explanation', 'explanation_status']
+
+def apply_explanation(match_score_entry: MatchScores, explanation_data):
+    if explanation_data:
+        match_score_entry.tech_score = explanation_data.get("tech_score", 0)
+        match_score_entry.personality_score = explanation_data.get("personality_score", 0)
+        match_score_entry.experience_score = explanation_data.get("experience_score", 0)
+        match_score_entry.explanation = explanation_data.get("explanation", {})
+        match_score_entry.explanation_status = 'ready'
+    else:
+        match_score_entry.explanation = {
+            "for_recommendation_page": {"primary_reason": "추천 이유를 생성하지 못했습니다.", "additional_reasons": []},
+            "for_detail_page": {"positive_points": [], "negative_points": ["추천 이유를 생성하지 못했습니다."]}
+        }
+        match_score_entry.explanation_status = 'failed'
+
+def explain_match(match_score_entry: MatchScores) -> MatchScores:
+    """
+    LLM으로 매칭 설명을 생성해 저장하고 explanation_status를 ready/failed로 바꿉니다.
+    generate_match_explanation_task(백그라운드 큐)에서 호출되며, 요청 처리 중에는 호출하지 않습니다.
+    """
+    user, project = match_score_entry.user, match_score_entry.project
+    logger.info(f"Generating match explanation for user {user.email} and project {project.title}")
+    explanation_data = generate_match_explanation(
+        explanation_user_data(user), explanation_project_data(project), match_score_entry.score,
+    )
+    apply_explanation(match_score_entry, explanation_data)
+    match_score_entry.save(update_fields=EXPLANATION_FIELDS)
+    return match_score_entry
+
+def explain_matches(match_score_entries: list) -> list:
+    """
+    explain_match의 배치 버전. 같은 사용자의 항목들을 generate_match_explanations로 묶어 요청하고
+    한 번의 bulk_update로 저장합니다 (추천 목록 한 페이지 분량의 설명을 한 번에 생성할 때 사용).
+    """
+    by_user = {}
+    for entry in match_score_entries:
+        by_user.setdefault(entry.user_id, []).append(entry)
+
+    for entries in by_user.values():
+        user = entries[0].user
+        logger.info(f"Generating {len(entries)} match explanations for user {user.email}")
+        explanations = generate_match_explanations(
+            explanation_user_data(user),
+            [(entry.project_id, explanation_project_data(entry.project), entry.score) for entry in entries],
+        )
+        for entry in entries:
+            apply_explanation(entry, explanations.get(entry.project_id))
+    MatchScores.objects.bulk_update(match_score_entries, EXPLANATION_FIELDS)
+    return match_score_entries
 
 class MatchService:
     @staticmethod
-    def get_or_create_match_score(user: User, project: Projects):
-        logger.info(f"Attempting to get or create match score for user {user.email} and project {project.title}")
+    def get_or_create_match_score(user: User, project: Projects, score: float = None, explain: bool = False):
+        """
+        사용자-프로젝트 매칭 점수를 조회하거나 새로 계산합니다. LLM을 기다리지 않고 점수만 저장한 뒤 바로 반환합니다.
+        score가 주어지면(배치 계산 결과) 임베딩 계산을 건너뛰고 그 값을 사용합니다.
+        explain=True(사용자가 실제로 보는 프로젝트)이면 설명이 아직 없을 때 설명 생성 태스크를 예약합니다.
+        """
         match_score_entry, created = MatchScores.objects.get_or_create(
             user=user, project=project,
             defaults={'score': 0.0, 'explanation': {}}
         )
 
-        # 이미 유효한 점수와 설명이 있다면 새로 계산하지 않고 즉시 반환
-        if not created and match_score_entry.explanation and match_score_entry.score != 0.0:
-            logger.info(f"Match score already exists and is valid for user {user.email} and project {project.title}. Returning existing entry.")
-            return match_score_entry
-
-        # 1. 사용자 및 프로젝트 데이터 분리 (기술 vs 프로필)
-        user_tech_text = user.tech_stack or ""
-        user_profile_text = f"{user.major or ''} {user.specialty or ''} {user.experience_level or ''} {user.preferred_project_topics or ''} {user.introduction or ''}"
-
-        project_tech_text = project.tech_stack or ""
-        project_profile_text = f"{project.title or ''} {project.description or ''} {project.goal or ''}"
-
-        # 2. 각 부분에 대한 임베딩 생성
-        user_tech_embedding = generate_embedding(user_tech_text)
-        user_profile_embedding = generate_embedding(user_profile_text)
-        project_tech_embedding = generate_embedding(project_tech_text)
-        project_profile_embedding = generate_embedding(project_profile_text)
-
-        # 3. 각 부분의 유사도 계산
-        tech_similarity = calculate_similarity(user_tech_embedding, project_tech_embedding)
-        profile_similarity = calculate_similarity(user_profile_embedding, project_profile_embedding)
-
-        # 4. 가중 평균을 이용한 최종 점수 계산 (기술: 60%, 프로필: 40%)
-        # 기본 점수 20점을 추가
-        base_score = 20.0
-        tech_weight = 0.6
-        profile_weight = 0.4
-        
-        # 최종 점수 계산
-        weighted_score = (tech_similarity * tech_weight + profile_similarity * profile_weight) * 100
-        
-        # 기본 점수를 더하되, 100점을 넘지 않도록 함
-        final_score = min(base_score + weighted_score, 100.0)
-
-        match_score_entry.score = round(final_score, 2)
-
-        # 5. 매칭 설명 생성
-        user_data = {
-            "major": user.major, "specialty": user.specialty, "tech_stack": user.tech_stack,
-            "experience_level": user.experience_level, "preferred_project_topics": user.preferred_project_topics,
-            "collaboration_style": user.collaboration_style, "belbin_role": user.belbin_role,
-        }
-        project_data = {
-            "title": project.title, "description": project.description,
-            "goal": project.goal, "tech_stack": project.tech_stack,
-        }
-        
-        logger.info(f"User tech_stack before explanation generation: {user.tech_stack}") # ADDED LOGGING
-        logger.info(f"Generating match explanation for user {user.email} and project {project.title}")
-        explanation_data = generate_match_explanation(user_data, project_data, match_score_entry.score)
-        logger.info(f"Generated explanation data: {explanation_data}")
-        if explanation_data:
-            match_score_entry.tech_score = explanation_data.get("tech_score", 0)
-            match_score_entry.personality_score = explanation_data.get("personality_score", 0)
-            match_score_entry.experience_score = explanation_data.get("experience_score", 0)
-            match_score_entry.explanation = explanation_data.get("explanation", {})
-        else:
-            match_score_entry.explanation = {
-                "for_recommendation_page": {"primary_reason": "추천 이유를 생성하지 못했습니다.", "additional_reasons": []},
-                "for_detail_page": {"positive_points": [], "negative_points": ["추천 이유를 생성하지 못했습니다."]}
-            }
-        
-        logger.info(f"Calculated weighted score {match_score_entry.score}% for user {user.email} and project {project.title}. Created: {created}")
-        
-        match_score_entry.save()
+        if created or match_score_entry.score == 0.0:
+            # 기술/프로필 임베딩 유사도의 가중 평균으로 최종 점수 계산 (배치 엔진과 동일한 경로)
+            if score is None:
+                score = score_projects_for_user(user, [project])[0]
+            match_score_entry.score = float(score)
+            match_score_entry.save(update_fields=['score'])
+            logger.info(f"Calculated weighted score {match_score_entry.score}% for user {user.email} and project {project.title}. Created: {created}")
+
+        if explain and match_score_entry.explanation_status in MatchScores.EXPLANATION_NEEDED_STATUSES:
+            from .tasks import enqueue_match_explanation # 순환 참조 피하기 위해 여기로 가져옴
+            enqueue_match_explanation(user.pk, project.pk)
         return match_score_entry
 
     @staticmethod
     def get_user_project_match(user: User, project: Projects):
         """
         특정 사용자와 프로젝트 간의 매칭 점수 및 설명을 반환합니다.
-        없으면 새로 계산하여 반환합니다.
+        없으면 점수를 새로 계산하고, 설명은 백그라운드에서 생성합니다 (explanation_status로 확인).
         """
-        return MatchService.get_or_create_match_score(user, project)
+        return MatchService.get_or_create_match_score(user, project, explain=True)
 
     @staticmethod
-    def get_recommended_projects(user: User):
+    def get_recommended_projects(user: User, top: UserTopRecommendations = None, project_ids: list = None):
+        """
+        사전 계산된 상위 K 목록(UserTopRecommendations)에서 추천 프로젝트를 점수 순으로 반환합니다.
+        project_ids가 주어지면(페이지) 그 프로젝트만 반환하며, 매칭 설명도 그 프로젝트에 대해서만
+        배치 태스크 하나로 예약합니다.
+        """
         logger.info(f"MatchService: Getting recommended projects for user {user.email}")
-        all_projects = Projects.objects.filter(is_open=True)
-        recommended_projects_data = []
+        top = top or get_top_recommendations(user)
+        score_by_id = dict(zip(top.project_ids, top.scores))
+        if project_ids is None:
+            project_ids = top.project_ids
+
+        # 목록 계산 이후 마감/삭제된 프로젝트는 제외
+        # 지원자 수는 annotate로 함께 조회 (ProjectDetailSerializer.get_applicant_count가 행마다 COUNT하지 않도록)
+        projects = (
+            Projects.objects.filter(project_id__in=project_ids, is_open=True)
+            .select_related('creator').annotate(num_applicants=Count('projectapplicants')).in_bulk()
+        )
+        existing_entries = {
+            entry.project_id: entry
+            for entry in MatchScores.objects.filter(user=user, project_id__in=list(projects))
+        }
 
-        for project in all_projects:
-            match_score_entry = MatchService.get_or_create_match_score(user, project)
+        recommended_projects_data = []
+        to_explain = []
+        for project_id in project_ids:
+            project = projects.get(project_id)
+            if project is None:
+                continue
+            match_score_entry = existing_entries.get(project_id)
+            if match_score_entry is None or match_score_entry.score == 0.0:
+                match_score_entry = MatchService.get_or_create_match_score(user, project, score=score_by_id[project_id])
+            if match_score_entry.explanation_status in MatchScores.EXPLANATION_NEEDED_STATUSES:
+                to_explain.append(project_id)
             recommended_projects_data.append({
                 'project': project,
                 'score': match_score_entry.score,
-                'explanation': match_score_entry.explanation
+                'explanation': match_score_entry.explanation,
+                'explanation_status': match_score_entry.explanation_status,
+                'match_score': match_score_entry, # 직렬화 시 다시 조회하지 않도록 (RecommendedProjectListSerializer)
             })
-        
-        recommended_projects_data.sort(key=lambda x: x['score'], reverse=True)
+
+        if to_explain:
+            # 화면에 보이는 프로젝트들의 설명을 배치 태스크 하나로 예약 (응답은 기다리지 않음)
+            from .tasks import enqueue_match_explanations # 순환 참조 피하기 위해 여기로 가져옴
+            enqueue_match_explanations(user.pk, to_explain)
+
         logger.info(f"MatchService: Found {len(recommended_projects_data)} recommended projects for user {user.email}")
-        
-        return recommended_projects_data
 
-     
\ No newline at end of file
+        return recommended_projects_data
@@ -0,0 +1,489 @@
+import base64
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+class BruteForceIndex:
+    """
+    정확한(exact) 코사인 유사도 검색. 모든 벡터와의 내적을 한 번의 행렬-벡터 곱으로 계산합니다.
+    벡터는 L2 정규화해서 보관하므로 내적 = 코사인 유사도입니다.
+    """
+
+    backend = "exact"
+
+    def __init__(self, dim: int = 0):
+        self.dim = dim
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.vectors = np.zeros((0, dim), dtype=np.float32)
+        self._row_by_id = {}
+        self.meta = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, entity_id):
+        return int(entity_id) in self._row_by_id
+
+    # --- 구성 / 증분 갱신 ---
+
+    def build(self, ids, vectors):
+        vectors = _normalize(vectors)
+        self.dim = vectors.shape[1] if vectors.ndim == 2 and len(vectors) else self.dim
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.vectors = vectors.reshape(len(self.ids), self.dim)
+        self._row_by_id = {int(entity_id): row for row, entity_id in enumerate(self.ids)}
+        return self
+
+    def upsert(self, entity_id: int, vector):
+        vector = _normalize(np.asarray(vector, dtype=np.float32).reshape(1, -1))
+        if not len(self):
+            self.dim = vector.shape[1]
+            self.vectors = np.zeros((0, self.dim), dtype=np.float32)
+        elif vector.shape[1] != self.dim:
+            # 모델이 바뀌어 차원이 다르면 섞지 않음 (전체 재구성 필요: build_ann_index)
+            raise ValueError(f"Vector dimension {vector.shape[1]} does not match index dimension {self.dim}")
+        row = self._row_by_id.get(int(entity_id))
+        if row is None:
+            self._row_by_id[int(entity_id)] = len(self.ids)
+            self.ids = np.append(self.ids, np.int64(entity_id))
+            self.vectors = np.vstack([self.vectors, vector])
+        else:
+            self.vectors[row] = vector[0]
+        return self._row_by_id[int(entity_id)]
+
+    def remove(self, entity_id: int):
+        """마지막 행을 삭제된 자리로 옮겨 O(1)로 제거합니다. 제거된 행 번호를 반환합니다."""
+        row = self._row_by_id.pop(int(entity_id), None)
+        if row is None:
+            return None
+        last = len(self.ids) - 1
+        if row != last:
+            self.ids[row] = self.ids[last]
+            self.vectors[row] = self.vectors[last]
+            self._row_by_id[int(self.ids[row])] = row
+        self.ids = self.ids[:last]
+        self.vectors = self.vectors[:last]
+        return row
+
+    # --- 검색 ---
+
+    def _candidate_rows(self, query: np.ndarray):
+        return None # None = 전체 행
+
+    def search(self, query, k: int, exclude=()):
+        """query와 가장 유사한 k개의 (id, 코사인 유사도)를 유사도 내림차순으로 반환합니다."""
+        if not len(self) or k <= 0:
+            return []
+        query = _normalize(np.asarray(query, dtype=np.float32).reshape(-1))
+        rows = self._candidate_rows(query)
+        ids = self.ids if rows is None else self.ids[rows]
+        vectors = self.vectors if rows is None else self.vectors[rows]
+        scores = vectors @ query
+        if not len(scores): # 탐색한 IVF 클러스터가 모두 비어 있는 경우
+            return []
+        if exclude:
+            scores = np.where(np.isin(ids, np.fromiter(exclude, dtype=np.int64)), -np.inf, scores)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(ids[i]), float(scores[i])) for i in top if np.isfinite(scores[i])]
+
+    # --- 저장 / 로드 ---
+
+    def _extra_arrays(self) -> dict:
+        return {}
+
+    def _load_extra(self, data):
+        pass
+
+    def save(self, path: str):
+        """임시 파일에 쓴 뒤 os.replace로 교체하므로 다른 프로세스가 쓰다 만 파일을 읽지 않습니다."""
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp.npz")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(
+                    f, backend=np.array(self.backend), ids=self.ids, vectors=self.vectors,
+                    meta=np.array(json.dumps(self.meta)), **self._extra_arrays(),
+                )
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    @staticmethod
+    def load(path: str):
+        with np.load(path, allow_pickle=False) as data:
+            index = BACKENDS[str(data["backend"])]()
+            BruteForceIndex.build(index, data["ids"], data["vectors"]) # IVF 중심은 다시 학습하지 않고 _load_extra에서 복원
+            index.meta = json.loads(str(data["meta"]))
+            index._load_extra(data)
+        return index
+
+
+class IVFIndex(BruteForceIndex):
+    """
+    IVF(inverted file) 근사 검색.
+    구면 k-means로 벡터를 nlist개의 클러스터로 나누고, 검색 시 query와 가까운 nprobe개 클러스터의 벡터만 비교합니다.
+    증분 추가된 벡터는 가장 가까운 기존 중심에 배정되며, 중심은 다음 전체 재구성 때 다시 학습됩니다.
+    """
+
+    backend = "ivf"
+    KMEANS_ITERATIONS = 10
+    KMEANS_SAMPLE = 20000
+
+    def __init__(self, dim: int = 0, nlist: int = 0, nprobe: int = 8):
+        super().__init__(dim)
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.centroids = np.zeros((0, dim), dtype=np.float32)
+        self.assignments = np.zeros(0, dtype=np.int32)
+
+    def build(self, ids, vectors):
+        super().build(ids, vectors)
+        n = len(self)
+        nlist = self.nlist or int(np.sqrt(n))
+        nlist = max(1, min(nlist, n)) if n else 0
+        self.centroids = self._train(nlist) if nlist else np.zeros((0, self.dim), dtype=np.float32)
+        self.assignments = self._assign(self.vectors)
+        return self
+
+    def _train(self, nlist: int) -> np.ndarray:
+        rng = np.random.default_rng(0)
+        sample = self.vectors
+        if len(sample) > self.KMEANS_SAMPLE:
+            sample = sample[rng.choice(len(sample), self.KMEANS_SAMPLE, replace=False)]
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(self.KMEANS_ITERATIONS):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = sample[labels == c]
+                if len(members):
+                    centroids[c] = members.sum(axis=0)
+            centroids = _normalize(centroids)
+        return centroids
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        if not len(self.centroids) or not len(vectors):
+            return np.zeros(len(vectors), dtype=np.int32)
+        return np.argmax(vectors @ self.centroids.T, axis=1).astype(np.int32)
+
+    def upsert(self, entity_id: int, vector):
+        row = super().upsert(entity_id, vector)
+        label = self._assign(self.vectors[row:row + 1])
+        if row == len(self.assignments):
+            self.assignments = np.append(self.assignments, label)
+        else:
+            self.assignments[row] = label[0]
+        return row
+
+    def remove(self, entity_id: int):
+        last = len(self.ids) - 1
+        row = super().remove(entity_id)
+        if row is not None:
+            self.assignments[row] = self.assignments[last]
+            self.assignments = self.assignments[:last]
+        return row
+
+    def _candidate_rows(self, query: np.ndarray):
+        if len(self.centroids) <= self.nprobe:
+            return None
+        probe = np.argpartition(-(self.centroids @ query), self.nprobe - 1)[:self.nprobe]
+        return np.flatnonzero(np.isin(self.assignments, probe))
+
+    def _extra_arrays(self) -> dict:
+        return {"centroids": self.centroids, "assignments": self.assignments, "nprobe": np.array(self.nprobe)}
+
+    def _load_extra(self, data):
+        self.centroids = data["centroids"]
+        self.assignments = data["assignments"]
+        self.nprobe = int(data["nprobe"])
+        self.nlist = len(self.centroids)
+
+
+BACKENDS = {
+    BruteForceIndex.backend: BruteForceIndex,
+    IVFIndex.backend: IVFIndex,
+}
+
+
+def recall_at_k(index, exact_index, queries, k: int = 10) -> float:
+    """exact_index 결과 대비 index 검색 결과의 평균 recall@k."""
+    if not len(queries):
+        return 1.0
+    recalls = []
+    for query in queries:
+        expected = {entity_id for entity_id, _ in exact_index.search(query, k)}
+        if not expected:
+            continue
+        got = {entity_id for entity_id, _ in index.search(query, k)}
+        recalls.append(len(expected & got) / len(expected))
+    return float(np.mean(recalls)) if recalls else 1.0
+
+
+class IndexStore:
+    """
+    디스크에 저장된 인덱스 하나를 프로세스 내에서 관리합니다.
+    - 기본 파일({name}.npz): 전체 인덱스. meta["generation"]으로 세대를 구분합니다.
+    - 변경 로그({name}.{세대}.delta): 증분 upsert/remove를 한 줄씩 덧붙입니다 (인덱스 전체를 다시 쓰지 않음).
+    검색 시 기본 파일 mtime이 바뀌었으면 다시 읽고, 변경 로그는 마지막으로 읽은 위치 이후만 반영합니다.
+    변경 로그가 DELTA_MAX_BYTES를 넘으면 잠금 안에서 기본 파일에 합쳐(compaction) 다음 세대로 교체합니다.
+    """
+
+    def __init__(self, name: str, loader):
+        self.name = name
+        self.loader = loader # () -> (ids, vectors): 저장된 임베딩에서 인덱스를 구성할 데이터
+        self._index = None
+        self._mtime = None
+        self._delta_offset = 0
+        self._fallback_until = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def path(self) -> str:
+        return os.path.join(settings.ANN_INDEX["DIR"], f"{self.name}.npz")
+
+    def _delta_path(self, generation: int) -> str:
+        return os.path.join(settings.ANN_INDEX["DIR"], f"{self.name}.{generation}.delta")
+
+    def _read_generation(self) -> int:
+        """저장된 인덱스의 세대 번호 (npz에서 meta만 읽음)."""
+        with np.load(self.path, allow_pickle=False) as data:
+            return int(json.loads(str(data["meta"])).get("generation", 0))
+
+    def _read_delta(self, generation: int, offset: int = 0):
+        """변경 로그에서 offset 이후의 완결된 줄 목록과 다음 offset (쓰는 중인 마지막 줄은 다음에 읽음)."""
+        try:
+            with open(self._delta_path(generation), "rb") as f:
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            return [], offset
+        end = data.rfind(b"\n") + 1
+        return data[:end].splitlines(), offset + end
+
+    @staticmethod
+    def _apply_delta(index, lines):
+        for line in lines:
+            record = json.loads(line)
+            if record["op"] == "upsert":
+                try:
+                    index.upsert(record["id"], np.frombuffer(base64.b64decode(record["vector"]), dtype=np.float32))
+                except ValueError as e:
+                    logger.warning(f"Skipping ANN index change for {record['id']}: {e}")
+            else:
+                index.remove(record["id"])
+
+    def new_index(self, backend: str = None):
+        conf = settings.ANN_INDEX
+        backend = backend or conf["BACKEND"]
+        if backend == IVFIndex.backend:
+            return IVFIndex(nlist=conf.get("NLIST", 0), nprobe=conf.get("NPROBE", 8))
+        return BACKENDS[backend]()
+
+    def build(self, backend: str = None, save: bool = True):
+        # 임베딩을 읽은 뒤에 기록된 변경은 새 인덱스에 없으므로, 저장할 때 그 부분의 변경 로그를 이어 붙임
+        index_since = self._delta_position()
+        ids, vectors = self.loader()
+        started = time.perf_counter()
+        index = self.new_index(backend).build(ids, vectors)
+        index.meta["build_seconds"] = round(time.perf_counter() - started, 3)
+        index.delta_since = index_since
+        if save:
+            self.save(index)
+        return index
+
+    def _delta_position(self):
+        """(세대, 변경 로그 크기) 또는 인덱스 파일이 없으면 None."""
+        try:
+            generation = self._read_generation()
+        except FileNotFoundError:
+            return None
+        try:
+            return generation, os.path.getsize(self._delta_path(generation))
+        except FileNotFoundError:
+            return generation, 0
+
+    def save(self, index):
+        """전체 인덱스를 다음 세대로 저장합니다. build() 이후의 변경 로그는 새 세대로 옮겨집니다."""
+        with self._file_lock():
+            generation = self._read_generation() if os.path.exists(self.path) else 0
+            tail = []
+            since = getattr(index, "delta_since", None)
+            if since is not None:
+                since_generation, since_size = since
+                # 그 사이에 compaction이 있었으면 어디까지 반영됐는지 모르므로 현재 로그 전체를 다시 적용 (upsert/remove는 멱등)
+                tail, _ = self._read_delta(generation, since_size if since_generation == generation else 0)
+            self._replace(index, generation, tail)
+
+    def _replace(self, index, generation: int, tail: list):
+        # 새 세대의 변경 로그를 먼저 쓰고 기본 파일을 교체하므로, 새 기본 파일을 읽은 프로세스는 항상 완전한 로그를 봄
+        index.meta["generation"] = generation + 1
+        if tail:
+            with open(self._delta_path(generation + 1), "wb") as f:
+                f.write(b"".join(line + b"\n" for line in tail))
+        index.save(self.path)
+        try:
+            os.unlink(self._delta_path(generation))
+        except FileNotFoundError:
+            pass
+        self._set(index)
+
+    FALLBACK_TTL_SECONDS = 60
+
+    def get(self):
+        """
+        최신 인덱스를 반환합니다. 파일이 아직 없으면 요청 안에서 인덱스를 만들지 않고
+        (IVF 학습 + 저장은 build_ann_index_task로 예약) 저장된 임베딩의 exact 인덱스를 잠시 메모리에서 씁니다.
+        """
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return self._fallback()
+        with self._lock:
+            if self._index is None or mtime != self._mtime:
+                self._index = BruteForceIndex.load(self.path)
+                self._mtime = mtime
+                self._delta_offset = 0
+            lines, self._delta_offset = self._read_delta(int(self._index.meta.get("generation", 0)), self._delta_offset)
+            self._apply_delta(self._index, lines)
+            return self._index
+
+    def _fallback(self):
+        from .tasks import enqueue_ann_index_build # tasks가 이 모듈을 import하므로 지연 import
+        with self._lock:
+            if self._mtime is None and self._index is not None and time.monotonic() < self._fallback_until:
+                return self._index
+            logger.info(f"ANN index '{self.name}' not found on disk. Using exact search until the build task saves it.")
+            ids, vectors = self.loader()
+            self._index = BruteForceIndex().build(ids, vectors)
+            self._mtime = None
+            self._fallback_until = time.monotonic() + self.FALLBACK_TTL_SECONDS
+        enqueue_ann_index_build(self.name)
+        return self._index
+
+    def search(self, query, k: int, exclude=()):
+        return self.get().search(query, k, exclude=exclude)
+
+    def upsert(self, entity_id: int, vector):
+        vector = np.ascontiguousarray(vector, dtype=np.float32).ravel()
+        index = self.get() if os.path.exists(self.path) else None # 파일이 없으면 _update도 건너뜀
+        if index is not None and len(index) and len(vector) != index.dim:
+            raise ValueError(
+                f"Vector dimension {len(vector)} does not match ANN index '{self.name}' dimension {index.dim}; "
+                f"rebuild it with build_ann_index"
+            )
+        self._update({"op": "upsert", "id": int(entity_id), "vector": base64.b64encode(vector.tobytes()).decode()})
+
+    def remove(self, entity_id: int):
+        self._update({"op": "remove", "id": int(entity_id)})
+
+    def _update(self, record: dict):
+        """변경 로그에 한 줄을 덧붙입니다 (O(1)). 로그가 DELTA_MAX_BYTES를 넘으면 기본 파일에 합칩니다."""
+        if not os.path.exists(self.path):
+            return # 아직 인덱스가 없으면 다음 전체 구성 때 최신 임베딩이 반영됨
+        with self._file_lock():
+            generation = self._read_generation()
+            with open(self._delta_path(generation), "ab") as f:
+                f.write(json.dumps(record).encode() + b"\n")
+                size = f.tell()
+            if size >= settings.ANN_INDEX.get("DELTA_MAX_BYTES", 1024 * 1024):
+                self._compact(generation)
+
+    def _compact(self, generation: int):
+        """(파일 잠금 안에서) 기본 파일에 변경 로그를 합쳐 다음 세대로 저장합니다."""
+        started = time.perf_counter()
+        index = BruteForceIndex.load(self.path)
+        lines, _ = self._read_delta(generation)
+        self._apply_delta(index, lines)
+        self._replace(index, generation, [])
+        logger.info(f"Compacted {len(lines)} ANN index changes into '{self.name}' in {time.perf_counter() - started:.3f}s")
+
+    def _set(self, index):
+        with self._lock:
+            self._index = index
+            self._mtime = os.stat(self.path).st_mtime_ns
+            self._delta_offset = 0
+
+    @contextmanager
+    def _file_lock(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(f"{self.path}.lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _load_combined_vectors(model, owner_field: str, **filters):
+    from .vectors import unpack_vec
+    rows = model.objects.filter(
+        facet="combined", model_version=settings.SBERT_MODEL_VERSION, **filters,
+    ).values_list(f"{owner_field}_id", "vector")
+    ids, vectors = [], []
+    for owner_id, vector in rows:
+        ids.append(owner_id)
+        vectors.append(unpack_vec(vector))
+    if not vectors:
+        return np.zeros(0, dtype=np.int64), np.zeros((0, 0), dtype=np.float32)
+    return np.asarray(ids, dtype=np.int64), np.vstack(vectors)
+
+
+def _load_user_vectors():
+    from .models import UserFacetEmbedding
+    return _load_combined_vectors(UserFacetEmbedding, "user")
+
+
+def _load_project_vectors():
+    from .models import ProjectFacetEmbedding
+    # 모집이 끝난 프로젝트는 추천 대상이 아니므로 인덱스에 넣지 않음 (sync_project_openness 참고)
+    return _load_combined_vectors(ProjectFacetEmbedding, "project", project__is_open=True)
+
+
+user_index = IndexStore("users", _load_user_vectors)
+project_index = IndexStore("projects", _load_project_vectors)
+STORES = {store.name: store for store in (user_index, project_index)}
+
+
+def sync_project_openness(project_id: int, is_open: bool):
+    """프로젝트가 닫히면 프로젝트 인덱스에서 빼고, 다시 열리면 저장된 combined 임베딩으로 넣습니다."""
+    if not os.path.exists(project_index.path):
+        return # 인덱스를 새로 구성할 때 is_open이 반영됨
+    present = project_id in project_index.get()
+    if not is_open and present:
+        project_index.remove(project_id)
+    elif is_open and not present:
+        from .models import ProjectFacetEmbedding
+        ids, vectors = _load_combined_vectors(ProjectFacetEmbedding, "project", project_id=project_id)
+        if len(ids):
+            project_index.upsert(project_id, vectors[0])
+
+
+def top_users_for_project(project_vector, k: int = 10, exclude_user_ids=()):
+    """프로젝트 combined 벡터와 가장 유사한 사용자 top-k [(user_id, 유사도)]."""
+    return user_index.search(project_vector, k, exclude=set(exclude_user_ids))
+
+
+def top_projects_for_user(user_vector, k: int = 10, exclude_project_ids=()):
+    """사용자 combined 벡터와 가장 유사한 프로젝트 top-k [(project_id, 유사도)]."""
+    return project_index.search(user_vector, k, exclude=set(exclude_project_ids))
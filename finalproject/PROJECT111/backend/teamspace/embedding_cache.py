@@ -0,0 +1,221 @@
+import hashlib
+import logging
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .vectors import pack_vec, unpack_vec
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    """캐시 키 계산용 정규화: 유니코드 NFC + 앞뒤 공백 제거 + 연속 공백을 한 칸으로."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def content_hash(text: str) -> str:
+    """정규화된 텍스트의 SHA-256 (저장된 임베딩의 원본 텍스트 변경 여부 판단용)."""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    """스레드 안전한 크기 제한 LRU 캐시 (프로세스 내부 1차 캐시)."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class EmbeddingCache:
+    """
+    SBERT 임베딩 2단 캐시.
+    키는 SHA-256(모델 id, 정규화된 텍스트)이고, 1차는 프로세스 내 LRU, 2차는 Redis(TTL 만료)입니다.
+    Redis 메모리 한도에 도달하면 서버의 maxmemory-policy(volatile-lru 권장)에 따라 TTL이 있는 키부터 제거됩니다.
+    Redis 장애 시에는 잠시 Redis 계층을 건너뛰고 LRU와 모델만 사용합니다.
+    """
+
+    COUNTER_NAMES = ("local_hits", "redis_hits", "misses", "writes", "redis_errors")
+    REDIS_RETRY_SECONDS = 30
+    COUNTER_FLUSH_SECONDS = 10
+
+    def __init__(self, model_id: str, local_maxsize: int, redis_url: str = None, ttl: int = None, key_prefix: str = "emb:"):
+        self.model_id = model_id
+        self.local = LRUCache(local_maxsize)
+        self.redis_url = redis_url
+        self.ttl = ttl
+        self.key_prefix = key_prefix
+        self._redis = None
+        self._redis_down_until = 0.0
+        self._lock = threading.Lock()
+        self.counters = dict.fromkeys(self.COUNTER_NAMES, 0)
+        self._unflushed = dict.fromkeys(self.COUNTER_NAMES, 0)
+        self._last_flush = time.monotonic()
+
+    @classmethod
+    def from_settings(cls):
+        conf = getattr(settings, "EMBEDDING_CACHE", {})
+        return cls(
+            model_id=getattr(settings, "SBERT_MODEL_VERSION", settings.SBERT_MODEL_PATH),
+            local_maxsize=conf.get("LOCAL_MAXSIZE", 10000),
+            redis_url=conf.get("REDIS_URL"),
+            ttl=conf.get("TTL"),
+            key_prefix=conf.get("KEY_PREFIX", "emb:"),
+        )
+
+    # --- 키 / Redis 연결 ---
+
+    def make_key(self, text: str) -> str:
+        digest = hashlib.sha256(f"{self.model_id}\x00{normalize_text(text)}".encode("utf-8")).hexdigest()
+        return f"{self.key_prefix}{digest}"
+
+    def _get_redis(self):
+        if not self.redis_url or time.monotonic() < self._redis_down_until:
+            return None
+        if self._redis is None:
+            import redis
+            self._redis = redis.Redis.from_url(self.redis_url, socket_timeout=0.2, socket_connect_timeout=0.2)
+        return self._redis
+
+    def _mark_redis_down(self, error: Exception):
+        logger.warning(f"Embedding cache: Redis unavailable, skipping for {self.REDIS_RETRY_SECONDS}s: {error}")
+        self._redis_down_until = time.monotonic() + self.REDIS_RETRY_SECONDS
+        self._count("redis_errors")
+
+    # --- 카운터 ---
+
+    def _count(self, name: str, n: int = 1):
+        if n <= 0:
+            return
+        with self._lock:
+            self.counters[name] += n
+            self._unflushed[name] += n
+        self._flush_counters_if_due()
+
+    def _flush_counters_if_due(self, force: bool = False):
+        """프로세스별 카운터를 주기적으로 Redis 해시에 합산해 여러 워커의 합계를 한 곳에서 조회할 수 있게 합니다."""
+        if not force and time.monotonic() - self._last_flush < self.COUNTER_FLUSH_SECONDS:
+            return
+        with self._lock:
+            pending = {k: v for k, v in self._unflushed.items() if v}
+            self._unflushed = dict.fromkeys(self.COUNTER_NAMES, 0)
+            self._last_flush = time.monotonic()
+        client = self._get_redis()
+        if not pending or client is None:
+            return
+        try:
+            pipe = client.pipeline()
+            for name, value in pending.items():
+                pipe.hincrby(f"{self.key_prefix}stats", name, value)
+            pipe.execute()
+        except Exception as e:
+            self._mark_redis_down(e)
+
+    def stats(self) -> dict:
+        """현재 프로세스의 카운터와 (가능하면) 전체 워커 합계를 반환합니다."""
+        self._flush_counters_if_due(force=True)
+        with self._lock:
+            local = dict(self.counters)
+        lookups = local["local_hits"] + local["redis_hits"] + local["misses"]
+        local["hit_ratio"] = round((local["local_hits"] + local["redis_hits"]) / lookups, 4) if lookups else 0.0
+        local["local_size"] = len(self.local)
+
+        cluster = None
+        client = self._get_redis()
+        if client is not None:
+            try:
+                raw = client.hgetall(f"{self.key_prefix}stats")
+                cluster = {k.decode(): int(v) for k, v in raw.items()}
+            except Exception as e:
+                self._mark_redis_down(e)
+        return {"model_id": self.model_id, "process": local, "cluster": cluster}
+
+    # --- 조회 / 저장 ---
+
+    def get_many(self, texts: list) -> dict:
+        """{text: np.ndarray} 형태로 캐시에 있는 임베딩만 반환합니다."""
+        found = {}
+        redis_keys = {}
+        for text in set(texts):
+            key = self.make_key(text)
+            vec = self.local.get(key)
+            if vec is not None:
+                found[text] = vec
+            else:
+                redis_keys[key] = text
+        self._count("local_hits", len(found))
+
+        client = self._get_redis() if redis_keys else None
+        if client is not None:
+            try:
+                keys = list(redis_keys)
+                for key, buf in zip(keys, client.mget(keys)):
+                    if buf is None:
+                        continue
+                    vec = unpack_vec(buf)
+                    self.local.set(key, vec)
+                    found[redis_keys[key]] = vec
+                self._count("redis_hits", sum(1 for key in keys if redis_keys[key] in found))
+            except Exception as e:
+                self._mark_redis_down(e)
+        self._count("misses", sum(1 for text in redis_keys.values() if text not in found))
+        return found
+
+    def get(self, text: str):
+        return self.get_many([text]).get(text)
+
+    def set_many(self, items: dict):
+        """{text: 벡터}를 LRU와 Redis에 함께 저장합니다."""
+        if not items:
+            return
+        packed = {}
+        for text, vec in items.items():
+            key = self.make_key(text)
+            buf = pack_vec(vec)
+            self.local.set(key, unpack_vec(buf))
+            packed[key] = buf
+        self._count("writes", len(packed))
+
+        client = self._get_redis()
+        if client is None:
+            return
+        try:
+            pipe = client.pipeline(transaction=False)
+            for key, buf in packed.items():
+                pipe.set(key, buf, ex=self.ttl)
+            pipe.execute()
+        except Exception as e:
+            self._mark_redis_down(e)
+
+    def set(self, text: str, vec):
+        self.set_many({text: vec})
+
+
+embedding_cache = EmbeddingCache.from_settings()
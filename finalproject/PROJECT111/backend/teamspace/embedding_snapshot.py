@@ -0,0 +1,203 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from .vectors import unpack_vec
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+def _fsync_write(path: str, write):
+    with open(path, "wb") as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def write_snapshot(directory: str = None) -> dict:
+    """
+    현재 모델 버전의 사용자/프로젝트 facet 임베딩 전체를 하나의 연속된 float32 파일로 씁니다.
+
+    - vectors-<stamp>.f32: (행 수, dim) float32, 행은 L2 정규화됨
+    - ids-<stamp>.npy: 각 행의 엔티티 id (블록 안에서 오름차순)
+    - manifest.json: 블록("user:tech" 등)별 시작 행/행 수와 파일 이름
+
+    데이터 파일을 모두 쓴 뒤 manifest.json을 os.replace로 교체하므로,
+    읽는 쪽은 항상 완성된 이전 스냅샷이나 새 스냅샷 중 하나만 보게 됩니다.
+    """
+    from .models import UserFacetEmbedding, ProjectFacetEmbedding
+
+    directory = directory or settings.EMBEDDING_SNAPSHOT["DIR"]
+    os.makedirs(directory, exist_ok=True)
+    version = settings.SBERT_MODEL_VERSION
+    created_at = timezone.now() # 이 시각 이후 갱신된 행은 읽을 때 DB에서 보충
+
+    blocks, id_chunks, matrices = {}, [], []
+    start = 0
+    dim = 0
+    for entity, model in (("user", UserFacetEmbedding), ("project", ProjectFacetEmbedding)):
+        owner_id_field = f"{entity}_id"
+        for facet in ("tech", "profile", "combined"):
+            rows = model.objects.filter(facet=facet, model_version=version).order_by(owner_id_field).values_list(owner_id_field, "vector")
+            ids, vectors = [], []
+            for owner_id, vector in rows.iterator(chunk_size=2000):
+                ids.append(owner_id)
+                vectors.append(unpack_vec(vector))
+            if not ids:
+                continue
+            matrix = _normalize(np.vstack(vectors).astype(np.float32))
+            dim = matrix.shape[1]
+            blocks[f"{entity}:{facet}"] = {"start": start, "count": len(ids)}
+            id_chunks.append(np.asarray(ids, dtype=np.int64))
+            matrices.append(matrix)
+            start += len(ids)
+
+    stamp = created_at.strftime("%Y%m%d%H%M%S%f")
+    vectors_name, ids_name = f"vectors-{stamp}.f32", f"ids-{stamp}.npy"
+    all_vectors = np.vstack(matrices) if matrices else np.zeros((0, 0), dtype=np.float32)
+    all_ids = np.concatenate(id_chunks) if id_chunks else np.zeros(0, dtype=np.int64)
+    _fsync_write(os.path.join(directory, vectors_name), lambda f: f.write(np.ascontiguousarray(all_vectors).tobytes()))
+    _fsync_write(os.path.join(directory, ids_name), lambda f: np.save(f, all_ids))
+
+    manifest = {
+        "model_version": version,
+        "created_at": created_at.isoformat(),
+        "dim": dim,
+        "rows": int(start),
+        "vectors_file": vectors_name,
+        "ids_file": ids_name,
+        "blocks": blocks,
+    }
+    previous = _read_manifest(directory)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".json.tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(manifest, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, os.path.join(directory, MANIFEST_NAME))
+    _remove_stale_files(directory, keep=[manifest, previous])
+    return manifest
+
+
+def _read_manifest(directory: str):
+    try:
+        with open(os.path.join(directory, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _remove_stale_files(directory: str, keep: list):
+    # 직전 세대 파일은 남겨 둠: manifest를 읽은 직후 아직 memmap하지 않은 프로세스가 있을 수 있음
+    # (이미 memmap한 프로세스는 파일이 unlink되어도 매핑이 유지됨)
+    keep_files = {name for m in keep if m for name in (m["vectors_file"], m["ids_file"])}
+    for name in os.listdir(directory):
+        if (name.startswith("vectors-") or name.startswith("ids-")) and name not in keep_files:
+            try:
+                os.unlink(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+
+
+class EmbeddingSnapshot:
+    """memmap으로 연 스냅샷. 같은 파일을 여는 모든 프로세스가 OS 페이지 캐시의 한 사본을 공유합니다."""
+
+    def __init__(self, directory: str, manifest: dict):
+        self.manifest = manifest
+        self.model_version = manifest["model_version"]
+        self.created_at = datetime.fromisoformat(manifest["created_at"])
+        self.blocks = manifest["blocks"]
+        rows, dim = manifest["rows"], manifest["dim"]
+        if rows:
+            self.vectors = np.memmap(os.path.join(directory, manifest["vectors_file"]), dtype=np.float32, mode="r", shape=(rows, dim))
+        else:
+            self.vectors = np.zeros((0, dim), dtype=np.float32)
+        self.ids = np.load(os.path.join(directory, manifest["ids_file"]), mmap_mode="r")
+
+    def block(self, entity: str, facet: str):
+        """(ids, 정규화된 행렬) 뷰를 반환합니다 (복사 없음). 블록이 없으면 None."""
+        info = self.blocks.get(f"{entity}:{facet}")
+        if info is None:
+            return None
+        rows = slice(info["start"], info["start"] + info["count"])
+        return self.ids[rows], self.vectors[rows]
+
+    def similarities(self, entity: str, facet: str, owner_ids, query: np.ndarray):
+        """
+        owner_ids 순서의 코사인 유사도 (N,)와, 스냅샷에 해당 행이 있었는지 여부 마스크 (N,)를 반환합니다.
+        블록 전체에 대해 한 번의 행렬-벡터 곱을 수행한 뒤 필요한 위치만 골라냅니다.
+        """
+        owner_ids = np.asarray(owner_ids, dtype=np.int64)
+        sims = np.zeros(len(owner_ids), dtype=np.float32)
+        found = np.zeros(len(owner_ids), dtype=bool)
+        block = self.block(entity, facet)
+        if block is None or not len(owner_ids):
+            return sims, found
+        block_ids, matrix = block
+        block_sims = matrix @ query
+        positions = np.searchsorted(block_ids, owner_ids)
+        positions = np.minimum(positions, len(block_ids) - 1)
+        found = block_ids[positions] == owner_ids
+        sims[found] = block_sims[positions[found]]
+        return sims, found
+
+
+class SnapshotLoader:
+    """프로세스별로 최신 스냅샷을 열어 두고, manifest가 교체되면 다시 엽니다 (RELOAD_INTERVAL 초마다 확인)."""
+
+    def __init__(self):
+        self._snapshot = None
+        self._manifest_mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        conf = getattr(settings, "EMBEDDING_SNAPSHOT", None)
+        if not conf:
+            return None
+        now = time.monotonic()
+        if now - self._checked_at < conf.get("RELOAD_INTERVAL", 5):
+            return self._snapshot
+        with self._lock:
+            self._checked_at = now
+            directory = conf["DIR"]
+            try:
+                mtime = os.stat(os.path.join(directory, MANIFEST_NAME)).st_mtime_ns
+            except FileNotFoundError:
+                self._snapshot = None
+                return None
+            if mtime != self._manifest_mtime:
+                manifest = _read_manifest(directory)
+                try:
+                    snapshot = EmbeddingSnapshot(directory, manifest) if manifest else None
+                except (FileNotFoundError, ValueError) as e:
+                    logger.warning(f"Could not open embedding snapshot: {e}")
+                    return self._snapshot
+                if snapshot and snapshot.model_version != settings.SBERT_MODEL_VERSION:
+                    logger.warning(f"Embedding snapshot model_version {snapshot.model_version} does not match {settings.SBERT_MODEL_VERSION}; ignoring it.")
+                    snapshot = None
+                self._snapshot = snapshot
+                self._manifest_mtime = mtime
+            return self._snapshot
+
+
+snapshot_loader = SnapshotLoader()
+
+
+def get_snapshot():
+    return snapshot_loader.get()
@@ -0,0 +1,199 @@
+import json
+import logging
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+from django.conf import settings
+
+from .vectors import pack_vec, unpack_vec
+
+logger = logging.getLogger(__name__)
+
+# 메시지 포맷: [uint32 길이 (little-endian)] + 본문
+#   요청 본문: JSON {"texts": [...]}
+#   응답 본문: JSON 헤더 {"ok": true, "count": n} 뒤에 pack_vec 형식의 벡터 n개 (각각 길이 prefix)
+LENGTH = struct.Struct("<I")
+
+
+def _send(sock, payload: bytes):
+    sock.sendall(LENGTH.pack(len(payload)) + payload)
+
+
+def _recv_exact(sock, size: int) -> bytes:
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            raise ConnectionError("embedding worker connection closed")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def _recv(sock) -> bytes:
+    (size,) = LENGTH.unpack(_recv_exact(sock, LENGTH.size))
+    return _recv_exact(sock, size)
+
+
+class MicroBatcher:
+    """
+    여러 요청의 텍스트를 모아 한 번의 model.encode 배치로 처리합니다.
+    첫 요청이 도착한 뒤 max_wait 초가 지나거나 텍스트가 max_batch개 모이면 바로 인코딩합니다.
+    """
+
+    def __init__(self, model, max_batch: int = 64, max_wait: float = 0.01):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, texts: list) -> Future:
+        future = Future()
+        self._queue.put((texts, future))
+        return future
+
+    def _collect(self):
+        pending = [self._queue.get()]
+        size = len(pending[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            pending.append(item)
+            size += len(item[0])
+        return pending
+
+    def _run(self):
+        while True:
+            pending = self._collect()
+            texts = [text for item_texts, _ in pending for text in item_texts]
+            try:
+                encoded = np.asarray(self.model.encode(texts, convert_to_tensor=False, show_progress_bar=False), dtype=np.float32)
+            except Exception as e:
+                logger.error(f"Embedding worker: batch of {len(texts)} texts failed: {e}")
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+            offset = 0
+            for item_texts, future in pending:
+                future.set_result(encoded[offset:offset + len(item_texts)])
+                offset += len(item_texts)
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        batcher = self.server.batcher
+        while True:
+            try:
+                request = json.loads(_recv(self.request))
+            except (ConnectionError, OSError):
+                return
+            try:
+                vectors = batcher.submit(request["texts"]).result(timeout=self.server.encode_timeout)
+                body = json.dumps({"ok": True, "count": len(vectors)}).encode()
+                payload = LENGTH.pack(len(body)) + body + b"".join(
+                    LENGTH.pack(len(buf)) + buf for buf in (pack_vec(v) for v in vectors)
+                )
+            except Exception as e:
+                body = json.dumps({"ok": False, "error": str(e)}).encode()
+                payload = LENGTH.pack(len(body)) + body
+            _send(self.request, payload)
+
+
+class EmbeddingWorkerServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """모델을 소유하는 로컬 임베딩 서버. 연결마다 스레드 하나가 요청을 MicroBatcher에 넘기고 결과를 기다립니다."""
+
+    daemon_threads = True
+    request_queue_size = 128  # 동시 접속이 몰릴 때 connect가 EAGAIN으로 실패하지 않도록 (기본값 5)
+
+    def __init__(self, socket_path: str, model, max_batch: int = 64, max_wait: float = 0.01, encode_timeout: float = 30.0):
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        self.batcher = MicroBatcher(model, max_batch=max_batch, max_wait=max_wait)
+        self.encode_timeout = encode_timeout
+        super().__init__(socket_path, _Handler)
+
+
+class EmbeddingWorkerUnavailable(Exception):
+    pass
+
+
+class EmbeddingClient:
+    """
+    임베딩 워커 클라이언트. 스레드마다 연결 하나를 재사용합니다.
+    워커에 연결할 수 없으면 EmbeddingWorkerUnavailable을 던지고 RETRY_SECONDS 동안은 연결을 시도하지 않습니다.
+    """
+
+    RETRY_SECONDS = 10
+
+    def __init__(self, socket_path: str, timeout: float = 5.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._down_until = 0.0
+
+    @classmethod
+    def from_settings(cls):
+        conf = getattr(settings, "EMBEDDING_WORKER", {})
+        if not conf.get("SOCKET"):
+            return None
+        return cls(conf["SOCKET"], timeout=conf.get("TIMEOUT", 5.0))
+
+    def _connection(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            self._local.sock = sock
+        return sock
+
+    def _close(self):
+        sock = getattr(self._local, "sock", None)
+        self._local.sock = None
+        if sock is not None:
+            sock.close()
+
+    def encode(self, texts: list) -> np.ndarray:
+        """texts를 워커에서 인코딩한 (len(texts), dim) float32 행렬을 반환합니다."""
+        if time.monotonic() < self._down_until:
+            raise EmbeddingWorkerUnavailable("embedding worker marked down")
+        try:
+            sock = self._connection()
+            _send(sock, json.dumps({"texts": texts}).encode())
+            response = _recv(sock)
+        except (OSError, ConnectionError) as e:
+            self._close()
+            self._down_until = time.monotonic() + self.RETRY_SECONDS
+            logger.warning(f"Embedding worker unavailable at {self.socket_path}, encoding in-process for {self.RETRY_SECONDS}s: {e}")
+            raise EmbeddingWorkerUnavailable(str(e)) from e
+
+        (header_size,) = LENGTH.unpack_from(response, 0)
+        header = json.loads(response[LENGTH.size:LENGTH.size + header_size])
+        if not header["ok"]:
+            raise EmbeddingWorkerUnavailable(header.get("error", "encode failed"))
+        offset = LENGTH.size + header_size
+        vectors = []
+        for _ in range(header["count"]):
+            (size,) = LENGTH.unpack_from(response, offset)
+            offset += LENGTH.size
+            vectors.append(unpack_vec(response[offset:offset + size]))
+            offset += size
+        return np.vstack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+
+
+embedding_client = EmbeddingClient.from_settings()
@@ -0,0 +1,355 @@
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .ai_services import (
+    EXPLANATION_PROMPT_VERSION, EXPLANATION_FIELDS, build_batch_explanation_prompt, explanation_request_body,
+    parse_batch_explanation_results, explanation_user_data, explanation_project_data, apply_explanation,
+)
+from .explanation_cache import explanation_cache
+from .llm_client import _api_key, _conf
+from .models import MatchScores
+
+logger = logging.getLogger(__name__)
+
+# 작업 디렉터리 구조 (EXPLANATION_BATCH['JOB_DIR']/<작업 이름>/)
+#   requests.jsonl: 배치 API 입력 (한 줄 = 한 사용자 + 최대 MAX_PROJECTS개 프로젝트의 배치 프롬프트)
+#   manifest.json: custom_id별 (user_id, [(project_id, score), ...]), 백엔드 작업 id, 상태
+#   results.jsonl: 완료 후 내려받은 배치 API 출력
+REQUESTS_NAME = "requests.jsonl"
+MANIFEST_NAME = "manifest.json"
+RESULTS_NAME = "results.jsonl"
+
+
+def _conf_batch() -> dict:
+    return getattr(settings, "EXPLANATION_BATCH", {})
+
+
+# --- 배치 백엔드 ---
+
+class BatchBackend:
+    """배치 작업 백엔드 인터페이스. status()는 'in_progress', 'completed', 'failed' 중 하나를 반환합니다."""
+
+    name = None
+
+    def submit(self, requests_path: str) -> str:
+        raise NotImplementedError
+
+    def status(self, job_id: str) -> str:
+        raise NotImplementedError
+
+    def download_results(self, job_id: str, results_path: str) -> None:
+        raise NotImplementedError
+
+
+class OpenAIBatchBackend(BatchBackend):
+    """OpenAI Batch API (/v1/batches). 온라인 요청과 별도의 한도/할인 단가로 COMPLETION_WINDOW 안에 처리됩니다."""
+
+    name = "openai"
+    FAILED_STATUSES = {"failed", "cancelling", "cancelled"}
+    # expired도 완료된 요청의 결과 파일은 남아 있으므로 받아서 반영 (나머지는 pending으로 남음)
+    DONE_STATUSES = {"completed", "expired"}
+
+    def __init__(self):
+        from openai import OpenAI
+
+        self.completion_window = _conf_batch().get("COMPLETION_WINDOW", "24h")
+        self._client = OpenAI(api_key=_api_key(), base_url=_conf().get("BASE_URL"))
+
+    def submit(self, requests_path: str) -> str:
+        with open(requests_path, "rb") as f:
+            input_file = self._client.files.create(file=f, purpose="batch")
+        batch = self._client.batches.create(
+            input_file_id=input_file.id, endpoint="/v1/chat/completions", completion_window=self.completion_window,
+        )
+        return batch.id
+
+    def status(self, job_id: str) -> str:
+        batch = self._client.batches.retrieve(job_id)
+        if batch.status in self.DONE_STATUSES:
+            return "completed"
+        if batch.status in self.FAILED_STATUSES:
+            return "failed"
+        return "in_progress"
+
+    def download_results(self, job_id: str, results_path: str) -> None:
+        batch = self._client.batches.retrieve(job_id)
+        with open(results_path, "wb") as f:
+            if batch.output_file_id:
+                f.write(self._client.files.content(batch.output_file_id).read())
+
+
+def _chat_with_llm_client(body: dict) -> dict:
+    from .llm_client import get_llm_client
+
+    client = get_llm_client()
+    if client is None:
+        raise RuntimeError("OPENAI_API_KEY is not set.")
+    return client.chat(**body).model_dump()
+
+
+class LocalFileBatchBackend(BatchBackend):
+    """
+    파일 기반 로컬 대체 백엔드 (개발/테스트용). submit은 입력 파일을 DIR로 복사하기만 하고,
+    status를 처음 확인할 때 각 요청을 handler(body) -> chat.completion dict로 처리해
+    OpenAI Batch API와 같은 형식의 출력 파일을 씁니다. handler 기본값은 공용 LLM 클라이언트입니다.
+    """
+
+    name = "local"
+
+    def __init__(self, directory: str = None, handler=None):
+        self.directory = directory or os.path.join(_conf_batch()["JOB_DIR"], "local-backend")
+        self.handler = handler or _chat_with_llm_client
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, job_id: str, suffix: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.{suffix}.jsonl")
+
+    def submit(self, requests_path: str) -> str:
+        job_id = f"local-{uuid.uuid4().hex}"
+        shutil.copyfile(requests_path, self._path(job_id, "input"))
+        return job_id
+
+    def status(self, job_id: str) -> str:
+        if not os.path.exists(self._path(job_id, "input")):
+            return "failed"
+        if not os.path.exists(self._path(job_id, "output")):
+            self._process(job_id)
+        return "completed"
+
+    def _process(self, job_id: str):
+        tmp_path = self._path(job_id, "output") + ".tmp"
+        with open(self._path(job_id, "input")) as src, open(tmp_path, "w") as dst:
+            for line in src:
+                request = json.loads(line)
+                try:
+                    output = {"status_code": 200, "body": self.handler(request["body"])}
+                    error = None
+                except Exception as e:
+                    output, error = None, {"message": str(e)}
+                dst.write(json.dumps({"custom_id": request["custom_id"], "response": output, "error": error}, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self._path(job_id, "output"))
+
+    def download_results(self, job_id: str, results_path: str) -> None:
+        shutil.copyfile(self._path(job_id, "output"), results_path)
+
+
+BACKENDS = {"openai": OpenAIBatchBackend, "local": LocalFileBatchBackend}
+
+
+def get_batch_backend(name: str = None) -> BatchBackend:
+    name = name or _conf_batch().get("BACKEND", "openai")
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown explanation batch backend '{name}' (choices: {', '.join(BACKENDS)})")
+
+
+# --- 작업 준비 / 제출 / 반영 ---
+
+def read_manifest(job_dir: str) -> dict:
+    with open(os.path.join(job_dir, MANIFEST_NAME)) as f:
+        return json.load(f)
+
+
+def _write_manifest(job_dir: str, manifest: dict):
+    tmp_path = os.path.join(job_dir, MANIFEST_NAME + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, os.path.join(job_dir, MANIFEST_NAME))
+
+
+def _in_flight_pairs(job_root: str) -> set:
+    """아직 반영되지 않은 작업에 들어 있는 (user_id, project_id) 쌍. 다음 작업에서 중복 제출하지 않습니다."""
+    pairs = set()
+    if not os.path.isdir(job_root):
+        return pairs
+    for name in os.listdir(job_root):
+        try:
+            manifest = read_manifest(os.path.join(job_root, name))
+        except (FileNotFoundError, NotADirectoryError, ValueError):
+            continue
+        if manifest.get("status") in ("applied", "failed"):
+            continue
+        for request in manifest["requests"].values():
+            pairs.update((request["user_id"], project_id) for project_id, _ in request["pairs"])
+    return pairs
+
+
+def prepare_job(limit: int = None, max_projects: int = None, job_root: str = None):
+    """
+    설명이 필요한(explanation_status가 pending 또는 stale인) 공개 프로젝트 매칭 쌍을 모아 배치 요청 파일과 manifest를 씁니다.
+    사용자별로 점수 높은 순으로 max_projects개씩 묶어 build_batch_explanation_prompt 요청 하나를 만듭니다.
+    모을 쌍이 없으면 None, 있으면 작업 디렉터리 경로를 반환합니다.
+    """
+    conf = _conf_batch()
+    job_root = job_root or conf["JOB_DIR"]
+    max_projects = max(1, max_projects or conf.get("MAX_PROJECTS", 10))
+    in_flight = _in_flight_pairs(job_root)
+
+    entries = (
+        MatchScores.objects.filter(explanation_status__in=MatchScores.EXPLANATION_NEEDED_STATUSES, project__is_open=True)
+        .select_related('user', 'project')
+        .order_by('user_id', '-score')
+    )
+    groups, count = {}, 0
+    for entry in entries.iterator(chunk_size=2000):
+        if (entry.user_id, entry.project_id) in in_flight:
+            continue
+        groups.setdefault(entry.user_id, []).append(entry)
+        count += 1
+        if limit and count >= limit:
+            break
+    if not groups:
+        return None
+
+    job_dir = os.path.join(job_root, timezone.now().strftime("%Y%m%d%H%M%S") + f"-{uuid.uuid4().hex[:6]}")
+    os.makedirs(job_dir)
+    requests = {}
+    with open(os.path.join(job_dir, REQUESTS_NAME), "w") as f:
+        for user_id, user_entries in groups.items():
+            user_data = explanation_user_data(user_entries[0].user)
+            for start in range(0, len(user_entries), max_projects):
+                chunk = user_entries[start:start + max_projects]
+                custom_id = f"explain-{user_id}-{start // max_projects}"
+                candidates = [(entry.project_id, explanation_project_data(entry.project), entry.score) for entry in chunk]
+                line = {
+                    "custom_id": custom_id, "method": "POST", "url": "/v1/chat/completions",
+                    "body": explanation_request_body(build_batch_explanation_prompt(user_data, candidates)),
+                }
+                f.write(json.dumps(line, ensure_ascii=False) + "\n")
+                requests[custom_id] = {"user_id": user_id, "pairs": [[entry.project_id, entry.score] for entry in chunk]}
+
+    _write_manifest(job_dir, {
+        "prompt_version": EXPLANATION_PROMPT_VERSION, "created_at": timezone.now().isoformat(),
+        "status": "prepared", "backend": None, "job_id": None, "pair_count": count, "requests": requests,
+    })
+    logger.info(f"Prepared explanation batch {job_dir}: {count} pairs in {len(requests)} requests")
+    return job_dir
+
+
+def submit_job(job_dir: str, backend: BatchBackend) -> str:
+    manifest = read_manifest(job_dir)
+    manifest["job_id"] = backend.submit(os.path.join(job_dir, REQUESTS_NAME))
+    manifest["backend"] = backend.name
+    manifest["status"] = "submitted"
+    _write_manifest(job_dir, manifest)
+    logger.info(f"Submitted explanation batch {job_dir} to {backend.name} as {manifest['job_id']}")
+    return manifest["job_id"]
+
+
+def wait_for_job(job_dir: str, backend: BatchBackend, poll_interval: float = 60, timeout: float = None) -> str:
+    """작업이 끝날 때까지 poll_interval 초마다 상태를 확인합니다. timeout이 지나면 'in_progress'를 반환합니다."""
+    job_id = read_manifest(job_dir)["job_id"]
+    deadline = time.monotonic() + timeout if timeout else None
+    while True:
+        status = backend.status(job_id)
+        if status != "in_progress":
+            return status
+        if deadline and time.monotonic() >= deadline:
+            return status
+        time.sleep(poll_interval)
+
+
+def _parse_output_line(line: dict):
+    """배치 출력 한 줄에서 (모델이 반환한 JSON, 토큰 사용량)을 꺼냅니다. 실패한 요청이면 (None, None)."""
+    response = line.get("response") or {}
+    if line.get("error") or response.get("status_code") != 200:
+        return None, None
+    body = response.get("body") or {}
+    try:
+        content = json.loads(body["choices"][0]["message"]["content"])
+    except (KeyError, IndexError, TypeError, ValueError):
+        return None, None
+    return content, body.get("usage")
+
+
+def apply_job_results(job_dir: str, backend: BatchBackend) -> dict:
+    """
+    완료된 작업의 결과를 내려받아 MatchScores에 bulk_update로 반영하고 설명 캐시에도 넣습니다.
+    그 사이 온라인 경로에서 설명이 생성됐거나(pending/stale이 아님) 점수가 바뀐 쌍은 건너뜁니다.
+    응답에서 빠졌거나 검증에 실패한 쌍은 pending으로 남아 다음 작업이나 온라인 경로에서 처리됩니다.
+    """
+    manifest = read_manifest(job_dir)
+    results_path = os.path.join(job_dir, RESULTS_NAME)
+    backend.download_results(manifest["job_id"], results_path)
+
+    explanations = {}  # (user_id, project_id) -> (결과, 요청당 사용량 / 항목 수)
+    with open(results_path) as f:
+        for raw in f:
+            if not raw.strip():
+                continue
+            line = json.loads(raw)
+            request = manifest["requests"].get(line.get("custom_id"))
+            if request is None:
+                continue
+            content, usage = _parse_output_line(line)
+            if content is None:
+                continue
+            candidates = [(project_id, None, score) for project_id, score in request["pairs"]]
+            item_usage = {
+                name: usage.get(name, 0) // len(candidates) for name in ("prompt_tokens", "completion_tokens")
+            } if usage else None
+            for project_id, result in parse_batch_explanation_results(content, candidates).items():
+                explanations[(request["user_id"], project_id)] = (result, item_usage)
+
+    requested_scores = {
+        (request["user_id"], project_id): score
+        for request in manifest["requests"].values() for project_id, score in request["pairs"]
+    }
+    updated, skipped = [], 0
+    for entry in _requested_entries(requested_scores):
+        key = (entry.user_id, entry.project_id)
+        if key not in explanations:
+            continue
+        if round(entry.score) != round(requested_scores[key]):
+            skipped += 1  # 제출 이후 점수가 다시 계산됨: 설명이 현재 점수와 맞지 않음
+            continue
+        result, item_usage = explanations[key]
+        apply_explanation(entry, result)
+        explanation_cache.set(
+            explanation_user_data(entry.user), explanation_project_data(entry.project), entry.score,
+            EXPLANATION_PROMPT_VERSION, result, usage=item_usage,
+        )
+        updated.append(entry)
+    MatchScores.objects.bulk_update(updated, EXPLANATION_FIELDS, batch_size=500)
+
+    summary = {
+        "pairs": manifest["pair_count"], "explained": len(explanations), "updated": len(updated),
+        "skipped_rescored": skipped, "left_pending": manifest["pair_count"] - len(explanations),
+    }
+    manifest.update(status="applied", applied_at=timezone.now().isoformat(), summary=summary)
+    _write_manifest(job_dir, manifest)
+    logger.info(f"Applied explanation batch {job_dir}: {summary}")
+    return summary
+
+
+def _requested_entries(requested_scores: dict, users_per_query: int = 200):
+    """
+    요청한 (user_id, project_id) 쌍 중 아직 설명이 필요한 MatchScores 행.
+    user_id IN x project_id IN은 사용자와 프로젝트의 모든 조합을 읽으므로, 사용자별 OR 조건으로 정확한 쌍만 조회합니다.
+    """
+    project_ids_by_user = {}
+    for user_id, project_id in requested_scores:
+        project_ids_by_user.setdefault(user_id, []).append(project_id)
+    user_ids = sorted(project_ids_by_user)
+    for start in range(0, len(user_ids), users_per_query):
+        pairs = Q()
+        for user_id in user_ids[start:start + users_per_query]:
+            pairs |= Q(user_id=user_id, project_id__in=project_ids_by_user[user_id])
+        yield from MatchScores.objects.filter(
+            pairs, explanation_status__in=MatchScores.EXPLANATION_NEEDED_STATUSES,
+        ).select_related('user', 'project')
+
+
+def mark_job_failed(job_dir: str):
+    manifest = read_manifest(job_dir)
+    manifest["status"] = "failed"
+    _write_manifest(job_dir, manifest)
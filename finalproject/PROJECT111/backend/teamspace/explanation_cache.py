@@ -0,0 +1,249 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+from .embedding_cache import LRUCache, normalize_text
+from .vectors import pack_vec, unpack_vec
+
+logger = logging.getLogger(__name__)
+
+
+def _canonical_value(value):
+    """대소문자/공백 차이와 콤마 목록의 순서 차이를 없앤 값 (예: "React, django" == "Django,React")."""
+    if value is None:
+        return ""
+    if isinstance(value, (list, tuple)):
+        return sorted(_canonical_value(v) for v in value)
+    if isinstance(value, str):
+        text = normalize_text(value).lower()
+        if "," in text:
+            return ",".join(sorted(part.strip() for part in text.split(",") if part.strip()))
+        return text
+    return value
+
+
+def canonical_json(data: dict) -> str:
+    return json.dumps({k: _canonical_value(v) for k, v in data.items()}, sort_keys=True, ensure_ascii=False)
+
+
+def canonical_hash(*parts) -> str:
+    return hashlib.sha256("\x00".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+
+
+class ExplanationCache:
+    """
+    LLM 매칭 설명 캐시. 키는 (정규화된 user_data, project_data, 반올림한 점수, 프롬프트 버전)의 SHA-256입니다.
+    - 1차: 프로세스 내 LRU, 2차: Redis (TTL 만료 + MAX_ENTRIES 초과 시 가장 오래 쓰이지 않은 항목부터 삭제)
+    - NEAR_DUPLICATE 모드(선택)에서는 같은 프로젝트/점수에 대해 user_data 임베딩의 코사인 유사도가
+      THRESHOLD 이상인 기존 설명을 재사용합니다.
+    - 적중률과 절약한 비용(저장된 토큰 사용량 x 단가)을 Redis 해시에 집계합니다.
+    """
+
+    REDIS_RETRY_SECONDS = 30
+
+    def __init__(self, conf: dict, redis_url: str = None):
+        self.conf = conf
+        self.redis_url = redis_url
+        self.prefix = conf.get("KEY_PREFIX", "expl:")
+        self.local = LRUCache(conf.get("LOCAL_MAXSIZE", 1000))
+        self._redis = None
+        self._redis_down_until = 0.0
+        self._lock = threading.Lock()
+        self._sets_since_evict = 0
+        self.counters = {"exact_hits": 0, "near_hits": 0, "misses": 0, "dollars_saved": 0.0}
+
+    @classmethod
+    def from_settings(cls):
+        return cls(getattr(settings, "EXPLANATION_CACHE", {}), getattr(settings, "REDIS_URL", None))
+
+    @property
+    def enabled(self) -> bool:
+        return self.conf.get("ENABLED", True)
+
+    # --- 키 ---
+
+    def make_key(self, user_data: dict, project_data: dict, score: float, prompt_version: str) -> str:
+        return canonical_hash(prompt_version, canonical_json(user_data), canonical_json(project_data), round(score))
+
+    def _near_bucket(self, project_data: dict, score: float, prompt_version: str) -> str:
+        # 같은 프로젝트 내용 + 같은 점수(반올림)인 항목끼리만 사용자 임베딩을 비교
+        return f"{self.prefix}near:{canonical_hash(prompt_version, canonical_json(project_data), round(score))}"
+
+    # --- Redis ---
+
+    def _get_redis(self):
+        if not self.redis_url or time.monotonic() < self._redis_down_until:
+            return None
+        if self._redis is None:
+            import redis
+            self._redis = redis.Redis.from_url(self.redis_url, socket_timeout=0.2, socket_connect_timeout=0.2)
+        return self._redis
+
+    def _mark_redis_down(self, error: Exception):
+        logger.warning(f"Explanation cache: Redis unavailable, skipping for {self.REDIS_RETRY_SECONDS}s: {error}")
+        self._redis_down_until = time.monotonic() + self.REDIS_RETRY_SECONDS
+
+    # --- 비용 / 통계 ---
+
+    def cost_of(self, usage: dict) -> float:
+        if not usage:
+            return 0.0
+        return (
+            usage.get("prompt_tokens", 0) * self.conf.get("INPUT_PRICE_PER_1M", 0.15)
+            + usage.get("completion_tokens", 0) * self.conf.get("OUTPUT_PRICE_PER_1M", 0.60)
+        ) / 1_000_000
+
+    def _record(self, name: str, saved: float = 0.0):
+        with self._lock:
+            self.counters[name] += 1
+            self.counters["dollars_saved"] += saved
+        client = self._get_redis()
+        if client is None:
+            return
+        try:
+            pipe = client.pipeline(transaction=False)
+            pipe.hincrby(f"{self.prefix}stats", name, 1)
+            if saved:
+                pipe.hincrbyfloat(f"{self.prefix}stats", "dollars_saved", saved)
+            pipe.execute()
+        except Exception as e:
+            self._mark_redis_down(e)
+
+    def stats(self) -> dict:
+        def summarize(counters):
+            hits = counters.get("exact_hits", 0) + counters.get("near_hits", 0)
+            lookups = hits + counters.get("misses", 0)
+            summary = dict(counters)
+            summary["hit_ratio"] = round(hits / lookups, 4) if lookups else 0.0
+            summary["dollars_saved"] = round(float(counters.get("dollars_saved", 0.0)), 6)
+            return summary
+
+        with self._lock:
+            process = summarize(dict(self.counters))
+        cluster = None
+        client = self._get_redis()
+        if client is not None:
+            try:
+                raw = {k.decode(): float(v) for k, v in client.hgetall(f"{self.prefix}stats").items()}
+                cluster = summarize({k: (v if k == "dollars_saved" else int(v)) for k, v in raw.items()})
+                cluster["entries"] = client.zcard(f"{self.prefix}index")
+            except Exception as e:
+                self._mark_redis_down(e)
+        return {"process": process, "cluster": cluster, "near_duplicate": self.conf.get("NEAR_DUPLICATE", False)}
+
+    # --- 조회 / 저장 ---
+
+    def _load(self, key: str):
+        entry = self.local.get(key)
+        if entry is not None:
+            return entry
+        client = self._get_redis()
+        if client is None:
+            return None
+        try:
+            # 조회와 최근 사용 시각 갱신(크기 제한 시 LRU 기준)을 한 번의 왕복으로 (xx: 인덱스에 있는 키만 갱신)
+            pipe = client.pipeline(transaction=False)
+            pipe.get(f"{self.prefix}{key}")
+            pipe.zadd(f"{self.prefix}index", {key: time.time()}, xx=True)
+            raw, _ = pipe.execute()
+        except Exception as e:
+            self._mark_redis_down(e)
+            return None
+        if raw is None:
+            return None
+        entry = json.loads(raw)
+        self.local.set(key, entry)
+        return entry
+
+    def get(self, user_data: dict, project_data: dict, score: float, prompt_version: str, user_vector=None):
+        """캐시된 설명 결과(dict)를 반환하거나, 없으면 None. user_vector는 NEAR_DUPLICATE 모드에서만 사용됩니다."""
+        if not self.enabled:
+            return None
+        entry = self._load(self.make_key(user_data, project_data, score, prompt_version))
+        if entry is not None:
+            self._record("exact_hits", self.cost_of(entry.get("usage")))
+            return entry["result"]
+
+        if self.conf.get("NEAR_DUPLICATE") and user_vector is not None:
+            entry = self._find_near_duplicate(self._near_bucket(project_data, score, prompt_version), user_vector)
+            if entry is not None:
+                self._record("near_hits", self.cost_of(entry.get("usage")))
+                return entry["result"]
+
+        self._record("misses")
+        return None
+
+    def _find_near_duplicate(self, bucket: str, user_vector):
+        client = self._get_redis()
+        if client is None:
+            return None
+        try:
+            candidates = client.hgetall(bucket)
+        except Exception as e:
+            self._mark_redis_down(e)
+            return None
+        if not candidates:
+            return None
+        keys = [k.decode() for k in candidates]
+        matrix = np.vstack([unpack_vec(v) for v in candidates.values()])
+        query = np.asarray(user_vector, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(query) or 1.0)
+        sims = (matrix @ query) / np.where(norms > 0, norms, 1.0)
+        best = int(np.argmax(sims))
+        if sims[best] < self.conf.get("THRESHOLD", 0.97):
+            return None
+        return self._load(keys[best])
+
+    def set(self, user_data: dict, project_data: dict, score: float, prompt_version: str, result: dict,
+            usage: dict = None, user_vector=None):
+        if not self.enabled or not result:
+            return
+        key = self.make_key(user_data, project_data, score, prompt_version)
+        entry = {"result": result, "usage": usage or {}}
+        self.local.set(key, entry)
+        client = self._get_redis()
+        if client is None:
+            return
+        ttl = self.conf.get("TTL")
+        try:
+            pipe = client.pipeline(transaction=False)
+            pipe.set(f"{self.prefix}{key}", json.dumps(entry, ensure_ascii=False), ex=ttl)
+            pipe.zadd(f"{self.prefix}index", {key: time.time()})
+            if self.conf.get("NEAR_DUPLICATE") and user_vector is not None:
+                bucket = self._near_bucket(project_data, score, prompt_version)
+                pipe.hset(bucket, key, pack_vec(user_vector))
+                pipe.expire(bucket, ttl)
+            pipe.execute()
+            if self._eviction_due():
+                self._evict(client)
+        except Exception as e:
+            self._mark_redis_down(e)
+
+    def _eviction_due(self) -> bool:
+        # 크기 확인(zcard)은 저장할 때마다가 아니라 이 프로세스에서 EVICT_EVERY번 저장할 때마다 한 번
+        with self._lock:
+            self._sets_since_evict += 1
+            if self._sets_since_evict < self.conf.get("EVICT_EVERY", 100):
+                return False
+            self._sets_since_evict = 0
+            return True
+
+    def _evict(self, client):
+        """
+        MAX_ENTRIES를 넘으면 가장 오래 사용되지 않은 항목부터 삭제합니다 (TTL로 이미 만료된 키도 인덱스에서 정리됨).
+        EVICT_EVERY번의 저장마다 실행되므로 그 사이에는 상한을 프로세스당 최대 EVICT_EVERY개까지 넘을 수 있습니다.
+        """
+        overflow = client.zcard(f"{self.prefix}index") - self.conf.get("MAX_ENTRIES", 50000)
+        if overflow <= 0:
+            return
+        evicted = [k.decode() for k, _ in client.zpopmin(f"{self.prefix}index", overflow)]
+        if evicted:
+            client.delete(*[f"{self.prefix}{k}" for k in evicted])
+
+
+explanation_cache = ExplanationCache.from_settings()
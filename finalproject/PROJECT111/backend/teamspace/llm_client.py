@@ -0,0 +1,201 @@
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+import weakref
+
+import httpx
+from django.conf import settings
+
+from .rate_limiter import llm_rate_limiter
+from .request_metrics import timed
+from .metrics import LLM_REQUEST_SECONDS, LLM_TOKENS, LLM_ERRORS
+
+logger = logging.getLogger(__name__)
+
+# 재시도 대상: 429 (rate limit), 5xx, 연결 실패, 타임아웃
+RETRYABLE_STATUS = {408, 409, 429}
+
+
+def _conf() -> dict:
+    return getattr(settings, "LLM_CLIENT", {})
+
+
+def _api_key():
+    return os.getenv("OPENAI_API_KEY") or getattr(settings, "OPENAI_API_KEY", None)
+
+
+def _is_retryable(error: Exception) -> bool:
+    import openai
+
+    if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in RETRYABLE_STATUS or error.status_code >= 500
+    return False
+
+
+def _retry_delay(error: Exception, attempt: int) -> float:
+    """Retry-After 헤더가 있으면 따르고, 없으면 full jitter 지수 백오프 (0 ~ base * 2^attempt, 최대 BACKOFF_MAX)."""
+    conf = _conf()
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), conf.get("BACKOFF_MAX", 20.0))
+        except ValueError:
+            pass
+    ceiling = min(conf.get("BACKOFF_BASE", 0.5) * (2 ** attempt), conf.get("BACKOFF_MAX", 20.0))
+    return random.uniform(0, ceiling)
+
+
+def _reconcile_usage(estimated_tokens: int, response):
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        llm_rate_limiter.reconcile(estimated_tokens, usage.total_tokens)
+        LLM_TOKENS.labels(kind="prompt").inc(usage.prompt_tokens or 0)
+        LLM_TOKENS.labels(kind="completion").inc(usage.completion_tokens or 0)
+
+
+def _record_attempt(started: float, error: Exception = None):
+    # 재시도를 포함한 시도마다 지연 시간 기록 (실패는 예외 종류별로도 집계)
+    LLM_REQUEST_SECONDS.labels(outcome="error" if error else "ok").observe(time.perf_counter() - started)
+    if error is not None:
+        LLM_ERRORS.labels(error=error.__class__.__name__).inc()
+
+
+def _timeout() -> httpx.Timeout:
+    conf = _conf()
+    return httpx.Timeout(conf.get("TIMEOUT", 30.0), connect=conf.get("CONNECT_TIMEOUT", 5.0))
+
+
+def _limits() -> httpx.Limits:
+    pool_size = _conf().get("POOL_SIZE", 20)
+    return httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size, keepalive_expiry=60)
+
+
+class LLMClient:
+    """
+    프로세스 공용 OpenAI 클라이언트 (동기).
+    keep-alive 연결 풀 하나를 재사용하고, MAX_CONCURRENCY로 동시 요청 수를 제한하며,
+    429/5xx/연결 오류는 지터가 있는 지수 백오프로 재시도합니다 (백오프 대기 중에는 동시성 슬롯을 반납).
+    매 시도 전에 모든 프로세스가 공유하는 RPM/TPM 토큰 버킷(rate_limiter.py)에서 예산을 받을 때까지 기다립니다.
+    """
+
+    def __init__(self, api_key: str):
+        from openai import OpenAI
+
+        conf = _conf()
+        self.max_retries = conf.get("MAX_RETRIES", 4)
+        self._semaphore = threading.BoundedSemaphore(conf.get("MAX_CONCURRENCY", 8))
+        self._http_client = httpx.Client(timeout=_timeout(), limits=_limits(), trust_env=False)
+        # SDK 자체 재시도는 끄고 아래의 재시도 루프만 사용
+        self._client = OpenAI(
+            api_key=api_key, base_url=conf.get("BASE_URL"), http_client=self._http_client, max_retries=0,
+        )
+
+    def chat(self, **kwargs):
+        """client.chat.completions.create(**kwargs)와 같으며, 재시도 후에도 실패하면 마지막 예외를 던집니다."""
+        estimated_tokens = llm_rate_limiter.estimate_tokens(kwargs.get("messages"), kwargs.get("max_tokens"))
+        with timed("llm"): # 요청 처리 중이면 대기/재시도를 포함한 호출 시간을 기록
+            attempt = 0
+            while True:
+                llm_rate_limiter.acquire(estimated_tokens) # 동시성 슬롯을 잡기 전에 대기
+                with self._semaphore:
+                    started = time.perf_counter()
+                    try:
+                        response = self._client.chat.completions.create(**kwargs)
+                        _record_attempt(started)
+                        _reconcile_usage(estimated_tokens, response)
+                        return response
+                    except Exception as e:
+                        _record_attempt(started, e)
+                        if attempt >= self.max_retries or not _is_retryable(e):
+                            raise
+                        error = e
+                delay = _retry_delay(error, attempt)
+                logger.warning(f"LLM request failed ({error.__class__.__name__}), retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+                time.sleep(delay)
+                attempt += 1
+
+    def close(self):
+        self._http_client.close()
+
+
+class AsyncLLMClient:
+    """LLMClient의 asyncio 버전. 이벤트 루프마다 하나씩 만들어집니다 (httpx.AsyncClient와 세마포어가 루프에 묶이므로)."""
+
+    def __init__(self, api_key: str):
+        from openai import AsyncOpenAI
+
+        conf = _conf()
+        self.max_retries = conf.get("MAX_RETRIES", 4)
+        self._semaphore = asyncio.Semaphore(conf.get("MAX_CONCURRENCY", 8))
+        self._http_client = httpx.AsyncClient(timeout=_timeout(), limits=_limits(), trust_env=False)
+        self._client = AsyncOpenAI(
+            api_key=api_key, base_url=conf.get("BASE_URL"), http_client=self._http_client, max_retries=0,
+        )
+
+    async def chat(self, **kwargs):
+        estimated_tokens = llm_rate_limiter.estimate_tokens(kwargs.get("messages"), kwargs.get("max_tokens"))
+        with timed("llm"): # 요청 처리 중이면 대기/재시도를 포함한 호출 시간을 기록
+            attempt = 0
+            while True:
+                await llm_rate_limiter.acquire_async(estimated_tokens)
+                async with self._semaphore:
+                    started = time.perf_counter()
+                    try:
+                        response = await self._client.chat.completions.create(**kwargs)
+                        _record_attempt(started)
+                        _reconcile_usage(estimated_tokens, response)
+                        return response
+                    except Exception as e:
+                        _record_attempt(started, e)
+                        if attempt >= self.max_retries or not _is_retryable(e):
+                            raise
+                        error = e
+                delay = _retry_delay(error, attempt)
+                logger.warning(f"LLM request failed ({error.__class__.__name__}), retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    async def aclose(self):
+        await self._http_client.aclose()
+
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_llm_client():
+    """
+    프로세스 공용 LLMClient를 반환합니다. OPENAI_API_KEY가 없으면 None.
+    fork된 워커(gunicorn/celery prefork)는 부모의 연결을 공유하지 않도록 자신의 클라이언트를 새로 만듭니다.
+    """
+    global _client, _client_pid
+    if _client is not None and _client_pid == os.getpid():
+        return _client
+    api_key = _api_key()
+    if not api_key:
+        return None
+    with _client_lock:
+        if _client is None or _client_pid != os.getpid():
+            _client = LLMClient(api_key)
+            _client_pid = os.getpid()
+    return _client
+
+
+def get_async_llm_client():
+    """현재 이벤트 루프의 AsyncLLMClient를 반환합니다 (코루틴 안에서 호출). OPENAI_API_KEY가 없으면 None."""
+    api_key = _api_key()
+    if not api_key:
+        return None
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = AsyncLLMClient(api_key)
+    return client
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from teamspace.models import UserEmbedding, ProjectEmbedding
+
+
+class Command(BaseCommand):
+    help = "JSON(embedding)으로 저장된 기존 임베딩을 float32 바이너리(vector) 컬럼으로 변환합니다."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="한 번에 변환/저장할 행 수")
+        parser.add_argument("--keep-json", action="store_true", help="변환 후에도 기존 JSON 값을 지우지 않음")
+
+    def handle(self, *args, **opts):
+        batch_size = opts["batch_size"]
+        keep_json = opts["keep_json"]
+        for model in (UserEmbedding, ProjectEmbedding):
+            converted = self._backfill(model, batch_size, keep_json)
+            self.stdout.write(self.style.SUCCESS(f"{model.__name__}: {converted} rows converted."))
+
+    def _backfill(self, model, batch_size: int, keep_json: bool) -> int:
+        converted = 0
+        last_pk = 0
+        while True:
+            # pk 기준 키셋 페이지네이션 (변환된 행은 조건에서 빠지므로 OFFSET을 쓰지 않음)
+            rows = list(
+                model.objects.filter(vector__isnull=True, embedding__isnull=False, pk__gt=last_pk)
+                .order_by("pk")[:batch_size]
+            )
+            if not rows:
+                return converted
+            last_pk = rows[-1].pk
+
+            to_update = []
+            for row in rows:
+                if not row.embedding:
+                    continue
+                json_embedding = row.embedding
+                row.set_vector(row.embedding)
+                if keep_json:
+                    row.embedding = json_embedding
+                to_update.append(row)
+
+            with transaction.atomic():
+                model.objects.bulk_update(to_update, ["vector", "embedding"])
+            converted += len(to_update)
+            self.stdout.write(f"  {model.__name__}: {converted} rows converted so far…")
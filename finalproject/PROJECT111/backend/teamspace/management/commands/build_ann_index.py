@@ -0,0 +1,48 @@
+import time
+import numpy as np
+from django.core.management.base import BaseCommand
+from teamspace.ann_index import BruteForceIndex, user_index, project_index, recall_at_k
+
+
+class Command(BaseCommand):
+    help = "저장된 combined 임베딩으로 사용자/프로젝트 ANN 인덱스를 구성해 디스크에 저장하고, exact 검색 대비 recall@10을 보고합니다."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--backend", type=str, choices=["exact", "ivf"], default=None, help="기본값: settings.ANN_INDEX['BACKEND']")
+        parser.add_argument("--index", type=str, choices=["users", "projects", "all"], default="all")
+        parser.add_argument("--eval-queries", type=int, default=200, help="recall@10 평가에 쓸 질의 수")
+
+    def handle(self, *args, **opts):
+        stores = {"users": (user_index, project_index), "projects": (project_index, user_index)}
+        names = ["users", "projects"] if opts["index"] == "all" else [opts["index"]]
+        for name in names:
+            store, query_store = stores[name]
+            self._build(name, store, query_store, opts["backend"], opts["eval_queries"])
+
+    def _build(self, name, store, query_store, backend, n_queries: int):
+        index = store.build(backend, save=False)
+        self.stdout.write(f"[{name}] backend={index.backend} size={len(index)} build={index.meta['build_seconds']}s")
+
+        # 반대편 엔티티의 임베딩(프로젝트→사용자, 사용자→프로젝트)을 질의로 사용
+        _, queries = query_store.loader()
+        if len(queries) > n_queries:
+            queries = queries[np.random.default_rng(0).choice(len(queries), n_queries, replace=False)]
+        exact = BruteForceIndex().build(index.ids, index.vectors)
+        recall = recall_at_k(index, exact, queries, k=10)
+        index.meta["recall_at_10"] = round(recall, 4)
+        store.save(index)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"[{name}] recall@10={recall:.4f} over {len(queries)} queries; "
+            f"latency exact={self._latency_ms(exact, queries):.3f}ms {index.backend}={self._latency_ms(index, queries):.3f}ms; "
+            f"saved to {store.path}"
+        ))
+
+    @staticmethod
+    def _latency_ms(index, queries) -> float:
+        if not len(queries):
+            return 0.0
+        started = time.perf_counter()
+        for query in queries:
+            index.search(query, 10)
+        return (time.perf_counter() - started) * 1000 / len(queries)
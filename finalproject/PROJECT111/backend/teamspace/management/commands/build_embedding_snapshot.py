@@ -0,0 +1,21 @@
+import time
+from django.core.management.base import BaseCommand
+from teamspace.embedding_snapshot import write_snapshot
+
+
+class Command(BaseCommand):
+    help = "facet 임베딩 전체를 memmap용 float32 스냅샷 파일로 쓰고 manifest를 원자적으로 교체합니다."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dir", type=str, default=None, help="기본값: settings.EMBEDDING_SNAPSHOT['DIR']")
+
+    def handle(self, *args, **opts):
+        started = time.perf_counter()
+        manifest = write_snapshot(opts["dir"])
+        elapsed = time.perf_counter() - started
+        size_mb = manifest["rows"] * manifest["dim"] * 4 / (1024 * 1024)
+        for name, block in manifest["blocks"].items():
+            self.stdout.write(f"  {name}: {block['count']} rows")
+        self.stdout.write(self.style.SUCCESS(
+            f"Snapshot {manifest['vectors_file']} written: {manifest['rows']} x {manifest['dim']} float32 ({size_mb:.1f} MB) in {elapsed:.2f}s"
+        ))
@@ -1,13 +1,9 @@
 # management/commands/build_embeddings.py
-import io, struct, numpy as np
+import io, numpy as np
 from django.core.management.base import BaseCommand
 from django.db import connection
 from sentence_transformers import SentenceTransformer
-
-def pack_vec(vec: np.ndarray) -> bytes:
-    # float32 bytes (길이 + 데이터)
-    vec = vec.astype(np.float32)
-    return struct.pack("I", vec.size) + vec.tobytes()
+from teamspace.vectors import pack_vec # float32 bytes (길이 + 데이터)
 
 class Command(BaseCommand):
     help = "Users/Projects 임베딩 생성하여 Embeddings 테이블에 저장"
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from teamspace.models import User, Projects, UserFacetEmbedding, ProjectFacetEmbedding
+from teamspace.ai_services import build_user_facet_texts, build_project_facet_texts, store_facet_embeddings
+
+
+class Command(BaseCommand):
+    help = "모든 Users/Projects의 facet(tech/profile/combined) 임베딩을 현재 모델 버전으로 생성/갱신합니다."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=256, help="한 번에 인코딩할 사용자/프로젝트 수")
+        parser.add_argument("--rebuild", action="store_true", help="현재 모델 버전의 facet 임베딩을 지우고 다시 생성")
+
+    def handle(self, *args, **opts):
+        batch_size = opts["batch_size"]
+        version = settings.SBERT_MODEL_VERSION
+        if opts["rebuild"]:
+            UserFacetEmbedding.objects.filter(model_version=version).delete()
+            ProjectFacetEmbedding.objects.filter(model_version=version).delete()
+
+        self.stdout.write(self.style.NOTICE(f"Building facet embeddings (model_version={version})…"))
+        encoded = self._build(User.objects.order_by("pk"), UserFacetEmbedding, "user", build_user_facet_texts, batch_size)
+        self.stdout.write(self.style.SUCCESS(f"Users: {encoded} facet vectors encoded."))
+        encoded = self._build(Projects.objects.order_by("pk"), ProjectFacetEmbedding, "project", build_project_facet_texts, batch_size)
+        self.stdout.write(self.style.SUCCESS(f"Projects: {encoded} facet vectors encoded."))
+
+    def _build(self, queryset, model, owner_field, build_texts, batch_size: int) -> int:
+        encoded = 0
+        batch = {}
+        for obj in queryset.iterator(chunk_size=batch_size):
+            batch[obj.pk] = build_texts(obj)
+            if len(batch) >= batch_size:
+                encoded += store_facet_embeddings(model, owner_field, batch)
+                batch = {}
+        if batch:
+            encoded += store_facet_embeddings(model, owner_field, batch)
+        return encoded
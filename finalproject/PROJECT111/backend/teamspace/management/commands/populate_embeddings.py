@@ -18,7 +18,7 @@ class Command(BaseCommand):
                 embedding = generate_embedding(text_to_embed)
                 if embedding:
                     user_embedding, created = UserEmbedding.objects.get_or_create(user=user)
-                    user_embedding.embedding = embedding
+                    user_embedding.set_vector(embedding)
                     user_embedding.save()
                     if created:
                         self.stdout.write(self.style.SUCCESS(f'Created embedding for user: {user.name}'))
@@ -38,7 +38,7 @@ class Command(BaseCommand):
                 embedding = generate_embedding(text_to_embed)
                 if embedding:
                     project_embedding, created = ProjectEmbedding.objects.get_or_create(project=project)
-                    project_embedding.embedding = embedding
+                    project_embedding.set_vector(embedding)
                     project_embedding.save()
                     if created:
                         self.stdout.write(self.style.SUCCESS(f'Created embedding for project: {project.title}'))
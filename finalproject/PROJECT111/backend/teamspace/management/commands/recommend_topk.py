@@ -1,13 +1,8 @@
 # management/commands/recommend_topk.py
-import struct, numpy as np
+import numpy as np
 from django.core.management.base import BaseCommand
 from django.db import connection
-
-def unpack_vec(b: bytes) -> np.ndarray:
-    n = struct.unpack("I", b[:4])[0]
-    arr = np.frombuffer(b[4:], dtype=np.float32, count=n)
-    # 이미 normalize된 벡터 사용
-    return arr
+from teamspace.vectors import unpack_vec # 이미 normalize된 벡터 사용
 
 SKILL_SQL = """
 WITH U AS (
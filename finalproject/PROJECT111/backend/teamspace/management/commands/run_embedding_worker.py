@@ -0,0 +1,42 @@
+import os
+import signal
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from teamspace.ai_services import get_sbert_model
+from teamspace.embedding_worker import EmbeddingWorkerServer
+
+
+def _raise_keyboard_interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+class Command(BaseCommand):
+    help = "SBERT 모델을 한 번 로드하고 Unix 소켓으로 인코딩 요청을 받아 마이크로 배치로 처리하는 임베딩 워커를 실행합니다."
+
+    def add_arguments(self, parser):
+        conf = getattr(settings, "EMBEDDING_WORKER", {})
+        parser.add_argument("--socket", type=str, default=conf.get("SOCKET"), help="기본값: settings.EMBEDDING_WORKER['SOCKET']")
+        parser.add_argument("--max-batch", type=int, default=conf.get("MAX_BATCH", 64))
+        parser.add_argument("--max-wait-ms", type=int, default=conf.get("MAX_WAIT_MS", 10))
+
+    def handle(self, *args, **opts):
+        socket_path = opts["socket"]
+        if not socket_path:
+            raise CommandError("Set EMBEDDING_WORKER_SOCKET or pass --socket.")
+        model = get_sbert_model()
+        if model is None:
+            raise CommandError(f"Could not load SBERT model from {settings.SBERT_MODEL_PATH}.")
+
+        server = EmbeddingWorkerServer(socket_path, model, max_batch=opts["max_batch"], max_wait=opts["max_wait_ms"] / 1000)
+        signal.signal(signal.SIGTERM, _raise_keyboard_interrupt)  # 프로세스 매니저의 종료 요청 시 소켓 파일 정리
+        self.stdout.write(self.style.SUCCESS(
+            f"Embedding worker listening on {socket_path} (max_batch={opts['max_batch']}, max_wait={opts['max_wait_ms']}ms)"
+        ))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            if os.path.exists(socket_path):
+                os.unlink(socket_path)
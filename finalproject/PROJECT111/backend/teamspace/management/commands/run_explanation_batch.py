@@ -0,0 +1,65 @@
+import os
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from teamspace.explanation_batch import (
+    BACKENDS, MANIFEST_NAME, get_batch_backend, read_manifest, prepare_job, submit_job, wait_for_job,
+    apply_job_results, mark_job_failed,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "설명이 필요한(pending/stale) 매칭 쌍을 모아 배치 작업으로 제출하고, 완료되면 MatchScores에 반영합니다. "
+        "온라인 LLM 한도와 경쟁하지 않도록 야간 백필(cron)에서 실행합니다."
+    )
+
+    def add_arguments(self, parser):
+        conf = getattr(settings, "EXPLANATION_BATCH", {})
+        parser.add_argument("--backend", choices=sorted(BACKENDS), default=conf.get("BACKEND", "openai"))
+        parser.add_argument("--limit", type=int, default=None, help="이번 작업에 넣을 최대 매칭 쌍 수")
+        parser.add_argument("--max-projects", type=int, default=conf.get("MAX_PROJECTS", 10), help="요청 하나에 넣을 프로젝트 수")
+        parser.add_argument("--poll-interval", type=int, default=conf.get("POLL_INTERVAL", 60))
+        parser.add_argument("--timeout", type=int, default=None, help="이 시간(초)이 지나도 끝나지 않으면 반영하지 않고 종료 (--resume으로 이어서 처리)")
+        parser.add_argument("--no-wait", action="store_true", help="제출만 하고 종료")
+        parser.add_argument("--resume", type=str, default=None, help="이미 제출한 작업 디렉터리를 이어서 확인/반영")
+
+    def handle(self, *args, **opts):
+        if opts["resume"]:
+            job_dir = opts["resume"]
+            if not os.path.exists(os.path.join(job_dir, MANIFEST_NAME)):
+                raise CommandError(f"No {MANIFEST_NAME} in {job_dir}.")
+            manifest = read_manifest(job_dir)
+            if manifest["status"] == "applied":
+                self.stdout.write(f"{job_dir} was already applied: {manifest.get('summary')}")
+                return
+            backend = get_batch_backend(manifest["backend"] or opts["backend"])
+            if manifest["status"] == "prepared":
+                submit_job(job_dir, backend)
+        else:
+            backend = get_batch_backend(opts["backend"])
+            job_dir = prepare_job(limit=opts["limit"], max_projects=opts["max_projects"])
+            if job_dir is None:
+                self.stdout.write("No pending match explanations.")
+                return
+            manifest = read_manifest(job_dir)
+            self.stdout.write(f"Prepared {manifest['pair_count']} pairs in {len(manifest['requests'])} requests: {job_dir}")
+            job_id = submit_job(job_dir, backend)
+            self.stdout.write(f"Submitted to {backend.name} as {job_id}")
+
+        if opts["no_wait"]:
+            self.stdout.write(f"Resume later with: python manage.py run_explanation_batch --resume {job_dir}")
+            return
+
+        status = wait_for_job(job_dir, backend, poll_interval=opts["poll_interval"], timeout=opts["timeout"])
+        if status == "in_progress":
+            self.stdout.write(f"Still in progress. Resume later with: python manage.py run_explanation_batch --resume {job_dir}")
+            return
+        if status == "failed":
+            mark_job_failed(job_dir)
+            raise CommandError(f"Batch job for {job_dir} failed; its pairs stay pending.")
+
+        summary = apply_job_results(job_dir, backend)
+        self.stdout.write(self.style.SUCCESS(
+            f"Applied {summary['updated']} explanations ({summary['explained']}/{summary['pairs']} returned, "
+            f"{summary['skipped_rescored']} skipped after rescoring, {summary['left_pending']} left pending)"
+        ))
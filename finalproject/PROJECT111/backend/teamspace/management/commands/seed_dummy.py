@@ -14,6 +14,7 @@ from teamspace.models import (
     User, Projects, Skills, UserSkills, Teams, TeamMembers, MatchScores, Evaluations, Portfolios, UserEmbedding, ProjectEmbedding
 )
 from teamspace.ai_services import generate_embedding
+from teamspace.vectors import pack_vec
 from django.utils import timezone
 from faker import Faker
 
@@ -264,8 +265,7 @@ class Command(BaseCommand):
 
     def _llm_generate_user_intro(self, pack_for_prompt: dict) -> Optional[str]:
         try:
-            from openai import OpenAI
-            import httpx
+            from teamspace.llm_client import get_llm_client
         except ImportError:
             self.stdout.write(self.style.WARNING("[LLM] openai 또는 httpx 패키지가 없어 자기소개 폴백 사용"))
             return None
@@ -289,13 +289,12 @@ class Command(BaseCommand):
         """.strip()
 
         try:
-            api_key = os.getenv("OPENAI_API_KEY")
-            if not api_key:
+            client = get_llm_client() # 호출마다 새 연결을 만들지 않고 공용 연결 풀 재사용
+            if client is None:
                 self.stdout.write(self.style.WARNING("[LLM] OPENAI_API_KEY가 없어 자기소개 폴백 사용"))
                 return None
 
-            client = OpenAI(api_key=api_key, http_client=httpx.Client())
-            resp = client.chat.completions.create(
+            resp = client.chat(
                 model="gpt-4o-mini",
                 messages=[{"role": "user", "content": prompt}],
                 temperature=1.1, top_p=0.9, presence_penalty=0.4, frequency_penalty=0.4,
@@ -308,8 +307,7 @@ class Command(BaseCommand):
 
     def _llm_generate_project_free(self, template: dict) -> Optional[tuple]:
         try:
-            from openai import OpenAI
-            import httpx
+            from teamspace.llm_client import get_llm_client
         except ImportError:
             self.stdout.write(self.style.WARNING("[LLM] openai 또는 httpx 패키지가 없어 프로젝트 폴백 사용"))
             return None
@@ -336,13 +334,12 @@ class Command(BaseCommand):
         """.strip()
 
         try:
-            api_key = os.getenv("OPENAI_API_KEY")
-            if not api_key:
+            client = get_llm_client() # 호출마다 새 연결을 만들지 않고 공용 연결 풀 재사용
+            if client is None:
                 self.stdout.write(self.style.WARNING("[LLM] OPENAI_API_KEY가 없어 프로젝트 폴백 사용"))
                 return None
 
-            client = OpenAI(api_key=api_key, http_client=httpx.Client())
-            resp = client.chat.completions.create(
+            resp = client.chat(
                 model="gpt-4o-mini",
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0.9, top_p=1.0,
@@ -479,7 +476,7 @@ class Command(BaseCommand):
             embedding_vector = generate_embedding(embedding_text)
             if embedding_vector:
                 embeddings_to_create.append(
-                    UserEmbedding(user=user, embedding=embedding_vector)
+                    UserEmbedding(user=user, vector=pack_vec(embedding_vector))
                 )
         
         if embeddings_to_create:
@@ -565,7 +562,7 @@ class Command(BaseCommand):
             embedding_vector = generate_embedding(embedding_text)
             if embedding_vector:
                 embeddings_to_create.append(
-                    ProjectEmbedding(project=project, embedding=embedding_vector)
+                    ProjectEmbedding(project=project, vector=pack_vec(embedding_vector))
                 )
         
         if embeddings_to_create:
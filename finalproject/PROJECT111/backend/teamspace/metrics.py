@@ -0,0 +1,167 @@
+import logging
+import os
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Prometheus 지표 (GET /metrics). prometheus_client가 설치되어 있지 않으면 모든 지표가 아무것도 하지 않으며 /metrics는 503을 반환합니다.
+# gunicorn / Celery prefork처럼 여러 프로세스가 값을 기록하는 경우 PROMETHEUS_MULTIPROC_DIR 환경 변수에 (프로세스 시작 전에)
+# 모든 프로세스가 공유하는 빈 디렉터리를 지정해야 /metrics가 전체 프로세스의 합계를 반환합니다 (gunicorn.conf.py, config/celery.py 참고).
+try:
+    from prometheus_client import (
+        CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, CONTENT_TYPE_LATEST, generate_latest, multiprocess,
+    )
+    from prometheus_client.core import GaugeMetricFamily
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class _NoopMetric:
+    """prometheus_client가 없을 때 쓰는 지표 (labels/inc/dec/observe/time 호출을 모두 무시)."""
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def inc(self, amount=1):
+        pass
+
+    def dec(self, amount=1):
+        pass
+
+    def observe(self, amount):
+        pass
+
+    def time(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def _counter(name, documentation, labelnames=()):
+    return Counter(name, documentation, labelnames) if PROMETHEUS_AVAILABLE else _NoopMetric()
+
+
+def _gauge(name, documentation, labelnames=(), multiprocess_mode="livesum"):
+    # livesum: 멀티프로세스 모드에서 살아 있는 프로세스들의 값을 합침
+    return Gauge(name, documentation, labelnames, multiprocess_mode=multiprocess_mode) if PROMETHEUS_AVAILABLE else _NoopMetric()
+
+
+def _histogram(name, documentation, labelnames=(), buckets=None):
+    if not PROMETHEUS_AVAILABLE:
+        return _NoopMetric()
+    if buckets is None:
+        return Histogram(name, documentation, labelnames)
+    return Histogram(name, documentation, labelnames, buckets=buckets)
+
+
+# --- 매칭 점수 (ai_services.score_project_ids_for_user / score_user_ids_for_project) ---
+MATCH_SCORES_COMPUTED = _counter(
+    "teamspace_match_scores_computed_total", "Match scores computed from stored facet embeddings",
+    ["direction"], # 'user' (한 사용자 x 여러 프로젝트) / 'project' (한 프로젝트 x 여러 사용자)
+)
+MATCH_SCORING_SECONDS = _histogram(
+    "teamspace_match_scoring_seconds", "Time to score one batch of pairs", ["direction"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+
+# --- 캐시 (embedding_cache / explanation_cache 조회 결과, 적중률 = hit / (hit + miss)) ---
+CACHE_LOOKUPS = _counter("teamspace_cache_lookups_total", "Cache lookups by cache and result", ["cache", "result"])
+
+# --- SBERT (ai_services.encode_texts) ---
+SBERT_BATCH_SIZE = _histogram(
+    "teamspace_sbert_batch_size", "Texts per SBERT encode call",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512),
+)
+SBERT_ENCODE_SECONDS = _histogram(
+    "teamspace_sbert_encode_seconds", "SBERT encode latency", ["backend"], # 'worker' (임베딩 워커) / 'local'
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+
+# --- OpenAI (llm_client.LLMClient / AsyncLLMClient, 재시도마다 한 번씩 기록) ---
+LLM_REQUEST_SECONDS = _histogram(
+    "teamspace_llm_request_seconds", "OpenAI chat completion latency per attempt", ["outcome"], # 'ok' / 'error'
+    buckets=(0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120),
+)
+LLM_TOKENS = _counter("teamspace_llm_tokens_total", "OpenAI tokens used", ["kind"]) # 'prompt' / 'completion'
+LLM_ERRORS = _counter("teamspace_llm_errors_total", "Failed OpenAI attempts by exception type", ["error"])
+
+# --- OpenAI 공유 RPM/TPM 예산 (rate_limiter.TokenBucketRateLimiter, 사용률은 LLMRateLimitCollector가 스크레이프 시점에 계산) ---
+LLM_RATE_LIMIT_WAITING = _gauge(
+    "teamspace_llm_rate_limit_waiting", "Callers currently waiting for the shared OpenAI RPM/TPM budget",
+)
+
+# --- Celery (tasks.py의 task_prerun / task_postrun 시그널) ---
+CELERY_TASK_SECONDS = _histogram(
+    "teamspace_celery_task_seconds", "Celery task run time", ["task", "state"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+
+
+def celery_queue_names() -> list:
+    queues = {settings.CELERY_TASK_DEFAULT_QUEUE}
+    queues.update(route["queue"] for route in settings.CELERY_TASK_ROUTES.values())
+    return sorted(queues)
+
+
+class CeleryQueueDepthCollector:
+    """스크레이프할 때마다 Redis 브로커의 큐 길이(LLEN)를 읽어 teamspace_celery_queue_depth로 내보냅니다."""
+
+    def collect(self):
+        from .task_dedup import get_redis # 브로커와 같은 REDIS_URL
+        gauge = GaugeMetricFamily("teamspace_celery_queue_depth", "Tasks waiting in each Celery queue", labels=["queue"])
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            queues = celery_queue_names()
+            for queue in queues:
+                pipe.llen(queue)
+            for queue, depth in zip(queues, pipe.execute()):
+                gauge.add_metric([queue], depth)
+        except Exception as e:
+            logger.warning(f"Could not read Celery queue depth: {e}")
+            return
+        yield gauge
+
+
+class LLMRateLimitCollector:
+    """스크레이프할 때마다 Redis의 공유 토큰 버킷 잔량을 읽어 RPM/TPM 사용률(지난 1분간 소진된 비율)로 내보냅니다."""
+
+    def collect(self):
+        from .rate_limiter import llm_rate_limiter
+        budget = llm_rate_limiter.stats()["budget"] # 비활성화되었거나 Redis를 쓸 수 없으면 None
+        if budget is None:
+            return
+        gauge = GaugeMetricFamily(
+            "teamspace_llm_rate_limit_utilisation", "Share of the shared OpenAI budget used in the last minute", labels=["limit"],
+        )
+        gauge.add_metric(["rpm"], budget["rpm_utilisation"])
+        gauge.add_metric(["tpm"], budget["tpm_utilisation"])
+        yield gauge
+
+
+def render_metrics() -> bytes:
+    """
+    텍스트 노출 형식의 지표. PROMETHEUS_MULTIPROC_DIR이 설정되어 있으면 모든 프로세스가 기록한 값을 합칩니다.
+    큐 길이와 LLM 예산 사용률은 프로세스별 값이 아니므로 별도 레지스트리에서 스크레이프 시점에 계산합니다.
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    scrape_registry = CollectorRegistry()
+    scrape_registry.register(CeleryQueueDepthCollector())
+    scrape_registry.register(LLMRateLimitCollector())
+    return generate_latest(registry) + generate_latest(scrape_registry)
+
+
+def mark_process_dead(pid: int):
+    """종료된 워커 프로세스의 multiprocess 파일을 정리합니다 (gunicorn child_exit / Celery worker_process_shutdown)."""
+    if PROMETHEUS_AVAILABLE and os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.6 on 2026-10-18 01:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("teamspace", "0014_projectapplicants_available_time_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="projectembedding",
+            name="vector",
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="userembedding",
+            name="vector",
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
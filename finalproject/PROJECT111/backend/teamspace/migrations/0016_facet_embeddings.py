@@ -0,0 +1,100 @@
+# Generated by Django 5.2.6 on 2026-10-18 01:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("teamspace", "0015_userembedding_vector_projectembedding_vector"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProjectFacetEmbedding",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "facet",
+                    models.CharField(
+                        choices=[
+                            ("tech", "Tech stack"),
+                            ("profile", "Profile"),
+                            ("combined", "Combined"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("model_version", models.CharField(max_length=100)),
+                ("vector", models.BinaryField()),
+                ("source_hash", models.CharField(max_length=64)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "project",
+                    models.ForeignKey(
+                        db_column="project_id",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="facet_embeddings",
+                        to="teamspace.projects",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "ProjectFacetEmbeddings",
+                "managed": True,
+                "unique_together": {("project", "facet", "model_version")},
+            },
+        ),
+        migrations.CreateModel(
+            name="UserFacetEmbedding",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "facet",
+                    models.CharField(
+                        choices=[
+                            ("tech", "Tech stack"),
+                            ("profile", "Profile"),
+                            ("combined", "Combined"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("model_version", models.CharField(max_length=100)),
+                ("vector", models.BinaryField()),
+                ("source_hash", models.CharField(max_length=64)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        db_column="user_id",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="facet_embeddings",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "UserFacetEmbeddings",
+                "managed": True,
+                "unique_together": {("user", "facet", "model_version")},
+            },
+        ),
+    ]
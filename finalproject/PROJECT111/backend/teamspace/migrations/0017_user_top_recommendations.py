@@ -0,0 +1,39 @@
+# Generated by Django 5.2.6 on 2026-10-18 02:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("teamspace", "0016_facet_embeddings"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserTopRecommendations",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        db_column="user_id",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="top_recommendations",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                ("project_ids", models.JSONField(default=list)),
+                ("scores", models.JSONField(default=list)),
+                ("model_version", models.CharField(max_length=100)),
+                ("computed_at", models.DateTimeField()),
+                ("is_stale", models.BooleanField(db_index=True, default=False)),
+            ],
+            options={
+                "db_table": "UserTopRecommendations",
+                "managed": True,
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.6 on 2026-10-18 02:16
+
+from django.db import migrations, models
+
+
+# 이전 코드가 설명 생성에 실패했을 때 저장하던 안내 문구
+FAILED_EXPLANATION_REASON = "추천 이유를 생성하지 못했습니다."
+
+
+def mark_existing_explanations_ready(apps, schema_editor):
+    # 이 필드 이전에 저장된 행은 점수와 설명을 함께 생성했으므로 실제 설명이 있으면 ready
+    # 실패 안내 문구만 있는 행은 pending으로 두어 다시 생성되게 함
+    MatchScores = apps.get_model("teamspace", "MatchScores")
+    MatchScores.objects.exclude(explanation__isnull=True).exclude(explanation={}).exclude(
+        explanation__for_recommendation_page__primary_reason=FAILED_EXPLANATION_REASON,
+    ).update(explanation_status="ready")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("teamspace", "0017_user_top_recommendations"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="matchscores",
+            name="explanation_status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Pending"),
+                    ("ready", "Ready"),
+                    ("failed", "Failed"),
+                ],
+                default="pending",
+                max_length=10,
+            ),
+        ),
+        migrations.RunPython(mark_existing_explanations_ready, migrations.RunPython.noop),
+    ]
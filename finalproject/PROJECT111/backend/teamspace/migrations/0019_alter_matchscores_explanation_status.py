@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-18 02:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("teamspace", "0018_matchscores_explanation_status"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="matchscores",
+            name="explanation_status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Pending"),
+                    ("ready", "Ready"),
+                    ("failed", "Failed"),
+                    ("stale", "Stale"),
+                ],
+                default="pending",
+                max_length=10,
+            ),
+        ),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+FAILED_EXPLANATION_REASON = "추천 이유를 생성하지 못했습니다."
+
+
+def requeue_failed_placeholder_explanations(apps, schema_editor):
+    # 0018을 이미 적용한 DB: 실패 안내 문구가 ready로 표시된 행을 pending으로 되돌려 다시 생성되게 함
+    MatchScores = apps.get_model("teamspace", "MatchScores")
+    MatchScores.objects.filter(
+        explanation_status="ready", explanation__for_recommendation_page__primary_reason=FAILED_EXPLANATION_REASON,
+    ).update(explanation_status="pending")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("teamspace", "0019_alter_matchscores_explanation_status"),
+    ]
+
+    operations = [
+        migrations.RunPython(requeue_failed_placeholder_explanations, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
+import numpy as np
+from .vectors import pack_vec, unpack_vec
 
 class UserManager(BaseUserManager):
     def create_user(self, email, password, **extra_fields):
@@ -178,6 +180,15 @@ class TeamMembers(models.Model):
 
 
 class MatchScores(models.Model):
+    EXPLANATION_STATUS_CHOICES = (
+        ('pending', 'Pending'), # 점수만 계산됨, 설명 생성 전 (또는 생성 중)
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+        ('stale', 'Stale'), # 점수/임베딩이 크게 바뀌어 다시 생성해야 함 (다시 생성될 때까지 기존 설명을 보여줌)
+    )
+    # 화면에 보일 때 설명 생성 태스크를 예약해야 하는 상태
+    EXPLANATION_NEEDED_STATUSES = ('pending', 'stale')
+
     match_id = models.AutoField(primary_key=True, db_column='match_id')
     user = models.ForeignKey(User, on_delete=models.CASCADE, db_column='user_id')
     project = models.ForeignKey(Projects, on_delete=models.CASCADE, db_column='project_id')
@@ -186,6 +197,7 @@ class MatchScores(models.Model):
     personality_score = models.IntegerField(default=0)
     experience_score = models.IntegerField(default=0)
     explanation = models.JSONField(null=True, blank=True) # New field for GPT explanation
+    explanation_status = models.CharField(max_length=10, choices=EXPLANATION_STATUS_CHOICES, default='pending')
     evaluated_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -225,23 +237,103 @@ class Portfolios(models.Model):
         unique_together = ('user', 'project')
 
 
-class UserEmbedding(models.Model):
+class EmbeddingVectorMixin:
+    """
+    임베딩을 float32 바이너리(vector)로 저장/조회합니다.
+    아직 backfill_embedding_vectors로 변환되지 않은 행은 기존 JSON(embedding) 값을 읽습니다.
+    """
+
+    def as_array(self):
+        if self.vector:
+            return unpack_vec(self.vector)
+        if self.embedding:
+            return np.asarray(self.embedding, dtype=np.float32)
+        return None
+
+    def set_vector(self, vec):
+        self.vector = pack_vec(vec)
+        self.embedding = None # 바이너리로 대체되었으므로 JSON 사본은 비움
+
+
+class UserEmbedding(EmbeddingVectorMixin, models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, db_column='user_id', to_field='user_id', related_name='embedding_profile')
-    embedding = models.JSONField(blank=True, null=True)
+    embedding = models.JSONField(blank=True, null=True) # (deprecated) float 리스트 JSON, vector로 대체됨
+    vector = models.BinaryField(blank=True, null=True) # packed float32 + 차원 헤더 (vectors.pack_vec)
 
     class Meta:
         db_table = 'UserEmbeddings'
         managed = True 
 
-class ProjectEmbedding(models.Model):
+class ProjectEmbedding(EmbeddingVectorMixin, models.Model):
     project = models.OneToOneField(Projects, on_delete=models.CASCADE, db_column='project_id', to_field='project_id', related_name='embedding_profile')
-    embedding = models.JSONField(blank=True, null=True)
+    embedding = models.JSONField(blank=True, null=True) # (deprecated) float 리스트 JSON, vector로 대체됨
+    vector = models.BinaryField(blank=True, null=True) # packed float32 + 차원 헤더 (vectors.pack_vec)
 
     class Meta:
         db_table = 'ProjectEmbeddings'
         managed = True
 
 
+FACET_CHOICES = [
+    ('tech', 'Tech stack'),
+    ('profile', 'Profile'),
+    ('combined', 'Combined'),
+]
+
+
+class UserFacetEmbedding(models.Model):
+    """사용자의 facet(tech / profile / combined)별 임베딩. 모델 버전마다 따로 저장합니다."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_column='user_id', related_name='facet_embeddings')
+    facet = models.CharField(max_length=10, choices=FACET_CHOICES)
+    model_version = models.CharField(max_length=100)
+    vector = models.BinaryField() # packed float32 + 차원 헤더 (vectors.pack_vec)
+    source_hash = models.CharField(max_length=64) # 임베딩한 원본 텍스트의 SHA-256
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'UserFacetEmbeddings'
+        managed = True
+        unique_together = ('user', 'facet', 'model_version')
+
+    def as_array(self):
+        return unpack_vec(self.vector)
+
+
+class ProjectFacetEmbedding(models.Model):
+    """프로젝트의 facet(tech / profile / combined)별 임베딩. 모델 버전마다 따로 저장합니다."""
+    project = models.ForeignKey(Projects, on_delete=models.CASCADE, db_column='project_id', related_name='facet_embeddings')
+    facet = models.CharField(max_length=10, choices=FACET_CHOICES)
+    model_version = models.CharField(max_length=100)
+    vector = models.BinaryField() # packed float32 + 차원 헤더 (vectors.pack_vec)
+    source_hash = models.CharField(max_length=64) # 임베딩한 원본 텍스트의 SHA-256
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'ProjectFacetEmbeddings'
+        managed = True
+        unique_together = ('project', 'facet', 'model_version')
+
+    def as_array(self):
+        return unpack_vec(self.vector)
+
+
+class UserTopRecommendations(models.Model):
+    """
+    사용자별 상위 K개 추천 프로젝트 (점수 내림차순). 추천/매칭 목록 API는 이 행 하나만 읽습니다.
+    프로필이나 공개 프로젝트가 바뀌면 is_stale로 표시되고 백그라운드 태스크가 다시 계산합니다.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, db_column='user_id', related_name='top_recommendations')
+    project_ids = models.JSONField(default=list)
+    scores = models.JSONField(default=list) # project_ids와 같은 순서
+    model_version = models.CharField(max_length=100)
+    computed_at = models.DateTimeField()
+    is_stale = models.BooleanField(default=False, db_index=True)
+
+    class Meta:
+        db_table = 'UserTopRecommendations'
+        managed = True
+
+
 class ProjectApplicants(models.Model):
     STATUS_CHOICES = (
         ('검토 대기', 'Pending Review'),
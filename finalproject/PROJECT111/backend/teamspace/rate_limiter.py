@@ -0,0 +1,201 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+
+from .metrics import LLM_RATE_LIMIT_WAITING
+
+logger = logging.getLogger(__name__)
+
+# 요청 수(RPM)와 토큰 수(TPM) 두 버킷을 한 해시에 두고 원자적으로 갱신합니다.
+# 버킷은 마지막 갱신 이후 경과 시간만큼 (용량 / 60)씩 다시 채워지며, 시계는 Redis TIME을 쓰므로
+# 웹/워커 프로세스의 시계 차이와 무관합니다.
+#   ARGV: rpm 용량, tpm 용량, 토큰 수, 모드
+#   acquire: 두 버킷에 모두 여유가 있으면 차감하고 대기 0, 아니면 필요한 대기 시간(초)을 반환 (차감 없음)
+#   adjust: 실제 사용 토큰과 추정치의 차이(토큰 수 인자)만큼 tpm 버킷을 더 차감 (음수면 돌려줌)
+#   peek: 차감 없이 현재 잔량만 반환
+# 반환: {대기 초, 남은 요청 수, 남은 토큰 수} (Lua 숫자는 정수로 잘리므로 문자열로 반환)
+TOKEN_BUCKET_SCRIPT = """
+local key = KEYS[1]
+local rpm_cap = tonumber(ARGV[1])
+local tpm_cap = tonumber(ARGV[2])
+local tokens = tonumber(ARGV[3])
+local mode = ARGV[4]
+
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', key, 'requests', 'tokens', 'ts')
+local req = tonumber(state[1]) or rpm_cap
+local tok = tonumber(state[2]) or tpm_cap
+local ts = tonumber(state[3]) or now
+local elapsed = math.max(0, now - ts)
+req = math.min(rpm_cap, req + elapsed * rpm_cap / 60)
+tok = math.min(tpm_cap, tok + elapsed * tpm_cap / 60)
+
+local wait = 0
+if mode == 'acquire' then
+    -- 버킷 전체보다 큰 요청은 버킷이 가득 찰 때까지 기다린 뒤 진행
+    local need = math.min(tokens, tpm_cap)
+    if req < 1 then wait = math.max(wait, (1 - req) * 60 / rpm_cap) end
+    if tok < need then wait = math.max(wait, (need - tok) * 60 / tpm_cap) end
+    if wait == 0 then
+        req = req - 1
+        tok = tok - need
+    end
+elseif mode == 'adjust' then
+    tok = math.max(-tpm_cap, tok - tokens)
+end
+
+redis.call('HSET', key, 'requests', tostring(req), 'tokens', tostring(tok), 'ts', tostring(now))
+redis.call('EXPIRE', key, 120)
+return {tostring(wait), tostring(req), tostring(tok)}
+"""
+
+
+class RateLimitTimeout(Exception):
+    pass
+
+
+class TokenBucketRateLimiter:
+    """
+    모든 웹/워커 프로세스가 공유하는 OpenAI 요청/토큰 한도 (Redis 토큰 버킷).
+    acquire()는 한도가 남을 때까지 기다리며 (실패하지 않음), MAX_WAIT를 넘기면 RateLimitTimeout을 던집니다.
+    Redis를 쓸 수 없으면 제한 없이 통과시킵니다 (OpenAI 429는 LLMClient의 재시도가 처리).
+
+    대기자 사이의 순서(공정성)는 보장하지 않습니다. 대기자는 각자 지터를 섞어 버킷을 다시 확인하고, 다시 찬 버킷은
+    그 순간 먼저 확인한 대기자가 가져갑니다. 그래서 먼저 온 요청이 나중 요청보다 늦게 통과할 수 있고,
+    토큰이 많은 요청은 작은 요청들이 계속 버킷을 비우면 MAX_WAIT까지 밀릴 수 있습니다 (대기 상한은 MAX_WAIT뿐).
+    """
+
+    REDIS_RETRY_SECONDS = 30
+
+    def __init__(self, conf: dict, redis_url: str = None):
+        self.conf = conf
+        self.redis_url = redis_url
+        self.key = conf.get("KEY", "llm:ratelimit")
+        self._redis = None
+        self._script = None
+        self._redis_down_until = 0.0
+        self._lock = threading.Lock()
+        self.counters = {"acquired": 0, "waited": 0, "wait_seconds": 0.0, "timeouts": 0, "waiting": 0}
+
+    @classmethod
+    def from_settings(cls):
+        return cls(getattr(settings, "LLM_RATE_LIMIT", {}), getattr(settings, "REDIS_URL", None))
+
+    @property
+    def enabled(self) -> bool:
+        return self.conf.get("ENABLED", True) and bool(self.redis_url)
+
+    @property
+    def rpm(self) -> int:
+        return self.conf.get("RPM", 500)
+
+    @property
+    def tpm(self) -> int:
+        return self.conf.get("TPM", 200000)
+
+    def estimate_tokens(self, messages: list, max_tokens: int = None) -> int:
+        """프롬프트 글자 수 / CHARS_PER_TOKEN + 예상 응답 토큰 (응답 후 adjust로 실제 사용량에 맞춤)."""
+        chars = sum(len(str(message.get("content", ""))) for message in messages or [])
+        completion = max_tokens or self.conf.get("COMPLETION_TOKENS", 700)
+        return int(chars / self.conf.get("CHARS_PER_TOKEN", 2)) + completion
+
+    def _call(self, tokens: int, mode: str):
+        """(대기 초, 남은 요청 수, 남은 토큰 수) 또는 Redis를 쓸 수 없으면 None."""
+        if not self.enabled or time.monotonic() < self._redis_down_until:
+            return None
+        try:
+            if self._script is None:
+                import redis
+                self._redis = redis.Redis.from_url(self.redis_url, socket_timeout=0.2, socket_connect_timeout=0.2)
+                self._script = self._redis.register_script(TOKEN_BUCKET_SCRIPT)
+            wait, requests_left, tokens_left = self._script(keys=[self.key], args=[self.rpm, self.tpm, tokens, mode])
+        except Exception as e:
+            logger.warning(f"LLM rate limiter: Redis unavailable, not limiting for {self.REDIS_RETRY_SECONDS}s: {e}")
+            self._redis_down_until = time.monotonic() + self.REDIS_RETRY_SECONDS
+            return None
+        return float(wait), float(requests_left), float(tokens_left)
+
+    def _count(self, **increments):
+        with self._lock:
+            for name, amount in increments.items():
+                self.counters[name] += amount
+        if "waiting" in increments:
+            LLM_RATE_LIMIT_WAITING.inc(increments["waiting"]) # 모든 프로세스의 대기자 합계 (/metrics)
+
+    def _next_sleep(self, wait: float, deadline: float) -> float:
+        # 여러 대기자가 같은 순간에 몰리지 않도록 약간의 지터, 긴 대기도 주기적으로 다시 확인
+        sleep = min(wait, 1.0) + random.uniform(0, 0.05)
+        if time.monotonic() + sleep > deadline:
+            raise RateLimitTimeout(f"LLM rate limit budget not available within {self.conf.get('MAX_WAIT', 300)}s")
+        return sleep
+
+    def acquire(self, tokens: int):
+        """요청 1개와 tokens개 토큰을 얻을 때까지 기다립니다 (대기 순서는 보장하지 않음, 클래스 설명 참고)."""
+        deadline = time.monotonic() + self.conf.get("MAX_WAIT", 300)
+        started = time.monotonic()
+        waited = False
+        self._count(waiting=1)
+        try:
+            while True:
+                result = self._call(tokens, "acquire")
+                if result is None or result[0] == 0:
+                    break
+                waited = True
+                time.sleep(self._next_sleep(result[0], deadline))
+        except RateLimitTimeout:
+            self._count(timeouts=1)
+            raise
+        finally:
+            self._count(waiting=-1)
+        self._count(acquired=1, waited=int(waited), wait_seconds=time.monotonic() - started if waited else 0.0)
+
+    async def acquire_async(self, tokens: int):
+        deadline = time.monotonic() + self.conf.get("MAX_WAIT", 300)
+        started = time.monotonic()
+        waited = False
+        self._count(waiting=1)
+        try:
+            while True:
+                result = await asyncio.to_thread(self._call, tokens, "acquire")
+                if result is None or result[0] == 0:
+                    break
+                waited = True
+                await asyncio.sleep(self._next_sleep(result[0], deadline))
+        except RateLimitTimeout:
+            self._count(timeouts=1)
+            raise
+        finally:
+            self._count(waiting=-1)
+        self._count(acquired=1, waited=int(waited), wait_seconds=time.monotonic() - started if waited else 0.0)
+
+    def reconcile(self, estimated_tokens: int, actual_tokens: int):
+        """응답의 실제 사용 토큰으로 tpm 버킷을 맞춥니다."""
+        if actual_tokens is not None and actual_tokens != estimated_tokens:
+            self._call(actual_tokens - estimated_tokens, "adjust")
+
+    def stats(self) -> dict:
+        with self._lock:
+            process = dict(self.counters)
+        process["wait_seconds"] = round(process["wait_seconds"], 3)
+        budget = None
+        result = self._call(0, "peek")
+        if result is not None:
+            _, requests_left, tokens_left = result
+            budget = {
+                "rpm_limit": self.rpm,
+                "tpm_limit": self.tpm,
+                "requests_available": round(requests_left, 2),
+                "tokens_available": round(tokens_left),
+                # 지난 1분 동안 소진된 비율 (버킷이 비어 있을수록 1에 가까움)
+                "rpm_utilisation": round(1 - max(requests_left, 0) / self.rpm, 4),
+                "tpm_utilisation": round(1 - max(tokens_left, 0) / self.tpm, 4),
+            }
+        return {"enabled": self.enabled, "process": process, "budget": budget}
+
+
+llm_rate_limiter = TokenBucketRateLimiter.from_settings()
@@ -0,0 +1,237 @@
+import contextvars
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+from django.conf import settings
+from django.db import connection
+
+from .task_dedup import get_redis
+
+logger = logging.getLogger(__name__)
+
+# 요청 하나의 측정값. 요청 처리 중(같은 스레드/같은 asyncio 컨텍스트)에만 설정되며,
+# Celery 태스크나 관리 명령에서는 None이므로 timed()가 아무것도 기록하지 않습니다.
+_current = contextvars.ContextVar("request_metrics", default=None)
+
+# 저장/집계 순서 (Redis에는 이 순서의 JSON 배열로 저장)
+FIELDS = ("wall_ms", "db_queries", "db_ms", "sbert_calls", "sbert_ms", "llm_calls", "llm_ms")
+PERCENTILES = (50, 90, 99)
+
+
+class RequestMetrics:
+    """요청 하나 동안의 DB 쿼리 / SBERT 인코딩 / LLM 호출 횟수와 시간 (ms)."""
+
+    def __init__(self):
+        self.counts = {"db": 0, "sbert": 0, "llm": 0}
+        self.times = {"db": 0.0, "sbert": 0.0, "llm": 0.0}
+        self.wall_ms = 0.0
+
+    def add(self, kind: str, seconds: float):
+        self.counts[kind] += 1
+        self.times[kind] += seconds * 1000
+
+    def db_wrapper(self, execute, sql, params, many, context):
+        # connection.execute_wrapper용: 실패한 쿼리도 시간에 포함
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.add("db", time.perf_counter() - started)
+
+    def as_row(self) -> list:
+        return [
+            round(self.wall_ms, 2),
+            self.counts["db"], round(self.times["db"], 2),
+            self.counts["sbert"], round(self.times["sbert"], 2),
+            self.counts["llm"], round(self.times["llm"], 2),
+        ]
+
+    def server_timing(self) -> str:
+        """Server-Timing 헤더 값 (브라우저 개발자 도구의 Timing 탭에 표시됨)."""
+        parts = [
+            f'{kind};dur={self.times[kind]:.1f};desc="{self.counts[kind]} {unit}"'
+            for kind, unit in (("db", "queries"), ("sbert", "encodes"), ("llm", "calls"))
+        ]
+        parts.append(f"total;dur={self.wall_ms:.1f}")
+        return ", ".join(parts)
+
+
+@contextmanager
+def timed(kind: str):
+    """
+    블록 실행 시간을 현재 요청의 kind('sbert' 또는 'llm') 측정값에 더합니다.
+    요청 밖(태스크, 관리 명령)에서는 아무것도 하지 않습니다.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add(kind, time.perf_counter() - started)
+
+
+class RequestMetricsStore:
+    """
+    경로별 최근 SAMPLE_SIZE개 요청의 측정값을 Redis 리스트에 보관하고 백분위를 계산합니다.
+    모든 웹 프로세스가 같은 리스트에 기록하므로 관리자 API는 전체 워커의 분포를 보여줍니다.
+    요청마다 Redis에 쓰지 않고 프로세스 안에 모아 두었다가 FLUSH_EVERY개가 쌓이거나 FLUSH_INTERVAL초가 지나면
+    파이프라인 한 번으로 기록합니다 (프로세스가 종료되면 아직 기록하지 않은 측정값은 버려짐).
+    Redis를 쓸 수 없으면 기록을 건너뜁니다 (요청 처리는 막지 않음).
+    """
+
+    REDIS_RETRY_SECONDS = 30
+
+    def __init__(self, conf: dict):
+        self.conf = conf
+        self.prefix = conf.get("KEY_PREFIX", "reqmetrics:")
+        self._redis_down_until = 0.0
+        self._buffer = {}  # route -> [JSON 행] (오래된 것부터)
+        self._buffered = 0
+        self._flushed_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _redis(self):
+        if time.monotonic() < self._redis_down_until:
+            return None
+        return get_redis()
+
+    def _mark_redis_down(self, error: Exception):
+        logger.warning(f"Request metrics: Redis unavailable, not recording for {self.REDIS_RETRY_SECONDS}s: {error}")
+        self._redis_down_until = time.monotonic() + self.REDIS_RETRY_SECONDS
+
+    def record(self, route: str, metrics: RequestMetrics):
+        row = json.dumps(metrics.as_row(), separators=(",", ":"))
+        with self._lock:
+            self._buffer.setdefault(route, []).append(row)
+            self._buffered += 1
+            due = (
+                self._buffered >= self.conf.get("FLUSH_EVERY", 50)
+                or time.monotonic() - self._flushed_at >= self.conf.get("FLUSH_INTERVAL", 10)
+            )
+        if due:
+            self.flush()
+
+    def flush(self):
+        """모아 둔 측정값을 경로별 LPUSH 한 번씩, 파이프라인 한 번으로 기록합니다."""
+        with self._lock:
+            buffer, self._buffer, self._buffered = self._buffer, {}, 0
+            self._flushed_at = time.monotonic()
+        client = self._redis() if buffer else None
+        if client is None:
+            return
+        try:
+            pipe = client.pipeline(transaction=False)
+            pipe.sadd(f"{self.prefix}routes", *buffer)
+            for route, rows in buffer.items():
+                key = f"{self.prefix}route:{route}"
+                pipe.lpush(key, *rows)
+                pipe.ltrim(key, 0, self.conf.get("SAMPLE_SIZE", 1000) - 1)
+                pipe.expire(key, self.conf.get("TTL", 60 * 60 * 24 * 7))
+            pipe.execute()
+        except Exception as e:
+            self._mark_redis_down(e)
+
+    def stats(self) -> dict:
+        """경로별 요청 수와 각 측정값의 p50/p90/p99/max. 느린 경로(wall_ms p90)부터 정렬합니다."""
+        self.flush()  # 이 프로세스에 모아 둔 측정값도 포함 (다른 프로세스의 것은 다음 flush 때 반영)
+        client = self._redis()
+        if client is None:
+            return {"enabled": self.conf.get("ENABLED", True), "routes": None}
+        try:
+            routes = sorted(route.decode() for route in client.smembers(f"{self.prefix}routes"))
+            pipe = client.pipeline(transaction=False)
+            for route in routes:
+                pipe.lrange(f"{self.prefix}route:{route}", 0, -1)
+            samples_by_route = dict(zip(routes, pipe.execute()))
+        except Exception as e:
+            self._mark_redis_down(e)
+            return {"enabled": self.conf.get("ENABLED", True), "routes": None}
+
+        report = []
+        for route, samples in samples_by_route.items():
+            if not samples:
+                continue
+            rows = np.array([json.loads(sample) for sample in samples], dtype=np.float64)
+            entry = {"route": route, "count": len(rows)}
+            for i, field in enumerate(FIELDS):
+                column = rows[:, i]
+                entry[field] = {f"p{p}": round(float(value), 2) for p, value in zip(PERCENTILES, np.percentile(column, PERCENTILES))}
+                entry[field]["max"] = round(float(column.max()), 2)
+            report.append(entry)
+        report.sort(key=lambda entry: entry["wall_ms"]["p90"], reverse=True)
+        return {"enabled": self.conf.get("ENABLED", True), "sample_size": self.conf.get("SAMPLE_SIZE", 1000), "routes": report}
+
+    def reset(self):
+        with self._lock:
+            self._buffer, self._buffered = {}, 0
+        client = self._redis()
+        if client is None:
+            return
+        try:
+            routes = client.smembers(f"{self.prefix}routes")
+            client.delete(f"{self.prefix}routes", *[f"{self.prefix}route:{route.decode()}" for route in routes])
+        except Exception as e:
+            self._mark_redis_down(e)
+
+
+request_metrics_store = RequestMetricsStore(getattr(settings, "REQUEST_METRICS", {}))
+
+
+def route_label(request) -> str:
+    """'GET /api/projects/<int:project_id>/'처럼 메서드와 URL 패턴 (id별로 나뉘지 않도록)."""
+    match = getattr(request, "resolver_match", None)
+    route = f"/{match.route}" if match is not None and match.route else "unmatched"
+    return f"{request.method} {route}"
+
+
+class RequestMetricsMiddleware:
+    """
+    요청마다 DB 쿼리 수/시간, SBERT 인코딩 수/시간, LLM 호출 수/시간, 전체 처리 시간을 측정하여
+    구조화된 로그 한 줄로 내보내고, 경로별 백분위 집계(RequestMetricsStore)에 기록합니다.
+    Server-Timing 헤더는 내부 처리 시간을 드러내므로 SERVER_TIMING=True이거나 DEBUG, staff 사용자에게만 붙입니다.
+    SBERT/LLM은 ai_services.encode_texts와 LLMClient.chat의 timed() 블록에서 측정됩니다.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        conf = getattr(settings, "REQUEST_METRICS", {})
+        self.enabled = conf.get("ENABLED", True)
+        self.server_timing = conf.get("SERVER_TIMING", False)
+
+    def _show_server_timing(self, request) -> bool:
+        # DRF 뷰는 인증한 사용자를 request.user에도 설정하므로 JWT로 로그인한 staff도 포함됨
+        if self.server_timing or settings.DEBUG:
+            return True
+        user = getattr(request, "user", None)
+        return bool(user is not None and user.is_staff)
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(metrics.db_wrapper):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        metrics.wall_ms = (time.perf_counter() - started) * 1000
+
+        route = route_label(request)
+        if self._show_server_timing(request):
+            response["Server-Timing"] = metrics.server_timing()
+        logger.info(json.dumps(
+            {"route": route, "path": request.path, "status": response.status_code, **dict(zip(FIELDS, metrics.as_row()))},
+            ensure_ascii=False,
+        ))
+        request_metrics_store.record(route, metrics)
+        return response
@@ -1,8 +1,8 @@
 from rest_framework import serializers
 from typing import Optional
 from django.contrib.auth.hashers import make_password
-from .models import User, Projects, ProjectApplicants, Evaluations, UserEmbedding, MatchScores, Notifications
-from .ai_services import generate_embedding
+from django.db import models
+from .models import User, Projects, ProjectApplicants, Evaluations, MatchScores, Notifications
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
@@ -36,6 +36,25 @@ class UsersSerializer(serializers.ModelSerializer):
             ret['specialty'] = []
         return ret
 
+class ProjectApplicantListSerializer(serializers.ListSerializer):
+    """
+    ProjectApplicantSerializer(many=True)의 목록 직렬화.
+    지원자 전체의 MatchScores를 IN 쿼리 한 번으로 불러와 context['applicant_match_entries'] ({(user_id, project_id): MatchScores})에
+    두므로, get_match_scores가 지원자마다 조회하지 않습니다. (user는 select_related('user')로 함께 불러와야 합니다.)
+    """
+
+    def to_representation(self, data):
+        applicants = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        if applicants:
+            self.context['applicant_match_entries'] = {
+                (entry.user_id, entry.project_id): entry
+                for entry in MatchScores.objects.filter(
+                    user_id__in={applicant.user_id for applicant in applicants},
+                    project_id__in={applicant.project_id for applicant in applicants},
+                ).only('user_id', 'project_id', 'score', 'tech_score', 'experience_score', 'personality_score')
+            }
+        return super().to_representation(applicants)
+
 class ProjectApplicantSerializer(serializers.ModelSerializer):
     user = UsersSerializer(read_only=True)
     match_scores = serializers.SerializerMethodField()
@@ -43,33 +62,69 @@ class ProjectApplicantSerializer(serializers.ModelSerializer):
     class Meta:
         model = ProjectApplicants
         fields = ['id', 'user', 'status', 'applied_at', 'match_scores', 'role', 'motivation', 'available_time']
+        list_serializer_class = ProjectApplicantListSerializer
 
     def get_match_scores(self, obj):
         # obj is the ProjectApplicants instance
-        try:
-            match = MatchScores.objects.get(user=obj.user, project=obj.project)
+        match_entries = self.context.get('applicant_match_entries')
+        if match_entries is not None:
+            match = match_entries.get((obj.user_id, obj.project_id)) # 목록 직렬화에서 미리 불러온 행
+        else:
+            match = MatchScores.objects.filter(user_id=obj.user_id, project_id=obj.project_id).first()
+        if match is not None:
             return {
                 'match_rate': match.score,
                 'tech_match': match.tech_score,
                 'exp_match': match.experience_score,
                 'time_match': match.personality_score, # Mapping personality_score to time_match as a guess
             }
-        except MatchScores.DoesNotExist:
-            return {
-                'match_rate': 0,
-                'tech_match': 0,
-                'exp_match': 0,
-                'time_match': 0,
-            }
+        return {
+            'match_rate': 0,
+            'tech_match': 0,
+            'exp_match': 0,
+            'time_match': 0,
+        }
 
 class NotificationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Notifications
         fields = ['notification_id', 'recipient', 'sender', 'message', 'notification_type', 'related_project', 'is_read', 'created_at']
 
-from .tasks import precompute_matches_for_user_task, calculate_single_match_score_task
 from .ai_services import MatchService
 
+def _load_user_match_entries(context: dict, projects: list, fields: tuple):
+    """
+    요청 사용자의 MatchScores 행을 projects 전체에 대해 IN 쿼리 한 번으로 불러와
+    context['user_match_entries'] ({project_id: MatchScores 또는 None})에 채웁니다. 이미 있는 프로젝트는 건너뜁니다.
+    """
+    request = context.get('request')
+    if not (request and request.user.is_authenticated):
+        return
+    entries = context.setdefault('user_match_entries', {})
+    missing = [project.pk for project in projects if project.pk not in entries]
+    if not missing:
+        return
+    entries.update(dict.fromkeys(missing)) # 점수가 없는 프로젝트도 다시 조회하지 않도록 None으로 표시
+    entries.update({
+        entry.project_id: entry
+        for entry in MatchScores.objects.filter(user=request.user, project_id__in=missing).only(*fields)
+    })
+
+class ProjectListSerializer(serializers.ListSerializer):
+    """
+    ProjectSerializer(many=True) / ProjectDetailSerializer(many=True)의 목록 직렬화.
+    페이지에 있는 프로젝트들에 대한 요청 사용자의 MatchScores를 IN 쿼리 한 번으로 불러와 context에 공유하므로,
+    get_user_matching_rate 등이 행마다 MatchScores를 조회하지 않습니다.
+    (creator는 뷰의 queryset에서 select_related('creator')로 함께 불러와야 행마다 쿼리하지 않습니다.)
+    """
+
+    def to_representation(self, data):
+        projects = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        request = self.context.get('request')
+        if not hasattr(request, 'user_match_scores'): # MatchedProjectListView는 점수를 직접 전달
+            _load_user_match_entries(self.context, projects, self.child.match_score_fields)
+        return super().to_representation(projects)
+
 class ProjectSerializer(serializers.ModelSerializer):
     # creator 필드를 UsersSerializer로 중첩하여, 
     # 프로젝트 조회 시 생성자 정보도 함께 보여줍니다.
@@ -85,6 +140,19 @@ class ProjectSerializer(serializers.ModelSerializer):
             'user_matching_rate' # Include the new field
         ]
         read_only_fields = ['project_id', 'created_at']
+        list_serializer_class = ProjectListSerializer
+
+    # 목록 직렬화에서 불러올 MatchScores 필드 (ProjectDetailSerializer는 설명 필드까지)
+    match_score_fields = ('project_id', 'score')
+
+    def _user_match_entry(self, obj) -> Optional[MatchScores]:
+        """
+        요청 사용자의 이 프로젝트 MatchScores 행 (없으면 None).
+        목록 직렬화나 뷰가 context['user_match_entries']에 미리 넣어 둔 행을 쓰고, 없을 때만 한 번 조회하여
+        같은 context에 보관하므로 필드마다 다시 조회하지 않습니다.
+        """
+        _load_user_match_entries(self.context, [obj], self.match_score_fields)
+        return self.context.get('user_match_entries', {}).get(obj.pk)
 
     def get_user_matching_rate(self, obj):
         request = self.context.get('request')
@@ -92,31 +160,21 @@ class ProjectSerializer(serializers.ModelSerializer):
             # 요청 컨텍스트에서 이미 점수가 전달되었는지 확인(MatchedProjectListView에서)
             if hasattr(request, 'user_match_scores') and obj.project_id in request.user_match_scores:
                 return round(request.user_match_scores[obj.project_id], 2)
-            
-            # Fallback: MatchScores 테이블에서 가져오기
-            from .models import MatchScores # 순환 참조 피하기 위해 여기로 가져옴
-            try:
-                match_score = MatchScores.objects.get(user=request.user, project=obj)
+
+            # MatchScores 행 (목록 직렬화에서는 페이지 단위로 미리 불러옴)
+            match_score = self._user_match_entry(obj)
+            if match_score is not None:
                 return round(match_score.score, 2)
-            except MatchScores.DoesNotExist:
-                pass # match score 아직 없음 
         return None
 
     def create(self, validated_data):
         project = Projects.objects.create(**validated_data)
-        # Trigger background task to calculate score only for the creator
-        creator = self.context['request'].user
-        if creator and creator.is_authenticated:
-            calculate_single_match_score_task.delay(creator.pk, project.pk)
+        # 생성자의 매칭 점수는 임베딩 갱신 태스크(refresh_project_embedding_task)가 임베딩을 저장한 뒤 계산합니다.
         return project
 
     def update(self, instance, validated_data):
         instance = super().update(instance, validated_data)
-        # Trigger background task to recalculate score only for the creator
-        creator = self.context['request'].user
-        if creator and creator.is_authenticated:
-            MatchScores.objects.filter(user=creator, project=instance).delete()
-            calculate_single_match_score_task.delay(creator.pk, instance.pk)
+        # 임베딩 텍스트가 바뀐 경우에만 refresh_project_embedding_task가 생성자의 매칭 점수를 다시 계산합니다.
         return instance
 
 
@@ -200,69 +258,77 @@ class UserProfileSerializer(serializers.ModelSerializer):
         # Call super().update() to save the user instance
         instance = super().update(instance, validated_data)
 
-        # --- Recalculate UserEmbedding after profile update ---
-        embedding_text = f"""{instance.introduction or ''} 
-        전문 분야: {instance.specialty or ''} 
-        기술: {instance.tech_stack or ''} 
-        전공: {instance.major or ''} 
-        경험: {instance.experience_level or ''} 
-        협업 스타일: {instance.collaboration_style or ''} 
-        선호 프로젝트: {instance.preferred_project_topics or ''}"""
-        
-        embedding_vector = generate_embedding(embedding_text)
-        
-        if embedding_vector:
-            UserEmbedding.objects.update_or_create(
-                user=instance,
-                defaults={'embedding': embedding_vector}
-            )
+        # UserEmbedding / facet 임베딩은 post_save 시그널(refresh_user_facet_embeddings)에서 갱신됩니다.
 
-        # --- Invalidate old MatchScores and trigger background recalculation ---
-        MatchScores.objects.filter(user=instance).delete()
-        from .tasks import precompute_matches_for_user_task
-        precompute_matches_for_user_task.delay(instance.pk)
+        # 기존 MatchScores 무효화와 재계산도 임베딩이 실제로 바뀐 경우에만 refresh_user_embedding_task에서 수행합니다.
 
         return instance
 
 
 class ProjectDetailSerializer(ProjectSerializer):
     user_match_explanation = serializers.SerializerMethodField()
+    user_match_explanation_status = serializers.SerializerMethodField()
     user_match_scores = serializers.SerializerMethodField()
     applicant_count = serializers.SerializerMethodField()
 
     class Meta(ProjectSerializer.Meta):
-        fields = ProjectSerializer.Meta.fields + ['user_match_explanation', 'user_match_scores', 'applicant_count']
+        fields = ProjectSerializer.Meta.fields + ['user_match_explanation', 'user_match_explanation_status', 'user_match_scores', 'applicant_count']
 
+    match_score_fields = ProjectSerializer.match_score_fields + (
+        'tech_score', 'personality_score', 'experience_score', 'explanation', 'explanation_status',
+    )
+
+    # 네 필드 모두 같은 MatchScores 행을 씁니다 (_user_match_entry)
     def get_user_match_explanation(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            from .models import MatchScores # Import here to avoid circular dependency
-            try:
-                match_score = MatchScores.objects.get(user=request.user, project=obj)
-                return match_score.explanation
-            except MatchScores.DoesNotExist:
-                pass
-        return None
+        match_score = self._user_match_entry(obj)
+        return match_score.explanation if match_score is not None else None
+
+    def get_user_match_explanation_status(self, obj) -> Optional[str]:
+        # 'pending'/'stale'이면 설명 생성 중이므로 프론트엔드가 다시 조회(폴링)합니다. ('stale'은 이전 설명을 함께 반환)
+        match_score = self._user_match_entry(obj)
+        return match_score.explanation_status if match_score is not None else None
 
     def get_user_match_scores(self, obj) -> Optional[dict]:
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            from .models import MatchScores # Import here to avoid circular dependency
-            try:
-                match_score = MatchScores.objects.get(user=request.user, project=obj)
-                return {
-                    "tech": match_score.tech_score,
-                    "personality": match_score.personality_score,
-                    "experience": match_score.experience_score,
-                }
-            except MatchScores.DoesNotExist:
-                pass
-        return None
+        match_score = self._user_match_entry(obj)
+        if match_score is None:
+            return None
+        return {
+            "tech": match_score.tech_score,
+            "personality": match_score.personality_score,
+            "experience": match_score.experience_score,
+        }
 
     def get_applicant_count(self, obj) -> int:
+        # 프로젝트 조회 시 annotate(num_applicants=Count('projectapplicants'))했으면 추가 쿼리 없음
+        if hasattr(obj, 'num_applicants'):
+            return obj.num_applicants
         return ProjectApplicants.objects.filter(project=obj).count()
 
+class RecommendedProjectListSerializer(serializers.ListSerializer):
+    """
+    RecommendedProjectSerializer(many=True)의 목록 직렬화.
+    MatchService.get_recommended_projects가 이미 불러온 MatchScores 행('match_score')을 중첩된 ProjectDetailSerializer와
+    공유하고, 빠진 행만 IN 쿼리 한 번으로 불러옵니다. 따라서 페이지 크기와 무관한 쿼리 수로 직렬화됩니다.
+    """
+
+    def to_representation(self, data):
+        items = list(data)
+        request = self.context.get('request')
+        if request and request.user.is_authenticated:
+            entries = self.context.setdefault('user_match_entries', {})
+            for item in items:
+                if item.get('match_score') is not None:
+                    entries[item['project'].pk] = item['match_score']
+            _load_user_match_entries(
+                self.context, [item['project'] for item in items], ProjectDetailSerializer.match_score_fields,
+            )
+        return super().to_representation(items)
+
 class RecommendedProjectSerializer(serializers.Serializer):
     project = ProjectDetailSerializer()
     score = serializers.FloatField()
-    explanation = serializers.JSONField()
\ No newline at end of file
+    explanation = serializers.JSONField()
+    explanation_status = serializers.CharField()
+
+    class Meta:
+        list_serializer_class = RecommendedProjectListSerializer
\ No newline at end of file
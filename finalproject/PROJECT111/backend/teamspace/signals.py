@@ -1,58 +1,64 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from .models import User, Projects, UserEmbedding, ProjectEmbedding
-from .ai_services import generate_embedding
+from .models import User, Projects
+from .ai_services import (
+    USER_EMBEDDED_FIELDS, PROJECT_EMBEDDED_FIELDS, user_embedding_needs_refresh, project_embedding_needs_refresh,
+)
+from .ann_index import user_index, project_index, sync_project_openness
+from .tasks import enqueue_embedding_refresh
+import logging
 
+logger = logging.getLogger(__name__)
 
 
+# 저장 요청 안에서는 SBERT를 호출하지 않습니다.
+# 임베딩 텍스트의 source_hash가 저장된 값과 다를 때만 커밋 이후 Celery 태스크로 갱신을 예약합니다.
+# (create_user, 비밀번호 변경, last_login 갱신처럼 임베딩 필드와 무관한 저장은 건너뜀)
+
+@receiver(post_save, sender=Projects)
+def schedule_project_embedding_refresh(sender, instance, created, update_fields=None, **kwargs):
+    # 프로젝트 정보(title, description, goal, tech_stack)를 facet별(tech / profile / combined)로 임베딩
+    if update_fields is not None and not PROJECT_EMBEDDED_FIELDS.intersection(update_fields):
+        return
+    if project_embedding_needs_refresh(instance):
+        project_id = instance.pk
+        transaction.on_commit(lambda: enqueue_embedding_refresh('project', project_id))
+
 @receiver(post_save, sender=Projects)
-def create_or_update_project_embedding(sender, instance, created, **kwargs):
-    # Always use get_or_create to ensure the embedding object exists
-    project_embedding, _ = ProjectEmbedding.objects.get_or_create(project=instance)
-
-    # 프로젝트 정보(예: description, title, goal, tech_stack)를 기반으로 임베딩 생성
-    text_to_embed = f"{instance.title} {instance.description} {instance.goal} {instance.tech_stack}"
-    if text_to_embed.strip(): # 빈 문자열이 아닌 경우에만 임베딩 생성
-        embedding = generate_embedding(text_to_embed)
-        if embedding:
-            project_embedding.embedding = embedding
-            project_embedding.save()
+def sync_project_index_openness(sender, instance, created, update_fields=None, **kwargs):
+    # 모집 마감/재개(is_open)를 ANN 인덱스에 반영 (닫힌 프로젝트는 추천하지 않음)
+    if created or (update_fields is not None and 'is_open' not in update_fields):
+        return
+    project_id, is_open = instance.pk, instance.is_open
+
+    def sync():
+        try:
+            sync_project_openness(project_id, is_open)
+        except Exception as e:
+            logger.error(f"Failed to sync project {project_id} openness to ANN index: {e}")
+    transaction.on_commit(sync)
 
 @receiver(post_save, sender=User)
-def create_or_update_user_embedding(sender, instance, created, **kwargs):
-    # Always use get_or_create to ensure the embedding object exists
-    user_embedding, _ = UserEmbedding.objects.get_or_create(user=instance)
-
-    # 사용자 정보(예: introduction)를 기반으로 임베딩 생성
-    text_to_embed_parts = []
-    if instance.introduction:
-        text_to_embed_parts.append(instance.introduction)
-    if instance.major:
-        text_to_embed_parts.append(f"주 전공: {instance.major}")
-    if instance.specialty:
-        text_to_embed_parts.append(f"특기: {instance.specialty}")
-    if instance.tech_stack:
-        text_to_embed_parts.append(f"기술 스택: {instance.tech_stack}")
-    if instance.experience_level:
-        text_to_embed_parts.append(f"경험 수준: {instance.experience_level}")
-    if instance.collaboration_style:
-        text_to_embed_parts.append(f"협업 스타일: {instance.collaboration_style}")
-    if instance.preferred_project_topics:
-        text_to_embed_parts.append(f"선호 프로젝트 주제: {instance.preferred_project_topics}")
-    if instance.belbin_role:
-        text_to_embed_parts.append(f"Belbin 역할: {instance.belbin_role}")
-
-    if instance.available_region:
-        # 콤마로 구분된 문자열을 리스트로 분리하여 임베딩 텍스트에 추가
-        regions = [region.strip() for region in instance.available_region.split(',') if region.strip()]
-        if regions:
-            text_to_embed_parts.append(f"활동 가능 지역: {', '.join(regions)}")
-
-    text_to_embed = " ".join(text_to_embed_parts)
-    if not text_to_embed and instance.name: # Fallback to name if all other fields are empty
-        text_to_embed = instance.name
-    if text_to_embed:
-        embedding = generate_embedding(text_to_embed)
-        if embedding:
-            user_embedding.embedding = embedding
-            user_embedding.save()
\ No newline at end of file
+def schedule_user_embedding_refresh(sender, instance, created, update_fields=None, **kwargs):
+    # 사용자 정보를 facet별(tech / profile / combined)로 임베딩
+    # 프로필 수정 API(UserProfileSerializer.update)도 이 시그널을 통해 같은 텍스트로 갱신됩니다.
+    if update_fields is not None and not USER_EMBEDDED_FIELDS.intersection(update_fields):
+        return
+    if user_embedding_needs_refresh(instance):
+        user_id = instance.pk
+        transaction.on_commit(lambda: enqueue_embedding_refresh('user', user_id))
+
+@receiver(post_delete, sender=Projects)
+def remove_project_from_index(sender, instance, **kwargs):
+    try:
+        project_index.remove(instance.pk)
+    except Exception as e:
+        logger.error(f"Failed to remove project {instance.pk} from ANN index: {e}")
+
+@receiver(post_delete, sender=User)
+def remove_user_from_index(sender, instance, **kwargs):
+    try:
+        user_index.remove(instance.pk)
+    except Exception as e:
+        logger.error(f"Failed to remove user {instance.pk} from ANN index: {e}")
@@ -0,0 +1,172 @@
+import functools
+import logging
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_redis_client = None
+
+
+def get_redis():
+    global _redis_client
+    if _redis_client is None:
+        import redis
+        _redis_client = redis.Redis.from_url(settings.REDIS_URL, socket_timeout=0.2, socket_connect_timeout=0.2)
+    return _redis_client
+
+
+class TaskDedup:
+    """
+    Redis 기반 태스크 중복 제거 / 디바운스. 모든 키는 (이름, 엔티티 id)로 구분됩니다.
+
+    - pending (먼저 온 요청 우선): 같은 키의 태스크가 대기 중이면 새로 예약하지 않습니다.
+    - supersede (나중 요청 우선): 예약할 때마다 세대 번호를 올리고, 실행 시 최신 세대가 아니면 건너뜁니다.
+      countdown과 함께 쓰면 마지막 요청 후 countdown 초 뒤에 한 번만 실행되는 디바운스가 됩니다.
+    - cooldown: 마지막 성공 후 cooldown 초 안의 요청은 아무것도 하지 않습니다 (force로 무시 가능).
+
+    Redis를 쓸 수 없으면 중복 제거 없이 항상 예약/실행합니다.
+    """
+
+    def __init__(self, prefix: str = "dedup:"):
+        self.prefix = prefix
+
+    def _key(self, kind: str, name: str, entity) -> str:
+        return f"{self.prefix}{kind}:{name}:{entity}"
+
+    # --- pending ---
+
+    def claim(self, name: str, entity, ttl: int) -> bool:
+        """키를 선점하면 True. 워커가 태스크를 잃어버려도 막히지 않도록 ttl 뒤에 만료됩니다."""
+        try:
+            return bool(get_redis().set(self._key("pending", name, entity), 1, nx=True, ex=ttl))
+        except Exception as e:
+            logger.warning(f"Could not check pending key for {name}:{entity}, enqueueing anyway: {e}")
+            return True
+
+    def claim_many(self, name: str, entities: list, ttl: int) -> list:
+        """선점에 성공한 엔티티만 반환합니다."""
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            for entity in entities:
+                pipe.set(self._key("pending", name, entity), 1, nx=True, ex=ttl)
+            return [entity for entity, ok in zip(entities, pipe.execute()) if ok]
+        except Exception as e:
+            logger.warning(f"Could not check pending keys for {name}, enqueueing anyway: {e}")
+            return list(entities)
+
+    def release(self, name: str, entity):
+        # 실행 시작 시 지워서, 실행 중에 생긴 변경은 새 태스크를 예약할 수 있게 함
+        try:
+            get_redis().delete(self._key("pending", name, entity))
+        except Exception as e:
+            logger.warning(f"Could not clear pending key for {name}:{entity}: {e}")
+
+    # --- supersede ---
+
+    def next_generation(self, name: str, entity, ttl: int):
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            key = self._key("generation", name, entity)
+            pipe.incr(key)
+            pipe.expire(key, ttl)
+            return pipe.execute()[0]
+        except Exception as e:
+            logger.warning(f"Could not bump generation for {name}:{entity}: {e}")
+            return None
+
+    def is_current(self, name: str, entity, generation) -> bool:
+        if generation is None:
+            return True
+        try:
+            current = get_redis().get(self._key("generation", name, entity))
+        except Exception as e:
+            logger.warning(f"Could not read generation for {name}:{entity}: {e}")
+            return True
+        return current is None or int(current) == int(generation)
+
+    # --- cooldown ---
+
+    def recently_succeeded(self, name: str, entity) -> bool:
+        try:
+            return bool(get_redis().exists(self._key("done", name, entity)))
+        except Exception as e:
+            logger.warning(f"Could not read last success for {name}:{entity}: {e}")
+            return False
+
+    def mark_succeeded(self, name: str, entity, cooldown: int):
+        try:
+            get_redis().set(self._key("done", name, entity), 1, ex=cooldown)
+        except Exception as e:
+            logger.warning(f"Could not record success for {name}:{entity}: {e}")
+
+    def reset(self, name: str, entity):
+        """데이터가 바뀌어 cooldown 중이라도 다시 계산해야 할 때 호출합니다."""
+        try:
+            get_redis().delete(self._key("done", name, entity))
+        except Exception as e:
+            logger.warning(f"Could not reset last success for {name}:{entity}: {e}")
+
+
+task_dedup = TaskDedup(getattr(settings, "TASK_DEDUP", {}).get("KEY_PREFIX", "dedup:"))
+
+
+def enqueue_deduplicated(task, *args, name: str, entity, countdown: int = None, cooldown: int = 0,
+                         supersede: bool = False, pending_ttl: int = 300, force: bool = False,
+                         inline_on_error: bool = False):
+    """
+    task.apply_async(args)를 중복 제거해서 예약합니다. 예약했으면 True.
+    supersede=False이면 pending 키로, True이면 세대 번호로 중복을 막습니다 (태스크는 @deduplicated여야 함).
+    브로커에 예약할 수 없으면 요청 경로를 막지 않도록 로그만 남깁니다 (inline_on_error=True이면 바로 실행).
+    """
+    if force:
+        task_dedup.reset(name, entity)
+    elif cooldown and task_dedup.recently_succeeded(name, entity):
+        logger.debug(f"Skipping {name}:{entity}: succeeded within the last {cooldown}s")
+        return False
+
+    kwargs = {}
+    if supersede:
+        kwargs["dedup_generation"] = task_dedup.next_generation(name, entity, (countdown or 0) + pending_ttl)
+    elif not task_dedup.claim(name, entity, pending_ttl):
+        return False
+    if force:
+        kwargs["dedup_force"] = True
+    try:
+        task.apply_async(args, kwargs, countdown=countdown)
+    except Exception as e:
+        task_dedup.release(name, entity)
+        if not inline_on_error:
+            logger.error(f"Could not enqueue {task.name}{args}: {e}")
+            return False
+        logger.error(f"Could not enqueue {task.name}{args}, running inline: {e}")
+        task(*args)
+    return True
+
+
+def deduplicated(name: str, entity=lambda *args: args[0], cooldown: int = 0, record_success: bool = True):
+    """
+    enqueue_deduplicated로 예약되는 태스크에 씌우는 데코레이터 (@shared_task 아래에 둡니다).
+    - 실행 시작 시 pending 키를 지웁니다.
+    - 더 새로운 요청으로 대체된 실행(supersede)과, cooldown 안에 이미 성공한 실행은 건너뜁니다.
+    - 성공하면 cooldown 동안 같은 요청을 무시하도록 기록합니다. 실제 작업을 다른 태스크(chord 등)에 넘기는 태스크는
+      record_success=False로 두고, 작업이 끝난 곳에서 task_dedup.mark_succeeded를 호출합니다.
+    entity는 태스크 인자로부터 엔티티 id를 만드는 함수입니다.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, dedup_generation=None, dedup_force=False, **kwargs):
+            key = entity(*args)
+            if not task_dedup.is_current(name, key, dedup_generation):
+                logger.info(f"Skipping {name}:{key}: superseded by a newer request")
+                return None
+            task_dedup.release(name, key)
+            if cooldown and not dedup_force and task_dedup.recently_succeeded(name, key):
+                logger.info(f"Skipping {name}:{key}: succeeded within the last {cooldown}s")
+                return None
+            result = func(*args, **kwargs)
+            if cooldown and record_success:
+                task_dedup.mark_succeeded(name, key, cooldown)
+            return result
+        return wrapper
+    return decorator
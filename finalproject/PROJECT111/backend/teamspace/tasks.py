@@ -1,41 +1,224 @@
+import os
+import time
+import uuid
 from celery import shared_task
-from .models import User, Projects
-from .ai_services import MatchService
+from celery.signals import task_prerun, task_postrun
+from django.conf import settings
+from django.utils import timezone
+from .models import User, Projects, MatchScores, UserTopRecommendations
+from .ai_services import (
+    MatchService, refresh_user_facet_embeddings, refresh_project_facet_embeddings, rebuild_top_recommendations,
+    explain_match, explain_matches, score_project_ids_for_user, score_user_ids_for_project, store_match_scores,
+    load_user_facet_vectors, load_project_facet_vectors, facet_drift, rescore_user_matches, rescore_project_matches,
+    mark_top_recommendations_stale_for_project,
+)
+from .ann_index import STORES as ANN_INDEX_STORES, user_index, project_index
+from .task_dedup import task_dedup, get_redis, enqueue_deduplicated, deduplicated
+from .metrics import CELERY_TASK_SECONDS
 import logging
 
 logger = logging.getLogger(__name__)
 
+# --- 태스크 실행 시간 지표 (teamspace_celery_task_seconds, 이 워커 프로세스에서 실행된 모든 태스크) ---
+
+_task_started = {}
+
+@task_prerun.connect
+def _record_task_start(task_id=None, **kwargs):
+    _task_started[task_id] = time.perf_counter()
+
+@task_postrun.connect
+def _record_task_duration(task_id=None, task=None, state=None, **kwargs):
+    started = _task_started.pop(task_id, None)
+    if started is not None and task is not None:
+        CELERY_TASK_SECONDS.labels(task=task.name, state=state or 'UNKNOWN').observe(time.perf_counter() - started)
+
+def _pair(user_id, project_id):
+    # (사용자, 프로젝트) 쌍 단위 태스크의 중복 제거 키
+    return f"{user_id}:{project_id}"
+
+# --- 매칭 점수 사전 계산 (id 구간별 청크 태스크로 나눠 병렬 처리) ---
+
+def _precompute_key(run_id):
+    return f"precompute:run:{run_id}"
+
+def _latest_precompute_key(kind, object_id):
+    return f"precompute:latest:{kind}:{object_id}"
+
+def _id_ranges(ids, chunk_size):
+    """정렬된 id 목록을 chunk_size개씩 (첫 id, 마지막 id) 구간으로 나눕니다."""
+    return [(ids[i], ids[min(i + chunk_size, len(ids)) - 1]) for i in range(0, len(ids), chunk_size)]
+
+def _update_progress(run_id, increments=None, **fields):
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        key = _precompute_key(run_id)
+        for name, amount in (increments or {}).items():
+            pipe.hincrby(key, name, amount)
+        if fields:
+            pipe.hset(key, mapping={name: str(value) for name, value in fields.items()})
+        pipe.expire(key, settings.PRECOMPUTE['PROGRESS_TTL'])
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Could not update precompute progress for run {run_id}: {e}")
+
+def get_precompute_progress(run_id):
+    """사전 계산 실행의 진행 상태 (없거나 Redis를 쓸 수 없으면 None)."""
+    try:
+        raw = get_redis().hgetall(_precompute_key(run_id))
+    except Exception as e:
+        logger.warning(f"Could not read precompute progress for run {run_id}: {e}")
+        return None
+    if not raw:
+        return None
+    progress = {k.decode(): v.decode() for k, v in raw.items()}
+    for name in ('total', 'processed', 'created', 'updated', 'errors', 'chunks', 'chunks_done'):
+        progress[name] = int(progress.get(name, 0))
+    progress['percent'] = round(100 * progress['processed'] / progress['total'], 1) if progress['total'] else 100.0
+    return progress
+
+def get_latest_precompute_run(kind, object_id):
+    try:
+        run_id = get_redis().get(_latest_precompute_key(kind, object_id))
+    except Exception as e:
+        logger.warning(f"Could not read latest precompute run for {kind} {object_id}: {e}")
+        return None
+    return run_id.decode() if run_id else None
+
+def _start_precompute(kind, object_id, ids, chunk_task):
+    """
+    ids를 PRECOMPUTE['CHUNK_SIZE']개씩 나눠 chunk_task 그룹으로 실행하고, 모두 끝나면
+    finish_precompute_task가 결과를 합산합니다 (chord). 진행 상태는 Redis 해시에 기록됩니다.
+    """
+    from celery import chord
+
+    run_id = uuid.uuid4().hex
+    ranges = _id_ranges(ids, settings.PRECOMPUTE['CHUNK_SIZE'])
+    _update_progress(
+        run_id, kind=kind, object_id=object_id, status='running' if ranges else 'done',
+        total=len(ids), processed=0, created=0, updated=0, errors=0, chunks=len(ranges), chunks_done=0,
+        started_at=timezone.now().isoformat(),
+    )
+    try:
+        get_redis().set(_latest_precompute_key(kind, object_id), run_id, ex=settings.PRECOMPUTE['PROGRESS_TTL'])
+    except Exception as e:
+        logger.warning(f"Could not record latest precompute run for {kind} {object_id}: {e}")
+    if ranges:
+        callback = finish_precompute_task.s(run_id, kind, object_id).on_error(
+            precompute_failed_task.s(run_id, kind, object_id)
+        )
+        chord(chunk_task.s(run_id, object_id, first_id, last_id) for first_id, last_id in ranges)(callback)
+    else:
+        _mark_precompute_succeeded(kind, object_id)
+    logger.info(f"Started precompute run {run_id} for {kind} {object_id}: {len(ids)} targets in {len(ranges)} chunks")
+    return run_id
+
+def _mark_precompute_succeeded(kind, object_id):
+    # 모든 청크가 끝난 뒤에만 cooldown 시작 (디스패치 태스크가 끝난 시점이 아님)
+    task_dedup.mark_succeeded(f'precompute-{kind}', object_id, settings.TASK_DEDUP['PRECOMPUTE_COOLDOWN'])
+
+def _finish_chunk(run_id, summary):
+    _update_progress(run_id, increments={**summary, 'chunks_done': 1})
+    return summary
+
+def enqueue_user_precompute(user_id, force=False):
+    """
+    로그인/프로필 변경 시 호출합니다. 대기 중인 요청은 새 요청으로 대체되고,
+    PRECOMPUTE_COOLDOWN 안에 이미 성공한 사용자는 force가 아니면 건너뜁니다.
+    """
+    enqueue_deduplicated(
+        precompute_matches_for_user_task, user_id, name='precompute-user', entity=user_id,
+        cooldown=settings.TASK_DEDUP['PRECOMPUTE_COOLDOWN'], supersede=True, force=force,
+    )
+
 @shared_task
+@deduplicated('precompute-user', cooldown=settings.TASK_DEDUP['PRECOMPUTE_COOLDOWN'], record_success=False) # 성공은 finish_precompute_task에서 기록
 def precompute_matches_for_user_task(user_id):
+    if not User.objects.filter(pk=user_id).exists():
+        logger.error(f"User with ID {user_id} does not exist. Cannot run pre-computation task.")
+        return None
+    project_ids = list(Projects.objects.filter(is_open=True).order_by('pk').values_list('pk', flat=True))
+    return _start_precompute('user', user_id, project_ids, precompute_user_chunk_task)
+
+@shared_task
+def precompute_user_chunk_task(run_id, user_id, first_project_id, last_project_id):
+    """한 사용자와 project_id 구간 [first, last]의 공개 프로젝트 점수를 한 번의 행렬 연산으로 계산해 저장합니다."""
+    project_ids = list(
+        Projects.objects.filter(is_open=True, pk__gte=first_project_id, pk__lte=last_project_id)
+        .order_by('pk').values_list('pk', flat=True)
+    )
+    summary = {'processed': len(project_ids), 'created': 0, 'updated': 0, 'errors': 0}
     try:
         user = User.objects.get(pk=user_id)
-        logger.info(f"Starting pre-computation task for user {user.email} (ID: {user_id})")
-        all_projects = Projects.objects.filter(is_open=True)
-        for project in all_projects:
-            try:
-                MatchService.get_or_create_match_score(user, project)
-            except Exception as e:
-                logger.error(f"Error pre-computing match for user {user.email} and project {project.title}: {e}")
-        logger.info(f"Finished pre-computation task for user {user.email} (ID: {user_id})")
-    except User.DoesNotExist:
-        logger.error(f"User with ID {user_id} does not exist. Cannot run pre-computation task.")
+        scores = score_project_ids_for_user(user, project_ids)
+        summary['created'], summary['updated'] = store_match_scores(
+            [(user_id, project_id, score) for project_id, score in zip(project_ids, scores)]
+        )
+    except Exception as e:
+        logger.error(f"Error pre-computing matches for user {user_id}, projects {first_project_id}-{last_project_id}: {e}")
+        summary['errors'] = len(project_ids)
+    return _finish_chunk(run_id, summary)
 
 @shared_task
+@deduplicated('precompute-project', cooldown=settings.TASK_DEDUP['PRECOMPUTE_COOLDOWN'], record_success=False)
 def precompute_matches_for_project_task(project_id):
+    if not Projects.objects.filter(pk=project_id).exists():
+        logger.error(f"Project with ID {project_id} does not exist. Cannot run pre-computation task.")
+        return None
+    user_ids = list(User.objects.filter(is_active=True).order_by('pk').values_list('pk', flat=True))
+    return _start_precompute('project', project_id, user_ids, precompute_project_chunk_task)
+
+@shared_task
+def precompute_project_chunk_task(run_id, project_id, first_user_id, last_user_id):
+    """한 프로젝트와 user_id 구간 [first, last]의 활성 사용자 점수를 계산해 저장합니다."""
+    user_ids = list(
+        User.objects.filter(is_active=True, pk__gte=first_user_id, pk__lte=last_user_id)
+        .order_by('pk').values_list('pk', flat=True)
+    )
+    summary = {'processed': len(user_ids), 'created': 0, 'updated': 0, 'errors': 0}
     try:
         project = Projects.objects.get(pk=project_id)
-        logger.info(f"Starting pre-computation task for project {project.title} (ID: {project_id})")
-        all_users = User.objects.filter(is_active=True)
-        for user in all_users:
-            try:
-                MatchService.get_or_create_match_score(user, project)
-            except Exception as e:
-                logger.error(f"Error pre-computing match for project {project.title} and user {user.email}: {e}")
-        logger.info(f"Finished pre-computation task for project {project.title} (ID: {project_id})")
-    except Projects.DoesNotExist:
-        logger.error(f"Project with ID {project_id} does not exist. Cannot run pre-computation task.")
+        scores = score_user_ids_for_project(project, user_ids)
+        summary['created'], summary['updated'] = store_match_scores(
+            [(user_id, project_id, score) for user_id, score in zip(user_ids, scores)]
+        )
+    except Exception as e:
+        logger.error(f"Error pre-computing matches for project {project_id}, users {first_user_id}-{last_user_id}: {e}")
+        summary['errors'] = len(user_ids)
+    return _finish_chunk(run_id, summary)
+
+@shared_task
+def finish_precompute_task(chunk_summaries, run_id, kind=None, object_id=None):
+    """
+    chord 콜백: 청크 결과를 합산해 진행 상태를 done으로 바꾸고 요약을 반환합니다.
+    오류 없이 끝난 경우에만 cooldown을 시작하므로, 실패한 청크가 있으면 다음 요청에서 다시 계산됩니다.
+    """
+    summary = {'chunks': len(chunk_summaries)}
+    for name in ('processed', 'created', 'updated', 'errors'):
+        summary[name] = sum(chunk.get(name, 0) for chunk in chunk_summaries)
+    _update_progress(run_id, status='done', finished_at=timezone.now().isoformat())
+    if kind is not None and not summary['errors']:
+        _mark_precompute_succeeded(kind, object_id)
+    logger.info(f"Finished precompute run {run_id}: {summary}")
+    return {'run_id': run_id, **summary}
 
 @shared_task
+def precompute_failed_task(request, exc, traceback, run_id, kind, object_id):
+    """chord 오류 콜백: 실행을 failed로 표시하고 dedup 키를 지워 다음 요청이 바로 다시 예약될 수 있게 합니다."""
+    logger.error(f"Precompute run {run_id} for {kind} {object_id} failed: {exc!r}")
+    _update_progress(run_id, status='failed', finished_at=timezone.now().isoformat())
+    task_dedup.release(f'precompute-{kind}', object_id)
+    task_dedup.reset(f'precompute-{kind}', object_id)
+
+def enqueue_single_match_score(user_id, project_id):
+    # 프로젝트를 연달아 수정해도 대기 중인 계산은 하나만 남음
+    enqueue_deduplicated(
+        calculate_single_match_score_task, user_id, project_id,
+        name='match-single', entity=_pair(user_id, project_id), supersede=True,
+    )
+
+@shared_task
+@deduplicated('match-single', entity=_pair)
 def calculate_single_match_score_task(user_id, project_id):
     try:
         user = User.objects.get(pk=user_id)
@@ -45,3 +228,165 @@ def calculate_single_match_score_task(user_id, project_id):
         logger.info(f"Finished single match calculation for user {user.email} and project {project.title}")
     except (User.DoesNotExist, Projects.DoesNotExist) as e:
         logger.error(f"Cannot calculate single match score: {e}")
+
+# --- 임베딩 갱신 (post_save 시그널에서 예약) ---
+
+def enqueue_embedding_refresh(kind, object_id):
+    """
+    임베딩 갱신 태스크를 DEBOUNCE_SECONDS 뒤에 실행되도록 예약합니다 ('user' 또는 'project').
+    새 요청이 대기 중인 태스크를 대체하므로, 그 사이의 반복 저장은 마지막 저장 후 한 번의 인코딩으로 합쳐집니다.
+    (태스크는 실행 시점의 DB 값을 읽습니다.)
+    """
+    task = refresh_user_embedding_task if kind == 'user' else refresh_project_embedding_task
+    enqueue_deduplicated(
+        task, object_id, name=f'embedding-refresh-{kind}', entity=object_id,
+        countdown=settings.EMBEDDING_REFRESH['DEBOUNCE_SECONDS'], supersede=True, inline_on_error=True,
+    )
+
+@shared_task
+@deduplicated('embedding-refresh-user')
+def refresh_user_embedding_task(user_id):
+    try:
+        user = User.objects.get(pk=user_id)
+    except User.DoesNotExist:
+        logger.info(f"User {user_id} no longer exists. Skipping embedding refresh.")
+        return
+    before = load_user_facet_vectors(user)
+    combined = refresh_user_facet_embeddings(user) # 텍스트가 바뀐 facet만 인코딩
+    if combined is None:
+        return
+    try:
+        user_index.upsert(user_id, combined)
+    except Exception as e:
+        logger.error(f"Failed to update ANN index for user {user_id}: {e}")
+    # 임베딩이 바뀌었으므로 이 사용자의 추천 목록과 기존 매칭 점수를 새 임베딩으로 다시 계산
+    # (행을 지우지 않으므로 설명은 크게 바뀐 쌍만 stale로 표시되어 볼 때 다시 생성됨)
+    rebuild_top_recommendations(user)
+    drift = facet_drift(before, load_user_facet_vectors(user))
+    changed = rescore_user_matches(user, drift)
+    logger.info(f"Rescored {changed} match scores for user {user_id} (facet drift {drift:.4f})")
+
+@shared_task
+@deduplicated('embedding-refresh-project')
+def refresh_project_embedding_task(project_id):
+    try:
+        project = Projects.objects.get(pk=project_id)
+    except Projects.DoesNotExist:
+        logger.info(f"Project {project_id} no longer exists. Skipping embedding refresh.")
+        return
+    before = load_project_facet_vectors(project)
+    combined = refresh_project_facet_embeddings(project)
+    if combined is None:
+        return
+    try:
+        if project.is_open:
+            project_index.upsert(project_id, combined)
+        else:
+            project_index.remove(project_id) # 닫힌 프로젝트는 추천 대상이 아님
+    except Exception as e:
+        logger.error(f"Failed to update ANN index for project {project_id}: {e}")
+    # 이 프로젝트가 들어 있거나 새 점수로 들어갈 수 있는 사용자의 추천 목록만 stale로 표시하고 백그라운드에서 다시 계산
+    stale = mark_top_recommendations_stale_for_project(project)
+    logger.info(f"Marked {stale} top recommendation lists stale for project {project_id}")
+    if stale:
+        enqueue_stale_top_recommendations_rebuild()
+    # 이 프로젝트의 기존 매칭 점수를 모두 새 임베딩으로 다시 계산 (설명은 크게 바뀐 쌍만 stale)
+    drift = facet_drift(before, load_project_facet_vectors(project))
+    changed = rescore_project_matches(project, drift)
+    logger.info(f"Rescored {changed} match scores for project {project_id} (facet drift {drift:.4f})")
+    # 생성자 점수가 아직 없으면 새로 계산 (기존 ProjectSerializer.create 동작과 동일)
+    enqueue_single_match_score(project.creator_id, project_id)
+
+# --- ANN 인덱스 (파일이 없을 때 IndexStore.get에서 예약) ---
+
+def enqueue_ann_index_build(name):
+    enqueue_deduplicated(build_ann_index_task, name, name='ann-index-build', entity=name, pending_ttl=600)
+
+@shared_task
+@deduplicated('ann-index-build')
+def build_ann_index_task(name):
+    store = ANN_INDEX_STORES[name]
+    if os.path.exists(store.path):
+        logger.info(f"ANN index '{name}' already exists. Skipping build.")
+        return
+    index = store.build()
+    logger.info(f"Built ANN index '{name}' ({index.backend}, {len(index)} vectors) in {index.meta['build_seconds']}s")
+
+# --- 사전 계산된 상위 K 추천 목록 (UserTopRecommendations) ---
+
+def enqueue_top_recommendations_rebuild(user_id):
+    # 대기 중인 재계산이 있으면 다시 예약하지 않음 (요청마다 중복 예약되지 않도록)
+    enqueue_deduplicated(rebuild_top_recommendations_task, user_id, name='toprec-rebuild', entity=user_id)
+
+def enqueue_stale_top_recommendations_rebuild():
+    enqueue_deduplicated(rebuild_stale_top_recommendations_task, name='toprec-rebuild-stale', entity='all')
+
+@shared_task
+@deduplicated('toprec-rebuild')
+def rebuild_top_recommendations_task(user_id):
+    try:
+        user = User.objects.get(pk=user_id)
+    except User.DoesNotExist:
+        logger.info(f"User {user_id} no longer exists. Skipping top recommendations rebuild.")
+        return
+    rebuild_top_recommendations(user)
+
+@shared_task
+@deduplicated('toprec-rebuild-stale', entity=lambda: 'all')
+def rebuild_stale_top_recommendations_task():
+    # 가장 오래된 목록부터 다시 계산. 처리 중에 다시 stale로 표시된 행은 다음 실행에서 처리됨
+    stale_user_ids = list(
+        UserTopRecommendations.objects.filter(is_stale=True).order_by('computed_at').values_list('user_id', flat=True)
+    )
+    logger.info(f"Rebuilding {len(stale_user_ids)} stale top recommendation lists")
+    for user in User.objects.filter(pk__in=stale_user_ids).iterator():
+        try:
+            rebuild_top_recommendations(user)
+        except Exception as e:
+            logger.error(f"Error rebuilding top recommendations for user {user.pk}: {e}")
+
+# --- 매칭 설명 (LLM) ---
+
+def enqueue_match_explanation(user_id, project_id):
+    """설명 생성 태스크를 예약합니다. 같은 쌍이 이미 대기 중이면 다시 예약하지 않습니다."""
+    enqueue_deduplicated(
+        generate_match_explanation_task, user_id, project_id,
+        name='explain', entity=_pair(user_id, project_id), pending_ttl=600,
+    )
+
+@shared_task
+@deduplicated('explain', entity=_pair)
+def generate_match_explanation_task(user_id, project_id):
+    try:
+        match_score_entry = MatchScores.objects.select_related('user', 'project').get(user_id=user_id, project_id=project_id)
+    except MatchScores.DoesNotExist:
+        logger.info(f"Match score for user {user_id} and project {project_id} no longer exists. Skipping explanation.")
+        return
+    if match_score_entry.explanation_status not in MatchScores.EXPLANATION_NEEDED_STATUSES:
+        return
+    explain_match(match_score_entry)
+
+def enqueue_match_explanations(user_id, project_ids):
+    """
+    한 사용자의 여러 프로젝트 설명을 배치 태스크 하나로 예약합니다.
+    단건 예약과 같은 쌍별 대기 키를 쓰므로, 이미 대기 중인 쌍은 빠집니다.
+    """
+    pairs = task_dedup.claim_many('explain', [_pair(user_id, project_id) for project_id in project_ids], 600)
+    acquired = [int(pair.split(':')[1]) for pair in pairs]
+    if not acquired:
+        return
+    try:
+        generate_match_explanations_task.delay(user_id, acquired)
+    except Exception as e:
+        logger.error(f"Could not enqueue match explanations for user {user_id}: {e}")
+
+@shared_task
+def generate_match_explanations_task(user_id, project_ids):
+    for project_id in project_ids:
+        task_dedup.release('explain', _pair(user_id, project_id))
+    entries = list(
+        MatchScores.objects.select_related('user', 'project')
+        .filter(user_id=user_id, project_id__in=project_ids, explanation_status__in=MatchScores.EXPLANATION_NEEDED_STATUSES)
+    )
+    if entries:
+        explain_matches(entries)
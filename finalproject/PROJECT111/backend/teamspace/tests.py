@@ -1,3 +1,789 @@
-from django.test import TestCase
+import asyncio
+import tempfile
+import uuid
+from unittest import SkipTest, mock
 
- --  Create your tests here.
+import httpx
+import numpy as np
+import openai
+from django.conf import settings
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import resolve, reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import ai_services, ann_index, llm_client, rate_limiter, request_metrics, task_dedup, tasks
+from .vectors import pack_vec
+from .models import (
+    User, Projects, ProjectApplicants, MatchScores, UserTopRecommendations, ProjectEmbedding, ProjectFacetEmbedding,
+    UserFacetEmbedding,
+)
+
+PAGE_SIZE = 100
+
+
+class ProjectListQueryCountTests(TestCase):
+    """프로젝트 목록 API의 쿼리 수가 페이지 크기와 무관하게 일정한지 확인합니다 (N+1 방지)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = User.objects.create_user(email='viewer@example.com', password='pw', name='viewer')
+        creators = [
+            User.objects.create_user(email=f'creator{i}@example.com', password='pw', name=f'creator{i}')
+            for i in range(5)
+        ]
+        Projects.objects.bulk_create([
+            Projects(creator=creators[i % len(creators)], title=f'project {i}', tech_stack='Django')
+            for i in range(PAGE_SIZE)
+        ])
+        cls.projects = list(Projects.objects.order_by('project_id'))
+        # 절반의 프로젝트에만 점수가 있음 (나머지는 user_matching_rate가 None)
+        MatchScores.objects.bulk_create([
+            MatchScores(user=cls.viewer, project=project, score=50.0 + i % 10, explanation={})
+            for i, project in enumerate(cls.projects[::2])
+        ])
+        # 본인 프로젝트 목록(projects/my/)용
+        Projects.objects.bulk_create([
+            Projects(creator=cls.viewer, title=f'my project {i}') for i in range(PAGE_SIZE)
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+
+    def assert_matching_rates(self, results):
+        scores = dict(MatchScores.objects.filter(user=self.viewer).values_list('project_id', 'score'))
+        for project in results:
+            expected = scores.get(project['project_id'])
+            self.assertEqual(project['user_matching_rate'], round(expected, 2) if expected is not None else None)
+            self.assertIn('name', project['creator'])
+
+    def test_project_list_page_uses_constant_queries(self):
+        # COUNT + 프로젝트(creator JOIN) + 매칭 점수 IN 쿼리
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('project-list'), {'page_size': PAGE_SIZE})
+        self.assertEqual(len(response.data['results']), PAGE_SIZE)
+        self.assert_matching_rates(response.data['results'])
+
+    def test_project_list_anonymous_skips_match_scores(self):
+        self.client.force_authenticate(None)
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('project-list'), {'page_size': PAGE_SIZE})
+        self.assertTrue(all(project['user_matching_rate'] is None for project in response.data['results']))
+
+    def test_project_search_page_uses_constant_queries(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('project-search'), {'page_size': PAGE_SIZE, 'ordering': 'created_at'})
+        self.assertEqual(len(response.data['results']), PAGE_SIZE)
+        self.assert_matching_rates(response.data['results'])
+
+    def test_my_project_list_uses_constant_queries(self):
+        # 활성 프로젝트 COUNT + 지원자 수 annotate 목록 + 매칭 점수 IN 쿼리
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('my-project-list'))
+        self.assertEqual(len(response.data['projects']), PAGE_SIZE)
+        self.assertEqual(response.data['summary']['active_projects'], PAGE_SIZE)
+
+
+class ProjectDetailQueryCountTests(TestCase):
+    """상세/추천 직렬화가 MatchScores와 지원자 수를 프로젝트마다 다시 조회하지 않는지 확인합니다."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = User.objects.create_user(email='viewer@example.com', password='pw', name='viewer')
+        creator = User.objects.create_user(email='creator@example.com', password='pw', name='creator')
+        applicants = [
+            User.objects.create_user(email=f'applicant{i}@example.com', password='pw', name=f'applicant{i}')
+            for i in range(3)
+        ]
+        Projects.objects.bulk_create([
+            Projects(creator=creator, title=f'project {i}', tech_stack='Django') for i in range(PAGE_SIZE)
+        ])
+        cls.projects = list(Projects.objects.order_by('project_id'))
+        ProjectApplicants.objects.bulk_create([
+            ProjectApplicants(project=project, user=applicant)
+            for project in cls.projects[:10] for applicant in applicants
+        ])
+        # 설명까지 준비된 점수 (설명 생성 태스크가 예약되지 않도록)
+        MatchScores.objects.bulk_create([
+            MatchScores(
+                user=cls.viewer, project=project, score=90.0 - i * 0.5, tech_score=80, personality_score=70,
+                experience_score=60, explanation={'primary_reason': f'reason {i}'}, explanation_status='ready',
+            )
+            for i, project in enumerate(cls.projects)
+        ])
+        UserTopRecommendations.objects.create(
+            user=cls.viewer,
+            project_ids=[project.pk for project in cls.projects],
+            scores=[90.0 - i * 0.5 for i in range(PAGE_SIZE)],
+            model_version=settings.SBERT_MODEL_VERSION,
+            computed_at=timezone.now(),
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+
+    def test_project_detail_reads_match_score_once(self):
+        project = self.projects[0]
+        # 프로젝트(creator JOIN + 지원자 수) + MatchScores get_or_create의 조회 한 번
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('project-detail', args=[project.pk]))
+        self.assertEqual(response.data['applicant_count'], 3)
+        self.assertEqual(response.data['user_matching_rate'], 90.0)
+        self.assertEqual(response.data['user_match_explanation'], {'primary_reason': 'reason 0'})
+        self.assertEqual(response.data['user_match_explanation_status'], 'ready')
+        self.assertEqual(response.data['user_match_scores'], {'tech': 80, 'personality': 70, 'experience': 60})
+
+    def test_recommended_page_uses_constant_queries(self):
+        # 상위 K 목록 + 프로젝트(creator JOIN + 지원자 수) + MatchScores IN 쿼리
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('project-recommended-list'), {'page_size': PAGE_SIZE})
+        recommended = response.data['recommended_projects']
+        self.assertEqual(len(recommended), PAGE_SIZE)
+        self.assertEqual([item['project']['applicant_count'] for item in recommended[:11]], [3] * 10 + [0])
+        for i, item in enumerate(recommended):
+            self.assertEqual(item['project']['user_match_explanation'], {'primary_reason': f'reason {i}'})
+            self.assertEqual(item['project']['user_matching_rate'], item['score'])
+
+
+class ProjectApplicantsQueryCountTests(TestCase):
+    """지원자 목록의 쿼리 수가 지원자 수와 무관하게 일정한지 확인합니다."""
+
+    APPLICANT_COUNT = 200
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.creator = User.objects.create_user(email='creator@example.com', password='pw', name='creator')
+        cls.project = Projects.objects.create(creator=cls.creator, title='popular project')
+        User.objects.bulk_create([
+            User(email=f'applicant{i}@example.com', name=f'applicant{i}', specialty='backend,ai')
+            for i in range(cls.APPLICANT_COUNT)
+        ])
+        applicants = list(User.objects.filter(email__startswith='applicant').order_by('user_id'))
+        statuses = [status for status, _ in ProjectApplicants.STATUS_CHOICES]
+        ProjectApplicants.objects.bulk_create([
+            ProjectApplicants(project=cls.project, user=user, status=statuses[i % len(statuses)])
+            for i, user in enumerate(applicants)
+        ])
+        # 절반의 지원자만 매칭 점수가 있음 (나머지는 0으로 표시)
+        MatchScores.objects.bulk_create([
+            MatchScores(user=user, project=cls.project, score=70.0, tech_score=60, experience_score=50,
+                        personality_score=40, explanation={})
+            for user in applicants[::2]
+        ])
+
+    def test_applicants_list_uses_constant_queries(self):
+        client = APIClient()
+        client.force_authenticate(self.creator)
+        # 프로젝트 + 상태별 조건부 집계 + 지원자(user JOIN) + 매칭 점수 IN 쿼리
+        with self.assertNumQueries(4):
+            response = client.get(reverse('project-applicants-list', args=[self.project.pk]))
+        quarter = self.APPLICANT_COUNT // 4
+        self.assertEqual(response.data['summary'], {'pending': quarter, 'reviewed': quarter, 'approved': quarter, 'rejected': quarter})
+        self.assertEqual(len(response.data['applicants']), self.APPLICANT_COUNT)
+        match_rates = sorted(applicant['match_rate'] for applicant in response.data['applicants'])
+        self.assertEqual(match_rates, [0] * (self.APPLICANT_COUNT // 2) + [70.0] * (self.APPLICANT_COUNT // 2))
+        self.assertEqual(response.data['applicants'][0]['skills'], ['backend', 'ai'])
+
+
+COMPLETION = {
+    'id': 'chatcmpl-test', 'object': 'chat.completion', 'created': 0, 'model': 'gpt-test',
+    'choices': [{'index': 0, 'finish_reason': 'stop', 'message': {'role': 'assistant', 'content': 'ok'}}],
+    'usage': {'prompt_tokens': 3, 'completion_tokens': 2, 'total_tokens': 5},
+}
+
+
+@override_settings(LLM_CLIENT={**settings.LLM_CLIENT, 'BASE_URL': None, 'MAX_RETRIES': 2, 'BACKOFF_BASE': 0.5, 'BACKOFF_MAX': 20.0})
+class LLMClientRetryTests(SimpleTestCase):
+    """LLMClient의 재시도/백오프를 httpx.MockTransport로 실제 HTTP 응답을 흉내 내어 확인합니다 (네트워크/Redis 사용 안 함)."""
+
+    def setUp(self):
+        self.requests = []
+        self.responses = []
+        transport = httpx.MockTransport(self.handle)
+
+        class MockHttpClient(httpx.Client):
+            def __init__(self, **kwargs):
+                super().__init__(transport=transport, **kwargs)
+
+        patchers = [
+            mock.patch.object(llm_client.httpx, 'Client', MockHttpClient),
+            mock.patch.object(llm_client, 'llm_rate_limiter'),
+            mock.patch.object(llm_client.time, 'sleep'),
+        ]
+        _, self.rate_limiter, self.sleep = [patcher.start() for patcher in patchers]
+        for patcher in patchers:
+            self.addCleanup(patcher.stop)
+        self.client = llm_client.LLMClient('sk-test')
+
+    def handle(self, request):
+        self.requests.append(request)
+        status, headers = self.responses.pop(0)
+        if status == 200:
+            return httpx.Response(200, json=COMPLETION)
+        return httpx.Response(status, headers=headers, json={'error': {'message': 'try again', 'type': 'test'}})
+
+    def chat(self):
+        return self.client.chat(model='gpt-test', messages=[{'role': 'user', 'content': 'hi'}], max_tokens=10)
+
+    def test_rate_limited_request_waits_for_retry_after(self):
+        self.responses = [(429, {'retry-after': '3'}), (200, {})]
+        response = self.chat()
+        self.assertEqual(response.choices[0].message.content, 'ok')
+        self.assertEqual(len(self.requests), 2)
+        self.sleep.assert_called_once_with(3.0)
+        # 시도마다 공유 예산을 다시 받고, 성공한 응답의 실제 토큰 수로 보정
+        self.assertEqual(self.rate_limiter.acquire.call_count, 2)
+        self.rate_limiter.reconcile.assert_called_once_with(self.rate_limiter.estimate_tokens.return_value, 5)
+
+    def test_retry_after_is_capped_by_backoff_max(self):
+        self.responses = [(429, {'retry-after': '600'}), (200, {})]
+        self.chat()
+        self.sleep.assert_called_once_with(20.0)
+
+    def test_server_errors_back_off_with_full_jitter(self):
+        self.responses = [(503, {}), (500, {}), (200, {})]
+        with mock.patch.object(llm_client.random, 'uniform', side_effect=lambda low, high: high / 2) as uniform:
+            self.chat()
+        # 대기 시간 = uniform(0, BACKOFF_BASE * 2^attempt)
+        self.assertEqual([c.args for c in uniform.call_args_list], [(0, 0.5), (0, 1.0)])
+        self.assertEqual([c.args[0] for c in self.sleep.call_args_list], [0.25, 0.5])
+        self.assertEqual(len(self.requests), 3)
+
+    def test_gives_up_after_max_retries(self):
+        self.responses = [(500, {})] * 3
+        with self.assertRaises(openai.InternalServerError):
+            self.chat()
+        # 첫 시도 + MAX_RETRIES번 재시도 (SDK 자체 재시도는 꺼져 있어 시도당 요청 한 번)
+        self.assertEqual(len(self.requests), 3)
+        self.assertEqual(self.sleep.call_count, 2)
+
+    def test_client_errors_are_not_retried(self):
+        self.responses = [(400, {})]
+        with self.assertRaises(openai.BadRequestError):
+            self.chat()
+        self.assertEqual(len(self.requests), 1)
+        self.sleep.assert_not_called()
+
+
+class GetLLMClientTests(SimpleTestCase):
+    """get_llm_client는 프로세스 안에서 클라이언트를 재사용하고, fork된 프로세스에서는 새로 만듭니다."""
+
+    def setUp(self):
+        patchers = [
+            mock.patch.object(llm_client, '_client', None),
+            mock.patch.object(llm_client, '_client_pid', None),
+            mock.patch.object(llm_client, '_api_key', return_value='sk-test'),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_client_is_shared_within_a_process(self):
+        with mock.patch.object(llm_client.os, 'getpid', return_value=100):
+            self.assertIs(llm_client.get_llm_client(), llm_client.get_llm_client())
+
+    def test_client_is_recreated_after_fork(self):
+        with mock.patch.object(llm_client.os, 'getpid', return_value=100):
+            parent = llm_client.get_llm_client()
+        with mock.patch.object(llm_client.os, 'getpid', return_value=200):
+            child = llm_client.get_llm_client()
+            self.assertIs(llm_client.get_llm_client(), child)
+        self.assertIsNot(parent, child)
+        self.assertIsNot(parent._http_client, child._http_client)
+
+    def test_no_client_without_api_key(self):
+        with mock.patch.object(llm_client, '_api_key', return_value=None):
+            self.assertIsNone(llm_client.get_llm_client())
+
+
+class ANNIndexTests(SimpleTestCase):
+    """exact / IVF 인덱스의 경계 조건."""
+
+    def setUp(self):
+        self.vectors = np.random.default_rng(0).normal(size=(50, 8)).astype(np.float32)
+
+    def test_ivf_search_with_empty_probed_clusters_returns_nothing(self):
+        index = ann_index.IVFIndex(nlist=5, nprobe=1).build(np.arange(50), self.vectors)
+        index.assignments[:] = 0 # 가장 가까운 클러스터가 비어 있도록 모든 행을 클러스터 0에 둠
+        probed = index._candidate_rows(ann_index._normalize(-index.centroids[0]))
+        self.assertEqual(len(probed), 0)
+        self.assertEqual(index.search(-index.centroids[0], 5), [])
+
+    def test_upsert_rejects_other_dimension(self):
+        index = ann_index.BruteForceIndex().build(np.arange(50), self.vectors)
+        with self.assertRaises(ValueError):
+            index.upsert(99, np.ones(4))
+        self.assertNotIn(99, index)
+
+
+class ProjectIndexOpennessTests(TestCase):
+    """닫힌 프로젝트는 프로젝트 ANN 인덱스에 들어가지 않고, 닫거나 다시 열면 인덱스에 반영됩니다."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patcher = override_settings(ANN_INDEX={**settings.ANN_INDEX, 'DIR': directory.name, 'BACKEND': 'exact'})
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+        creator = User.objects.create_user(email='creator@example.com', password='pw', name='creator')
+        self.open_project = Projects.objects.create(creator=creator, title='open')
+        self.closed_project = Projects.objects.create(creator=creator, title='closed', is_open=False)
+        for i, project in enumerate([self.open_project, self.closed_project]):
+            ProjectFacetEmbedding.objects.create(
+                project=project, facet='combined', model_version=settings.SBERT_MODEL_VERSION,
+                vector=pack_vec(np.eye(4)[i]), source_hash='x',
+            )
+        self.store = ann_index.project_index
+        self.store._index = self.store._mtime = None
+        self.addCleanup(setattr, self.store, '_index', None)
+        self.store.build()
+
+    def test_closed_projects_are_not_indexed(self):
+        self.assertIn(self.open_project.pk, self.store.get())
+        self.assertNotIn(self.closed_project.pk, self.store.get())
+
+    def test_closing_and_reopening_updates_the_index(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.open_project.is_open = False
+            self.open_project.save(update_fields=['is_open'])
+            self.closed_project.is_open = True
+            self.closed_project.save(update_fields=['is_open'])
+        self.assertNotIn(self.open_project.pk, self.store.get())
+        self.assertIn(self.closed_project.pk, self.store.get())
+
+
+class VectorizedMatchScoreTests(TestCase):
+    """행렬-벡터 곱 점수가 쌍별 공식 BASE_SCORE + (기술 유사도 * TECH_WEIGHT + 프로필 유사도 * PROFILE_WEIGHT) * 100 (최대 100)과 같은지."""
+
+    # (tech, profile) 벡터와 기준 벡터 (tech [1, 0, 0], profile [0, 1, 0])에 대한 기대 점수
+    CASES = [
+        ([1, 0, 0], [0, 1, 0], 100.0), # 20 + 100 -> 100으로 제한
+        ([1, 1, 0], [0, 0, 1], 62.43), # 20 + 0.6 * cos 45° * 100
+        ([0, 1, 0], [3, 4, 0], 52.0), # 20 + 0.4 * 0.8 * 100 (정규화 후 비교)
+        (None, None, 20.0), # 임베딩 없음 -> 유사도 0
+    ]
+
+    def setUp(self):
+        patcher = mock.patch.object(ai_services, 'get_snapshot', return_value=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        with mock.patch('teamspace.signals.user_embedding_needs_refresh', return_value=False), \
+                mock.patch('teamspace.signals.project_embedding_needs_refresh', return_value=False):
+            self.user = User.objects.create_user(email='user@example.com', password='pw', name='user')
+            self.project = Projects.objects.create(creator=self.user, title='project')
+            self.others = [
+                (User.objects.create_user(email=f'user{i}@example.com', password='pw', name=f'user{i}'),
+                 Projects.objects.create(creator=self.user, title=f'project{i}'))
+                for i in range(len(self.CASES))
+            ]
+        self._store(UserFacetEmbedding, user=self.user, tech=[1, 0, 0], profile=[0, 1, 0])
+        self._store(ProjectFacetEmbedding, project=self.project, tech=[1, 0, 0], profile=[0, 1, 0])
+        for (user, project), (tech, profile, _) in zip(self.others, self.CASES):
+            self._store(UserFacetEmbedding, user=user, tech=tech, profile=profile)
+            self._store(ProjectFacetEmbedding, project=project, tech=tech, profile=profile)
+
+    @staticmethod
+    def _store(model, tech, profile, **owner):
+        for facet, vector in (('tech', tech), ('profile', profile)):
+            if vector is not None:
+                model.objects.create(
+                    **owner, facet=facet, model_version=settings.SBERT_MODEL_VERSION,
+                    vector=pack_vec(np.asarray(vector, dtype=np.float32)), source_hash='x',
+                )
+
+    def _pair_score(self, tech, profile):
+        weighted = (
+            ai_services.calculate_similarity([1, 0, 0], tech) * ai_services.TECH_WEIGHT
+            + ai_services.calculate_similarity([0, 1, 0], profile) * ai_services.PROFILE_WEIGHT
+        ) * 100
+        return round(min(ai_services.BASE_SCORE + weighted, 100.0), 2)
+
+    def test_project_scores_for_user_match_pair_formula(self):
+        scores = ai_services.score_project_ids_for_user(self.user, [project.pk for _, project in self.others])
+        expected = [score for _, _, score in self.CASES]
+        np.testing.assert_allclose(scores, expected, atol=1e-4)
+        np.testing.assert_allclose(scores, [self._pair_score(tech, profile) for tech, profile, _ in self.CASES], atol=1e-4)
+
+    def test_user_scores_for_project_match_pair_formula(self):
+        scores = ai_services.score_user_ids_for_project(self.project, [user.pk for user, _ in self.others])
+        expected = [score for _, _, score in self.CASES]
+        np.testing.assert_allclose(scores, expected, atol=1e-4)
+        np.testing.assert_allclose(scores, [self._pair_score(tech, profile) for tech, profile, _ in self.CASES], atol=1e-4)
+
+
+class FacetEmbeddingRefreshTests(TestCase):
+    """facet 임베딩 갱신은 텍스트가 바뀐 facet만 인코딩하고, 바뀐 것이 없으면 아무것도 쓰지 않습니다."""
+
+    def setUp(self):
+        creator = User.objects.create_user(email='creator@example.com', password='pw', name='creator')
+        with mock.patch('teamspace.signals.project_embedding_needs_refresh', return_value=False):
+            self.project = Projects.objects.create(creator=creator, title='title', tech_stack='Django')
+        patcher = mock.patch.object(ai_services, 'generate_embeddings', side_effect=self._encode)
+        self.generate_embeddings = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def _encode(texts):
+        return np.array([[len(text), 1, 0, 0] for text in texts], dtype=np.float32)
+
+    def test_first_refresh_encodes_every_facet_once(self):
+        combined = ai_services.refresh_project_facet_embeddings(self.project)
+        texts = ai_services.build_project_facet_texts(self.project)
+        self.generate_embeddings.assert_called_once_with([texts['tech'], texts['profile'], texts['combined']])
+        self.assertEqual(combined, [len(texts['combined']), 1, 0, 0])
+        self.assertEqual(ProjectEmbedding.objects.get(project=self.project).as_array().tolist(), combined)
+
+    def test_unchanged_texts_skip_encoding_and_writes(self):
+        ai_services.refresh_project_facet_embeddings(self.project)
+        self.generate_embeddings.reset_mock()
+        with self.assertNumQueries(1): # diff_facet_texts의 source_hash 조회만
+            self.assertIsNone(ai_services.refresh_project_facet_embeddings(self.project))
+        self.generate_embeddings.assert_not_called()
+
+    def test_unchanged_combined_text_is_not_reencoded(self):
+        combined = ai_services.refresh_project_facet_embeddings(self.project)
+        ProjectFacetEmbedding.objects.filter(project=self.project, facet='tech').update(source_hash='old')
+        self.generate_embeddings.reset_mock()
+        self.assertEqual(ai_services.refresh_project_facet_embeddings(self.project), combined)
+        self.generate_embeddings.assert_called_once_with([self.project.tech_stack])
+
+
+class FakeRedis:
+    """테스트용 최소 Redis (문자열/해시 키와 파이프라인). TTL은 기록만 하고 만료시키지 않습니다."""
+
+    def __init__(self):
+        self.data = {}
+        self.ttls = {}
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = str(value).encode()
+        self.ttls[key] = ex
+        return True
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def exists(self, key):
+        return int(key in self.data)
+
+    def delete(self, *keys):
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    def incr(self, key):
+        value = int(self.data.get(key, b'0')) + 1
+        self.data[key] = str(value).encode()
+        return value
+
+    def expire(self, key, ttl):
+        self.ttls[key] = ttl
+        return key in self.data
+
+    def hincrby(self, key, field, amount=1):
+        fields = self.data.setdefault(key, {})
+        fields[field.encode()] = str(int(fields.get(field.encode(), b'0')) + amount).encode()
+
+    def hset(self, key, mapping):
+        self.data.setdefault(key, {}).update({k.encode(): str(v).encode() for k, v in mapping.items()})
+
+    def hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append((getattr(self.redis, name), args, kwargs))
+
+    def execute(self):
+        return [method(*args, **kwargs) for method, args, kwargs in self.calls]
+
+
+class FakeRedisMixin:
+    def setUp(self):
+        super().setUp()
+        self.redis = FakeRedis()
+        for module in (task_dedup, tasks):
+            patcher = mock.patch.object(module, 'get_redis', return_value=self.redis)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+class PrecomputeCooldownTests(FakeRedisMixin, TestCase):
+    """사전 계산 cooldown은 chord의 모든 청크가 성공한 뒤에만 시작되고, chord가 실패하면 dedup 키가 지워집니다."""
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(email='user@example.com', password='pw', name='user')
+        creator = User.objects.create_user(email='creator@example.com', password='pw', name='creator')
+        Projects.objects.create(creator=creator, title='project')
+
+    def test_dispatching_the_chord_does_not_start_the_cooldown(self):
+        with mock.patch('celery.chord') as chord:
+            run_id = tasks.precompute_matches_for_user_task(self.user.pk)
+        self.assertTrue(chord.called)
+        self.assertEqual(tasks.get_precompute_progress(run_id)['status'], 'running')
+        self.assertFalse(task_dedup.task_dedup.recently_succeeded('precompute-user', self.user.pk))
+
+    def test_finished_run_starts_the_cooldown(self):
+        summary = {'processed': 1, 'created': 1, 'updated': 0, 'errors': 0}
+        tasks.finish_precompute_task([summary], 'run', 'user', self.user.pk)
+        self.assertTrue(task_dedup.task_dedup.recently_succeeded('precompute-user', self.user.pk))
+
+    def test_run_with_chunk_errors_does_not_start_the_cooldown(self):
+        summary = {'processed': 1, 'created': 0, 'updated': 0, 'errors': 1}
+        tasks.finish_precompute_task([summary], 'run', 'user', self.user.pk)
+        self.assertFalse(task_dedup.task_dedup.recently_succeeded('precompute-user', self.user.pk))
+
+    def test_failed_chord_clears_dedup_keys(self):
+        task_dedup.task_dedup.claim('precompute-user', self.user.pk, 300)
+        task_dedup.task_dedup.mark_succeeded('precompute-user', self.user.pk, 600)
+        tasks.precompute_failed_task(None, RuntimeError('worker lost'), None, 'run', 'user', self.user.pk)
+        self.assertEqual(tasks.get_precompute_progress('run')['status'], 'failed')
+        self.assertTrue(task_dedup.task_dedup.claim('precompute-user', self.user.pk, 300))
+        self.assertFalse(task_dedup.task_dedup.recently_succeeded('precompute-user', self.user.pk))
+
+
+class EnqueueDeduplicatedTests(FakeRedisMixin, SimpleTestCase):
+    """enqueue_deduplicated / @deduplicated의 cooldown, force, supersede, 브로커 장애 처리."""
+
+    def setUp(self):
+        super().setUp()
+        self.runs = []
+
+        @task_dedup.deduplicated('work', cooldown=60)
+        def work(entity_id):
+            self.runs.append(entity_id)
+
+        self.task = mock.Mock(side_effect=work)
+        self.task.name = 'work'
+
+    def _enqueue(self, **kwargs):
+        return task_dedup.enqueue_deduplicated(self.task, 1, name='work', entity=1, cooldown=60, **kwargs)
+
+    def _run_last_enqueued(self):
+        args, kwargs = self.task.apply_async.call_args.args
+        self.task(*args, **kwargs)
+
+    def test_second_enqueue_within_cooldown_is_skipped(self):
+        self.assertTrue(self._enqueue())
+        self._run_last_enqueued()
+        self.assertFalse(self._enqueue())
+        self.assertEqual(self.task.apply_async.call_count, 1)
+        self.assertEqual(self.runs, [1])
+
+    def test_force_bypasses_cooldown(self):
+        self._enqueue()
+        self._run_last_enqueued()
+        self.assertTrue(self._enqueue(force=True))
+        self.assertEqual(self.task.apply_async.call_args.args[1], {'dedup_force': True})
+        self._run_last_enqueued()
+        self.assertEqual(self.runs, [1, 1])
+
+    def test_superseded_generation_is_a_noop(self):
+        self._enqueue(supersede=True)
+        first = self.task.apply_async.call_args.args[1]
+        self._enqueue(supersede=True)
+        self.task(1, **first)
+        self.assertEqual(self.runs, [])
+        self._run_last_enqueued()
+        self.assertEqual(self.runs, [1])
+
+    def test_broker_failure_runs_inline(self):
+        self.task.apply_async.side_effect = ConnectionError('broker down')
+        self.assertTrue(self._enqueue(inline_on_error=True))
+        self.assertEqual(self.runs, [1])
+        self.assertTrue(task_dedup.task_dedup.claim('work', 1, 300)) # pending 키가 남지 않음
+
+    def test_broker_failure_without_inline_only_logs(self):
+        self.task.apply_async.side_effect = ConnectionError('broker down')
+        self.assertFalse(self._enqueue())
+        self.assertEqual(self.runs, [])
+
+
+@override_settings(PROMETHEUS={'BEARER_TOKEN': 'scrape-token'})
+class MetricsViewAuthTests(TestCase):
+    """/metrics는 Bearer 토큰이나 staff 세션으로만 읽을 수 있습니다."""
+
+    def setUp(self):
+        for name, value in (('PROMETHEUS_AVAILABLE', True), ('render_metrics', lambda: b'metric 1\n')):
+            patcher = mock.patch(f'teamspace.views.{name}', value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_bearer_token(self):
+        response = self.client.get(reverse('metrics'), headers={'Authorization': 'Bearer scrape-token'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'metric 1\n')
+
+    def test_wrong_token_is_unauthorized(self):
+        response = self.client.get(reverse('metrics'), headers={'Authorization': 'Bearer other-token'})
+        self.assertEqual(response.status_code, 401)
+
+    def test_staff_session(self):
+        staff = User.objects.create_user(email='staff@example.com', password='pw', name='staff', is_staff=True)
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+
+    def test_non_staff_session_without_token_is_unauthorized(self):
+        user = User.objects.create_user(email='user@example.com', password='pw', name='user')
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+
+    @override_settings(PROMETHEUS={'BEARER_TOKEN': ''})
+    def test_anonymous_without_configured_token_is_forbidden(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        response = self.client.get(reverse('metrics'), headers={'Authorization': 'Bearer '})
+        self.assertEqual(response.status_code, 403)
+
+
+class RequestMetricsMiddlewareTests(TestCase):
+    """미들웨어는 URL 패턴 경로와 쿼리 수를 기록하고, Server-Timing은 설정/DEBUG/staff일 때만 붙입니다."""
+
+    def setUp(self):
+        patcher = mock.patch.object(request_metrics.request_metrics_store, 'record')
+        self.record = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _get(self, path, user=None):
+        request = RequestFactory().get(path)
+        if user is not None:
+            request.user = user
+
+        def view(request):
+            request.resolver_match = resolve('/metrics')
+            User.objects.count()
+            User.objects.count()
+            return HttpResponse()
+
+        return request_metrics.RequestMetricsMiddleware(view)(request)
+
+    def test_records_route_and_query_count(self):
+        self._get('/metrics?page=2')
+        route, metrics = self.record.call_args.args
+        self.assertEqual(route, 'GET /metrics')
+        self.assertEqual(metrics.counts['db'], 2)
+
+    def test_server_timing_is_hidden_by_default(self):
+        self.assertNotIn('Server-Timing', self._get('/metrics'))
+
+    def test_server_timing_for_staff(self):
+        staff = User(email='staff@example.com', name='staff', is_staff=True)
+        self.assertIn('db;dur=', self._get('/metrics', user=staff)['Server-Timing'])
+
+    @override_settings(REQUEST_METRICS={**settings.REQUEST_METRICS, 'SERVER_TIMING': True})
+    def test_server_timing_setting(self):
+        self.assertIn('Server-Timing', self._get('/metrics'))
+
+
+class RequestMetricsStoreTests(SimpleTestCase):
+    """측정값은 프로세스 안에 모였다가 FLUSH_EVERY개마다 파이프라인 한 번으로 기록됩니다."""
+
+    def setUp(self):
+        self.redis = mock.Mock()
+        patcher = mock.patch.object(request_metrics, 'get_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.store = request_metrics.RequestMetricsStore({'FLUSH_EVERY': 3, 'FLUSH_INTERVAL': 60})
+
+    def test_writes_are_buffered_until_flush_every(self):
+        for route in ('GET /a', 'GET /b'):
+            self.store.record(route, request_metrics.RequestMetrics())
+        self.redis.pipeline.assert_not_called()
+        self.store.record('GET /a', request_metrics.RequestMetrics())
+        self.redis.pipeline.assert_called_once()
+        pipe = self.redis.pipeline.return_value
+        pipe.sadd.assert_called_once_with('reqmetrics:routes', 'GET /a', 'GET /b')
+        self.assertEqual(len(pipe.lpush.call_args_list[0].args), 3) # 키 + GET /a의 두 행
+        pipe.execute.assert_called_once()
+
+
+class RateLimiterWaitTests(SimpleTestCase):
+    """acquire는 버킷이 찰 때까지 다시 확인하고, MAX_WAIT 안에 얻지 못하면 RateLimitTimeout을 던집니다."""
+
+    def setUp(self):
+        self.limiter = rate_limiter.TokenBucketRateLimiter({'MAX_WAIT': 0.5}, 'redis://unused')
+
+    def test_waits_until_budget_is_available(self):
+        with mock.patch.object(self.limiter, '_call', side_effect=[(0.01, 0, 0), (0, 1, 1)]) as call:
+            self.limiter.acquire(10)
+        self.assertEqual(call.call_count, 2)
+        self.assertEqual(self.limiter.counters['acquired'], 1)
+        self.assertEqual(self.limiter.counters['waited'], 1)
+
+    def test_times_out_after_max_wait(self):
+        with mock.patch.object(self.limiter, '_call', return_value=(1.0, 0, 0)):
+            with self.assertRaises(rate_limiter.RateLimitTimeout):
+                self.limiter.acquire(10)
+            with self.assertRaises(rate_limiter.RateLimitTimeout):
+                asyncio.run(self.limiter.acquire_async(10))
+        self.assertEqual(self.limiter.counters['timeouts'], 2)
+        self.assertEqual(self.limiter.counters['waiting'], 0)
+
+    def test_passes_without_redis(self):
+        with mock.patch.object(self.limiter, '_call', return_value=None):
+            self.limiter.acquire(10)
+        self.assertEqual(self.limiter.counters['acquired'], 1)
+        self.assertEqual(self.limiter.counters['waited'], 0)
+
+
+class RedisTokenBucketTests(SimpleTestCase):
+    """TOKEN_BUCKET_SCRIPT의 차감/리필 (Lua를 실행할 Redis가 REDIS_URL에 있어야 하며, 없으면 건너뜀)."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        import redis
+        cls.redis = redis.Redis.from_url(settings.REDIS_URL, socket_timeout=0.2, socket_connect_timeout=0.2)
+        try:
+            cls.redis.ping()
+        except redis.RedisError:
+            raise SkipTest(f"Redis is not reachable at {settings.REDIS_URL}")
+
+    def setUp(self):
+        self.key = f'test:llm:ratelimit:{uuid.uuid4().hex}'
+        self.addCleanup(self.redis.delete, self.key)
+        self.limiter = rate_limiter.TokenBucketRateLimiter({'RPM': 60, 'TPM': 6000, 'KEY': self.key}, settings.REDIS_URL)
+
+    def _rewind(self, seconds: float):
+        # 마지막 갱신 시각을 seconds초 앞당겨 그만큼 시간이 지난 것으로 만듦
+        self.redis.hset(self.key, 'ts', str(float(self.redis.hget(self.key, 'ts')) - seconds))
+
+    def test_empty_bucket_waits_without_deducting(self):
+        for _ in range(60):
+            self.assertEqual(self.limiter._call(10, 'acquire')[0], 0)
+        wait, requests_left, _ = self.limiter._call(10, 'acquire')
+        self.assertGreater(wait, 0.5) # 60 RPM: 요청 하나가 다시 차는 데 1초
+        self.assertLess(requests_left, 1)
+        self.assertGreaterEqual(requests_left, 0) # 대기를 반환할 때는 차감하지 않음
+
+    def test_bucket_refills_with_elapsed_time(self):
+        for _ in range(60):
+            self.limiter._call(10, 'acquire')
+        self._rewind(2)
+        wait, requests_left, _ = self.limiter._call(10, 'acquire')
+        self.assertEqual(wait, 0)
+        self.assertGreaterEqual(requests_left, 1) # 2개가 다시 차고 1개 사용
+        self.assertLess(requests_left, 1.5)
+
+    def test_refill_is_capped_at_capacity(self):
+        self.limiter._call(10, 'acquire')
+        self._rewind(600)
+        _, requests_left, tokens_left = self.limiter._call(0, 'peek')
+        self.assertEqual((requests_left, tokens_left), (60, 6000))
+
+    def test_request_larger_than_bucket_waits_for_full_bucket(self):
+        wait, _, tokens_left = self.limiter._call(10 ** 6, 'acquire')
+        self.assertEqual(wait, 0)
+        self.assertEqual(tokens_left, 0)
+        self.assertGreater(self.limiter._call(1, 'acquire')[0], 0)
@@ -20,7 +20,12 @@ from .views import (
     NotificationListView,
     NotificationReadView,
     ProjectApplicantsListView,
-    UpdateApplicantStatusView # Import
+    UpdateApplicantStatusView, # Import
+    EmbeddingCacheStatsView,
+    ExplanationCacheStatsView,
+    LLMRateLimitStatsView,
+    PrecomputeProgressView,
+    RequestMetricsStatsView,
 )
 
 router = DefaultRouter()
@@ -54,4 +59,12 @@ urlpatterns = [
     path('notifications/', NotificationListView.as_view(), name='notification-list'),
     path('notifications/<int:notification_id>/read/', NotificationReadView.as_view(), name='notification-read'),
     path('clear-match-scores/', clear_match_scores, name='clear_match_scores'),
+
+    # Monitoring URLs (admin only)
+    path('stats/embedding-cache/', EmbeddingCacheStatsView.as_view(), name='embedding-cache-stats'),
+    path('stats/explanation-cache/', ExplanationCacheStatsView.as_view(), name='explanation-cache-stats'),
+    path('stats/llm-rate-limit/', LLMRateLimitStatsView.as_view(), name='llm-rate-limit-stats'),
+    path('stats/requests/', RequestMetricsStatsView.as_view(), name='request-metrics-stats'),
+    path('stats/precompute/<str:kind>/<int:object_id>/', PrecomputeProgressView.as_view(), name='precompute-latest-progress'),
+    path('stats/precompute/<str:run_id>/', PrecomputeProgressView.as_view(), name='precompute-progress'),
 ]
@@ -0,0 +1,23 @@
+import struct
+import numpy as np
+
+# 벡터 바이너리 포맷: [uint32 차원 수 (little-endian)] + [float32 * 차원 수 (little-endian)]
+# build_embeddings / recommend_topk 명령에서 쓰던 pack_vec / unpack_vec 포맷과 동일합니다.
+HEADER = struct.Struct("<I")
+DTYPE = np.dtype("<f4")
+
+
+def pack_vec(vec) -> bytes:
+    """리스트 또는 numpy 배열을 차원 헤더가 붙은 float32 바이트로 변환합니다."""
+    arr = np.ascontiguousarray(vec, dtype=DTYPE).ravel()
+    return HEADER.pack(arr.size) + arr.tobytes()
+
+
+def unpack_vec(buf) -> np.ndarray:
+    """
+    pack_vec으로 만든 바이트(bytes/memoryview)를 복사 없이 읽기 전용 float32 배열로 변환합니다.
+    """
+    if buf is None:
+        return None
+    (dim,) = HEADER.unpack_from(buf, 0)
+    return np.frombuffer(buf, dtype=DTYPE, count=dim, offset=HEADER.size)
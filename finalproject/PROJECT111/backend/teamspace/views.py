@@ -1,4 +1,8 @@
+import hmac
+
+from django.conf import settings
 from django.http import JsonResponse
+from django.db.models import Count, Q
 from django.http import HttpResponse
 from .models import MatchScores
 from rest_framework.decorators import api_view
@@ -11,13 +15,21 @@ from rest_framework.response import Response
 from rest_framework import status # Added status
 from rest_framework.views import APIView
 from rest_framework.generics import RetrieveUpdateAPIView, RetrieveUpdateDestroyAPIView, get_object_or_404, RetrieveAPIView, ListAPIView
-from rest_framework.permissions import IsAuthenticated, AllowAny, IsAuthenticatedOrReadOnly
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAuthenticatedOrReadOnly, IsAdminUser
 from rest_framework.exceptions import NotAuthenticated
 from rest_framework_simplejwt.tokens import RefreshToken
 
 from .models import Projects, User, ProjectEmbedding, UserEmbedding, MatchScores, ProjectApplicants, Notifications
 from .ai_services import MatchService # Import MatchService
 from .ai_services import calculate_similarity, generate_match_explanation, generate_embedding # Added generate_embedding
+from .ann_index import top_users_for_project
+from .ai_services import get_top_recommendations
+from .embedding_cache import embedding_cache
+from .explanation_cache import explanation_cache
+from .rate_limiter import llm_rate_limiter
+from .request_metrics import request_metrics_store
+from .metrics import PROMETHEUS_AVAILABLE, CONTENT_TYPE_LATEST, render_metrics
+from .tasks import get_precompute_progress, get_latest_precompute_run
 from .serializers import (
     UsersSerializer,
     UserProfileSerializer,
@@ -25,6 +37,7 @@ from .serializers import (
     ProjectSerializer,
     ProjectDetailSerializer,
     RecommendedProjectSerializer,
+    ProjectApplicantSerializer,
     NotificationSerializer # Added NotificationSerializer
 )
 import logging
@@ -72,7 +85,7 @@ class ProjectApplyView(APIView):
 # ----------------------
 
 from django.contrib.auth import authenticate # Added authenticate
-from .tasks import precompute_matches_for_user_task
+from .tasks import enqueue_user_precompute
 
 class LoginView(APIView):
     permission_classes = [AllowAny]
@@ -82,8 +95,8 @@ class LoginView(APIView):
         password = request.data.get('password')
         user = authenticate(request, email=email, password=password)
         if user is not None:
-            # Trigger background task to pre-compute matches
-            precompute_matches_for_user_task.delay(user.pk)
+            # Trigger background task to pre-compute matches (반복 로그인은 중복 예약되지 않음)
+            enqueue_user_precompute(user.pk)
             
             refresh = RefreshToken.for_user(user)
             serializer = UsersSerializer(user)
@@ -130,7 +143,7 @@ class ProjectResultsPagination(PageNumberPagination):
 
 class ProjectListView(ListCreateAPIView):
     # permission_classes = [IsAuthenticated] # Remove this line
-    queryset = Projects.objects.all()
+    queryset = Projects.objects.select_related('creator') # creator(UsersSerializer)를 행마다 조회하지 않도록
     serializer_class = ProjectSerializer
     pagination_class = ProjectResultsPagination # Add pagination
 
@@ -157,7 +170,7 @@ class MyProjectListView(ListAPIView):
         for the currently authenticated user.
         """
         user = self.request.user
-        return Projects.objects.filter(creator=user).order_by('-created_at')
+        return Projects.objects.filter(creator=user).select_related('creator').order_by('-created_at')
 
     def list(self, request, *args, **kwargs):
         queryset = self.get_queryset()
@@ -174,12 +187,11 @@ class MyProjectListView(ListAPIView):
         }
 
         # --- Prepare Project List Data ---
+        # 한 번에 직렬화해야 매칭 점수를 페이지 단위로 불러옴 (ProjectListSerializer)
+        projects = list(projects_with_applicants)
+        serializer = self.get_serializer(projects, many=True)
         projects_data = []
-        for project in projects_with_applicants: # Use the annotated queryset
-            # Base data from serializer
-            serializer = self.get_serializer(project)
-            data = serializer.data
-            
+        for project, data in zip(projects, serializer.data): # Use the annotated queryset
             # Add missing/custom fields
             data['status'] = 'active' if project.is_open else 'completed'
             data['applicants_count'] = project.num_applicants # Use the annotated count
@@ -198,7 +210,7 @@ class MyProjectListView(ListAPIView):
 
 class ProjectSearchView(ListAPIView):
     permission_classes = [AllowAny]
-    queryset = Projects.objects.all() # This will be the base queryset
+    queryset = Projects.objects.select_related('creator') # This will be the base queryset
     serializer_class = ProjectSerializer
     filter_backends = [DjangoFilterBackend, OrderingFilter] # Keep these for ordering
     filterset_class = ProjectFilter
@@ -206,14 +218,15 @@ class ProjectSearchView(ListAPIView):
     pagination_class = ProjectResultsPagination
 
     def get_queryset(self):
-        queryset = super().get_queryset() # Get the base queryset (Projects.objects.all())
+        queryset = super().get_queryset() # Get the base queryset (Projects.objects.select_related('creator'))
         filter = self.filterset_class(self.request.query_params, queryset=queryset)
         return filter.qs
 
 
 class ProjectDetailView(RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAuthenticatedOrReadOnly]
-    queryset = Projects.objects.all()
+    # creator와 지원자 수를 프로젝트 조회 한 번에 함께 불러옴
+    queryset = Projects.objects.select_related('creator').annotate(num_applicants=Count('projectapplicants'))
     serializer_class = ProjectDetailSerializer
     lookup_field = 'project_id'
 
@@ -221,9 +234,18 @@ class ProjectDetailView(RetrieveUpdateDestroyAPIView):
         obj = super().get_object()
         user = self.request.user
         if user.is_authenticated:
-            MatchService.get_or_create_match_score(user, obj)
+            # 점수는 바로 저장하고, 설명은 백그라운드에서 생성 (user_match_explanation_status로 폴링)
+            match_score_entry = MatchService.get_or_create_match_score(user, obj, explain=True)
+            # 직렬화할 때 같은 행을 다시 조회하지 않도록 serializer context로 전달
+            self.user_match_entries = {obj.pk: match_score_entry}
         return obj
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if hasattr(self, 'user_match_entries'):
+            context['user_match_entries'] = self.user_match_entries
+        return context
+
     def perform_destroy(self, instance):
         if instance.creator != self.request.user:
             raise PermissionDenied("You do not have permission to delete this project.")
@@ -237,42 +259,24 @@ class MatchedProjectListView(ListAPIView):
     serializer_class = ProjectSerializer
     pagination_class = ProjectResultsPagination
 
-    def get_queryset(self):
-        user = self.request.user
+    def list(self, request, *args, **kwargs):
+        user = request.user
         logger.info(f"MatchedProjectListView: Fetching projects for user {user.email}")
-        if not user.is_authenticated:
-            logger.warning("MatchedProjectListView: User not authenticated, returning empty queryset.")
-            return Projects.objects.none()
 
-        # Use MatchService to get recommended projects
-        recommended_projects_data = MatchService.get_recommended_projects(user)
-        logger.info(f"MatchedProjectListView: MatchService returned {len(recommended_projects_data)} projects for user {user.email}")
-        
-        # Extract sorted projects and prepare context for serializer
-        sorted_project_ids = []
-        user_match_scores = {}
-        for item in recommended_projects_data:
-            project = item['project']
-            score = item['score']
-            sorted_project_ids.append(project.project_id)
-            user_match_scores[project.project_id] = score
-        
-        # Pass the calculated scores to the serializer context
-        self.request.user_match_scores = user_match_scores
+        # 사전 계산된 상위 K 목록 한 행을 읽고, 현재 페이지의 프로젝트만 조회
+        top = get_top_recommendations(user)
+        page_ids = self.paginate_queryset(top.project_ids)
+        score_by_id = dict(zip(top.project_ids, top.scores))
+        projects = Projects.objects.filter(project_id__in=page_ids, is_open=True).select_related('creator').in_bulk()
 
-        # Fetch projects in the correct order
-        from django.db.models import Case, When
-        preserved = Case(*[When(pk=pk, then=pos) for pos, pk in enumerate(sorted_project_ids)])
-        queryset = Projects.objects.filter(project_id__in=sorted_project_ids).order_by(preserved)
-        
-        logger.info(f"MatchedProjectListView: Returning {queryset.count()} projects after sorting.")
-        return queryset
+        # Pass the precomputed scores to the serializer context
+        request.user_match_scores = {project_id: score_by_id[project_id] for project_id in projects}
 
-    def get_serializer_context(self):
-        context = super().get_serializer_context()
-        # Ensure user_match_scores is passed to the serializer
-        context['request'] = self.request # Pass request to serializer context
-        return context
+        serializer = self.get_serializer([projects[pk] for pk in page_ids if pk in projects], many=True)
+        response = self.get_paginated_response(serializer.data)
+        response.data['recommendations_computed_at'] = top.computed_at
+        response.data['recommendations_stale'] = top.is_stale
+        return response
 
 
 class MatchProjectUserView(APIView):
@@ -292,10 +296,10 @@ class MatchProjectUserView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        user_embedding = user_embedding_obj.embedding
-        project_embedding = project_embedding_obj.embedding
+        user_embedding = user_embedding_obj.as_array()
+        project_embedding = project_embedding_obj.as_array()
 
-        if not user_embedding or not project_embedding:
+        if user_embedding is None or project_embedding is None:
             return Response(
                 {"error": "임베딩 데이터가 유효하지 않습니다. 임베딩 생성에 문제가 있을 수 있습니다."},
                 status=status.HTTP_400_BAD_REQUEST
@@ -328,7 +332,7 @@ class MatchProjectUserView(APIView):
         match_score_obj, created = MatchScores.objects.update_or_create(
             user=user,
             project=project,
-            defaults={'score': similarity_score, 'explanation': explanation}
+            defaults={'score': similarity_score, 'explanation': explanation, 'explanation_status': 'ready' if explanation else 'failed'}
         )
 
         return Response({
@@ -357,31 +361,35 @@ class UserProfileView(RetrieveUpdateAPIView):
 # ----------------------
 
 # match_project_users 성능 개선 제안
+MATCH_PROJECT_USERS_MAX_K = 100
+
 @api_view(['GET'])
 def match_project_users(request, project_id):
-    # ... (프로젝트 조회 로직은 동일) ...
-
-    # 모든 UserEmbedding을 가져오면서 user 정보도 함께 로드 (DB 조회 1번)
-    all_user_embeddings = UserEmbedding.objects.select_related('user').all()
-
-    match_results = []
-    for user_embedding_obj in all_user_embeddings:
-        user = user_embedding_obj.user
-        user_embedding = user_embedding_obj.embedding
-
-        if user.user_id == project.creator.user_id:
-            continue
-        if not user_embedding:
-            continue
-
-        similarity = calculate_similarity(project_embedding, user_embedding)
-        match_results.append({
-            'user_id': user.user_id,
-            'user_name': user.name,
+    project = get_object_or_404(Projects, project_id=project_id)
+    project_embedding_obj = ProjectEmbedding.objects.filter(project=project).first()
+    project_embedding = project_embedding_obj.as_array() if project_embedding_obj else None
+    if project_embedding is None:
+        return Response({"error": "Project embedding not found."}, status=status.HTTP_404_NOT_FOUND)
+
+    # ANN 인덱스에서 유사도 상위 k명만 조회 (생성자 제외) 후 해당 사용자만 DB에서 로드
+    try:
+        top_k = int(request.query_params.get('k', 10))
+    except ValueError:
+        return Response({"error": "k must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+    if top_k < 1:
+        return Response({"error": "k must be at least 1."}, status=status.HTTP_400_BAD_REQUEST)
+    top_k = min(top_k, MATCH_PROJECT_USERS_MAX_K) # 페이지 크기 상한(max_page_size)과 같은 방식으로 제한
+    top_matches = top_users_for_project(project_embedding, k=top_k, exclude_user_ids=[project.creator_id])
+    users = User.objects.in_bulk([user_id for user_id, _ in top_matches])
+
+    match_results = [
+        {
+            'user_id': user_id,
+            'user_name': users[user_id].name,
             'similarity_score': similarity,
-        })
-
-    match_results.sort(key=lambda x: x['similarity_score'], reverse=True)
+        }
+        for user_id, similarity in top_matches if user_id in users
+    ]
 
     # DRF의 Response 객체를 사용하는 것이 일관성에 좋습니다.
     return Response({'project_id': project_id, 'matches': match_results})
@@ -395,8 +403,11 @@ class RecommendedProjectListView(APIView):
         if not user.is_authenticated:
             return Response({"error": "Authentication required"}, status=status.HTTP_401_UNAUTHORIZED)
 
-        # Get recommended projects data from the service
-        recommended_projects_data = MatchService.get_recommended_projects(user)
+        # 사전 계산된 상위 K 목록을 페이지 단위로 제공 (매칭 설명은 현재 페이지의 프로젝트에 대해서만 생성)
+        top = get_top_recommendations(user)
+        paginator = ProjectResultsPagination()
+        page_ids = paginator.paginate_queryset(top.project_ids, request, view=self)
+        recommended_projects_data = MatchService.get_recommended_projects(user, top=top, project_ids=page_ids)
 
         # Serialize the data
         project_serializer = RecommendedProjectSerializer(recommended_projects_data, many=True, context={'request': request})
@@ -406,7 +417,12 @@ class RecommendedProjectListView(APIView):
 
         return Response({
             'user_profile': user_serializer.data,
-            'recommended_projects': project_serializer.data
+            'recommended_projects': project_serializer.data,
+            'count': paginator.page.paginator.count,
+            'next': paginator.get_next_link(),
+            'previous': paginator.get_previous_link(),
+            'recommendations_computed_at': top.computed_at,
+            'recommendations_stale': top.is_stale,
         })
 
 
@@ -428,41 +444,34 @@ class RecommendTeammatesView(APIView):
 
         try:
             project_embedding_obj = ProjectEmbedding.objects.get(project=project)
-            project_embedding = project_embedding_obj.embedding
+            project_embedding = project_embedding_obj.as_array()
         except ProjectEmbedding.DoesNotExist:
             return Response(
                 {"error": "Project embedding not found. The project may not have enough information."},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        # 2. Get candidate users (all users except creator and existing applicants)
-        existing_applicant_ids = ProjectApplicants.objects.filter(project=project).values_list('user_id', flat=True)
-        
-        candidate_users = User.objects.exclude(pk=request.user.pk).exclude(pk__in=existing_applicant_ids)
-        
-        all_user_embeddings = UserEmbedding.objects.filter(user__in=candidate_users).select_related('user')
+        if project_embedding is None:
+            return Response([])
 
-        # 3. Calculate match scores
-        match_results = []
-        for user_embedding_obj in all_user_embeddings:
-            user = user_embedding_obj.user
-            user_embedding = user_embedding_obj.embedding
+        # 2. Exclude the creator and existing applicants from the candidates
+        existing_applicant_ids = ProjectApplicants.objects.filter(project=project).values_list('user_id', flat=True)
+        excluded_user_ids = set(existing_applicant_ids) | {request.user.pk}
 
-            if not user_embedding:
-                continue
+        # 3. Query the ANN index for the top 10 most similar users
+        top_matches = top_users_for_project(project_embedding, k=10, exclude_user_ids=excluded_user_ids)
+        users = User.objects.in_bulk([user_id for user_id, _ in top_matches])
 
-            similarity = calculate_similarity(project_embedding, user_embedding)
-            
-            # We can add more data to the response if needed
-            match_results.append({
-                'user': UsersSerializer(user).data,
+        # 4. Return them in similarity order
+        match_results = [
+            {
+                'user': UsersSerializer(users[user_id]).data,
                 'score': similarity * 100 # As percentage
-            })
-
-        # 4. Sort and return top 10
-        match_results.sort(key=lambda x: x['score'], reverse=True)
+            }
+            for user_id, similarity in top_matches if user_id in users
+        ]
 
-        return Response(match_results[:10])
+        return Response(match_results)
 
 class ProposeToProjectView(APIView):
     """
@@ -554,7 +563,7 @@ class ProjectApplicantsListView(APIView):
     def get(self, request, project_id, *args, **kwargs):
         # 1. Get project and verify ownership
         project = get_object_or_404(Projects, pk=project_id)
-        if project.creator != request.user:
+        if project.creator_id != request.user.pk: # creator를 따로 조회하지 않음
             return Response(
                 {"error": "You are not the creator of this project."},
                 status=status.HTTP_403_FORBIDDEN
@@ -563,15 +572,15 @@ class ProjectApplicantsListView(APIView):
         # 2. Get all applicants for the project
         applicants = ProjectApplicants.objects.filter(project=project).select_related('user')
 
-        # 3. Calculate summary
-        summary = {
-            'pending': applicants.filter(status='검토 대기').count(),
-            'reviewed': applicants.filter(status='검토 완료').count(),
-            'approved': applicants.filter(status='승인').count(),
-            'rejected': applicants.filter(status='거절').count(),
-        }
+        # 3. Calculate summary (상태별 개수를 조건부 집계 쿼리 한 번으로)
+        summary = applicants.aggregate(
+            pending=Count('pk', filter=Q(status='검토 대기')),
+            reviewed=Count('pk', filter=Q(status='검토 완료')),
+            approved=Count('pk', filter=Q(status='승인')),
+            rejected=Count('pk', filter=Q(status='거절')),
+        )
 
-        # 4. Serialize applicant data
+        # 4. Serialize applicant data (매칭 점수는 ProjectApplicantListSerializer가 한 번에 조회)
         serializer = ProjectApplicantSerializer(applicants, many=True, context={'request': request})
         
         # Manual transformation to match frontend expectations
@@ -633,4 +642,76 @@ class UpdateApplicantStatusView(APIView):
 
         # 5. Return success response with the updated applicant data
         serializer = ProjectApplicantSerializer(applicant)
-        return Response(serializer.data)
\ No newline at end of file
+        return Response(serializer.data)
+
+
+class AdminStatsView(APIView):
+    """
+    Base for the admin-only stats endpoints: GET returns whatever the `stats` callable returns.
+    Admin only.
+    """
+    permission_classes = [IsAdminUser]
+    stats = None # () -> dict
+
+    def get(self, request, *args, **kwargs):
+        # 클래스에서 꺼내 호출 (인스턴스 메서드로 바인딩되지 않도록)
+        return Response(type(self).stats())
+
+
+class EmbeddingCacheStatsView(AdminStatsView):
+    """Embedding cache hit/miss counters (this process and all workers)."""
+    stats = embedding_cache.stats
+
+
+class ExplanationCacheStatsView(AdminStatsView):
+    """LLM explanation cache hit ratio and estimated dollars saved."""
+    stats = explanation_cache.stats
+
+
+class LLMRateLimitStatsView(AdminStatsView):
+    """Shared OpenAI RPM/TPM budget utilisation and this process's wait counters."""
+    stats = llm_rate_limiter.stats
+
+
+class PrecomputeProgressView(AdminStatsView):
+    """
+    Progress of a chunked match pre-computation run, by run id or by the latest run
+    for a user/project (kind is 'user' or 'project').
+    """
+
+    def get(self, request, run_id=None, kind=None, object_id=None, *args, **kwargs):
+        if run_id is None:
+            run_id = get_latest_precompute_run(kind, object_id)
+        progress = get_precompute_progress(run_id) if run_id else None
+        if progress is None:
+            return Response({"detail": "Precompute run not found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response({"run_id": run_id, **progress})
+
+
+class RequestMetricsStatsView(AdminStatsView):
+    """
+    Per-route p50/p90/p99 of wall time, DB queries/time, SBERT encodes/time and LLM calls/time
+    over the most recent requests of all web workers. DELETE clears the samples.
+    """
+    stats = request_metrics_store.stats
+
+    def delete(self, request, *args, **kwargs):
+        request_metrics_store.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+def metrics_view(request):
+    """
+    Prometheus text exposition of matching, embedding, LLM and Celery metrics
+    (summed over all processes when PROMETHEUS_MULTIPROC_DIR is set).
+    Requires 'Authorization: Bearer <PROMETHEUS['BEARER_TOKEN']>', or a logged-in staff session.
+    Without a configured token only staff can read it (never public).
+    """
+    token = settings.PROMETHEUS.get('BEARER_TOKEN')
+    authorization = request.headers.get('Authorization', '')
+    has_token = bool(token) and hmac.compare_digest(authorization.encode(), f'Bearer {token}'.encode())
+    if not (has_token or request.user.is_staff):
+        return HttpResponse(status=status.HTTP_401_UNAUTHORIZED if token else status.HTTP_403_FORBIDDEN)
+    if not PROMETHEUS_AVAILABLE:
+        return HttpResponse("prometheus_client is not installed.", status=status.HTTP_503_SERVICE_UNAVAILABLE, content_type='text/plain')
+    return HttpResponse(render_metrics(), content_type=CONTENT_TYPE_LATEST)
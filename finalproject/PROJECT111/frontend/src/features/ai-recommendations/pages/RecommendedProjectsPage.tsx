@@ -14,6 +14,7 @@ interface RecommendedProjectData {
       additional_reasons: string[];
     };
   };
+  explanation_status?: 'pending' | 'ready' | 'failed' | 'stale';
 }
 
 interface UserProfile {
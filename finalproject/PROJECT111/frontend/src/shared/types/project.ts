@@ -27,6 +27,8 @@ export interface Project {
           negative_points: string[];
       };
   };
+  // 'pending'이면 매칭 설명을 생성하는 중 (다시 조회하면 갱신됨), 'stale'이면 이전 설명을 보여주며 다시 생성하는 중
+  user_match_explanation_status?: 'pending' | 'ready' | 'failed' | 'stale' | null;
   user_match_scores?: {
     tech: number;
     personality: number;